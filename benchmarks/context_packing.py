@@ -0,0 +1,72 @@
+"""Compares the Gemini prompt size with and without context packing.
+
+Token counts use the packer's character-based estimate, so they are
+comparable between the two prompts rather than exact Gemini counts.
+
+Usage::
+
+    python benchmarks/context_packing.py --documents 5
+"""
+
+import argparse
+
+from llm_chatbot_backend.chatbot.context_packing import ContextPacker, approx_tokens
+from llm_chatbot_backend.chatbot.generation import build_prompt
+from llm_chatbot_backend.chatbot.retrieval import RetrievedDocument
+from llm_chatbot_backend.pipelines.data_processing.nodes import build_rag_context
+
+QUERY = "ปวดหัวบ่อยมาก กินยาพาราเซตามอลทุกวันได้ไหม"
+REPLIES = [
+    "สวัสดีค่ะ อาการปวดศีรษะบ่อยอาจเกิดจากความเครียด การพักผ่อนไม่เพียงพอ "
+    "หรือไมเกรน ไม่ควรรับประทานยาพาราเซตามอลติดต่อกันเกิน 5 วัน "
+    "หากอาการไม่ดีขึ้นควรพบแพทย์เพื่อตรวจเพิ่มเติมค่ะ",
+    "ยาพาราเซตามอลรับประทานได้ครั้งละ 1 เม็ด ทุก 4-6 ชั่วโมง ไม่เกิน 8 เม็ดต่อวัน "
+    "การรับประทานเกินขนาดเป็นเวลานานอาจเป็นอันตรายต่อตับ",
+    "อาการปวดหัวข้างเดียวร่วมกับคลื่นไส้ เห็นแสงระยิบระยับ เข้าได้กับไมเกรน "
+    "ควรหลีกเลี่ยงสิ่งกระตุ้น เช่น การอดนอน แสงจ้า และกาแฟปริมาณมาก",
+    "หากปวดศีรษะรุนแรงเฉียบพลัน ร่วมกับแขนขาอ่อนแรง พูดไม่ชัด หรือคอแข็ง "
+    "ควรรีบไปโรงพยาบาลทันที เนื่องจากอาจเป็นภาวะฉุกเฉินทางสมอง",
+]
+
+
+def make_documents(documents: int) -> list[RetrievedDocument]:
+    # Replies repeat from the fifth document on, as pasted doctor replies do
+    return [
+        RetrievedDocument(
+            id=str(i),
+            text=build_rag_context(
+                {
+                    "forum_text": f"ปวดหัวข้างเดียวบ่อย ๆ มา {i + 2} สัปดาห์แล้วค่ะ",
+                    "doctor_reply": REPLIES[i % len(REPLIES)],
+                    "disease_text": "ปวดศีรษะ",
+                    "tags": ["ปวดหัว", "ปวดศีรษะ", "ไมเกรน", "ยาแก้ปวด"],
+                }
+            ),
+        )
+        for i in range(documents)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=5)
+    parser.add_argument("--max-tokens", type=int, default=1500)
+    args = parser.parse_args()
+
+    documents = make_documents(args.documents)
+    before = build_prompt(QUERY, [str([doc.text for doc in documents])])
+    packed = ContextPacker(max_tokens=args.max_tokens).pack(documents)
+    after = build_prompt(QUERY, packed.chunks)
+
+    print(f"{args.documents} retrieved documents, budget {args.max_tokens} tokens")
+    print(f"{'prompt':<8} {'chars':>6} {'tokens':>7} {'documents':>10}")
+    print(
+        f"{'before':<8} {len(before):>6} {approx_tokens(before):>7} {len(documents):>10}"
+    )
+    print(
+        f"{'packed':<8} {len(after):>6} {approx_tokens(after):>7} {len(packed.chunks):>10}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compares the JSON and memory-mapped formats of ``embedded_forum_data``.
+
+Usage::
+
+    python benchmarks/embedded_storage.py --documents 10000
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from llm_chatbot_backend.datasets.embedding_dataset import EmbeddingDataset
+from llm_chatbot_backend.datasets.utf8_json import Utf8JSON
+
+
+def make_records(documents: int, dim: int) -> list[dict]:
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((documents, dim), dtype=np.float32)
+    return [
+        {
+            "id": str(100000 + i),
+            "embedding": embeddings[i].tolist(),
+            "context": f"[คำถามจากผู้ใช้] ปวดหัวบ่อยมากค่ะ {i} " * 8,
+            "metadata": {
+                "disease_key": "headache",
+                "tags": "ปวดหัว, ไมเกรน",
+                "content_hash": f"{i:064x}",
+            },
+        }
+        for i in range(documents)
+    ]
+
+
+def size_of(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=768)
+    args = parser.parse_args()
+
+    records = make_records(args.documents, args.dim)
+    with tempfile.TemporaryDirectory() as tmp:
+        formats = {
+            "json": (Path(tmp) / "embedded.json", Utf8JSON),
+            "npy+columns": (Path(tmp) / "embedded", EmbeddingDataset),
+        }
+        print(f"{args.documents} documents, {args.dim} dims")
+        print(
+            f"{'format':<12} {'size MB':>8} {'save s':>7} {'load s':>7} {'scan s':>7}"
+        )
+        for name, (path, dataset_type) in formats.items():
+            dataset = dataset_type(str(path))
+            save = timed(lambda: dataset.save(records))
+            loaded = []
+            load = timed(lambda: loaded.append(dataset.load()))
+            # Touch every vector, as store_to_chroma does
+            scan = timed(
+                lambda: sum(float(np.sum(row["embedding"])) for row in loaded[0])
+            )
+            print(
+                f"{name:<12} {size_of(path) / 1e6:>8.1f} {save:>7.2f} "
+                f"{load:>7.2f} {scan:>7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Compares the latency of dense-only and fused (BM25 + vector) retrieval.
+
+Both paths start from an already encoded query, since encoding costs the
+same either way.
+
+Usage::
+
+    python benchmarks/hybrid_retrieval.py --documents 10000
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+
+from llm_chatbot_backend.chatbot.retrieval import (
+    QueryOptions,
+    hybrid_query,
+    query_collection,
+)
+from llm_chatbot_backend.lexical_index import BM25Index
+
+SYMPTOMS = ["ปวดหัว", "มีไข้", "ไอ", "เจ็บคอ", "ท้องเสีย", "ผื่นแดง", "นอนไม่หลับ"]
+DRUGS = ["พาราเซตามอล", "ไอบูโพรเฟน", "ยาแก้แพ้", "ผงเกลือแร่", "ยาลดกรด"]
+QUERIES = [
+    "ปวดหัวบ่อยมาก กินพาราเซตามอลได้ไหม",
+    "ลูกท้องเสีย ควรให้ผงเกลือแร่อย่างไร",
+    "ผื่นแดงคันมาก ทานยาแก้แพ้แล้วไม่หาย",
+    "นอนไม่หลับหลายวันแล้ว",
+]
+
+
+def make_corpus(documents: int) -> tuple[list[str], list[str]]:
+    rng = np.random.default_rng(0)
+    contexts = [
+        f"[คำถามจากผู้ใช้] {SYMPTOMS[rng.integers(len(SYMPTOMS))]} มา {i} วัน "
+        f"[คำตอบจากแพทย์] แนะนำ {DRUGS[rng.integers(len(DRUGS))]} และพักผ่อน"
+        for i in range(documents)
+    ]
+    return [str(100000 + i) for i in range(documents)], contexts
+
+
+def percentiles(samples: list[float]) -> str:
+    return (
+        f"p50 {statistics.median(samples):6.2f} ms  "
+        f"p95 {float(np.percentile(samples, 95)):6.2f} ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    ids, contexts = make_corpus(args.documents)
+    embeddings = np.random.default_rng(1).standard_normal(
+        (args.documents, args.dim), dtype=np.float32
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        client = chromadb.PersistentClient(path=tmp)
+        collection = client.create_collection("forum_data")
+        batch_size = client.get_max_batch_size()
+        for start in range(0, args.documents, batch_size):
+            end = start + batch_size
+            collection.add(
+                ids=ids[start:end],
+                documents=contexts[start:end],
+                embeddings=embeddings[start:end],
+            )
+
+        build_start = time.perf_counter()
+        index = BM25Index.build(ids, contexts)
+        build = time.perf_counter() - build_start
+
+        query_embeddings = np.random.default_rng(2).standard_normal(
+            (len(QUERIES), args.dim), dtype=np.float32
+        )
+        timings: dict[str, list[float]] = {"dense": [], "fused": [], "bm25": []}
+        for i in range(args.repeats):
+            query, embedding = QUERIES[i % len(QUERIES)], query_embeddings[i % 4]
+            runs = {
+                "dense": lambda: query_collection(collection, embedding, args.top_k),
+                "fused": lambda: hybrid_query(
+                    collection,
+                    index,
+                    query,
+                    embedding,
+                    QueryOptions(top_k=args.top_k, candidates=args.candidates),
+                ),
+                "bm25": lambda: index.search(query, args.candidates),
+            }
+            for name, run in runs.items():
+                start = time.perf_counter()
+                run()
+                timings[name].append((time.perf_counter() - start) * 1000)
+
+    print(
+        f"{args.documents} documents, {args.dim} dims, top-{args.top_k}, "
+        f"{args.candidates} candidates per retriever"
+    )
+    print(f"index build {build:.1f}s, {len(index.postings)} terms")
+    for name, samples in timings.items():
+        print(f"{name:<6} {percentiles(samples)}")
+
+
+if __name__ == "__main__":
+    main()
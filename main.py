@@ -1,64 +1,105 @@
 import os
-import time
+import threading
+from contextlib import closing
 
-import chromadb
 import streamlit as st
 from dotenv import load_dotenv
 from google import genai
-from google.genai import types
-from sentence_transformers import SentenceTransformer
+
+from llm_chatbot_backend.chatbot.answer_cache import SemanticAnswerCache
+from llm_chatbot_backend.chatbot.answer_policy import SHORT, AnswerPolicy
+from llm_chatbot_backend.chatbot.config import load_config
+from llm_chatbot_backend.chatbot.context_packing import (
+    ContextPacker,
+    tokenizer_counter,
+)
+from llm_chatbot_backend.chatbot.conversation import ConversationMemory
+from llm_chatbot_backend.chatbot.embedding_cache import QueryEmbeddingCache
+from llm_chatbot_backend.chatbot.generation import (
+    MAX_OUTPUT_TOKENS,
+    build_prompt,
+    stream_answer,
+)
+from llm_chatbot_backend.chatbot.reranking import Reranker
+from llm_chatbot_backend.chatbot.resources import get_registry
+from llm_chatbot_backend.chatbot.retrieval import RetrievalOptions, search
 
 load_dotenv()
 API_KEY = os.getenv("API_KEY")
 
-client = genai.Client(api_key=API_KEY)
-EMBED_MODEL = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
-PERSIST_PATH = "data/04_chroma_db"
-CHROMA_COLLECTION = "forum_data"
-
-
-def retrieve_relevant_documents(
-    user_query: str, embed_model: str, persist_path: str, top_k: int = 5
-):
-    # Load Chroma client and collection
-    client = chromadb.PersistentClient(path=persist_path)
-    collection = client.get_or_create_collection(name=CHROMA_COLLECTION)
-
-    # Load embedding model
-    embedding_model = SentenceTransformer(embed_model)
-    query_embedding = embedding_model.encode([user_query])[0]
-
-    # Query the collection
-    results = collection.query(query_embeddings=[query_embedding], n_results=top_k)
-
-    replies = []
-    if results["documents"] is not None:
-        for i in range(len(results["documents"][0])):
-            context = results["documents"][0][i]
-            replies.append(context)
-    return replies
-
-
-def generate_answer(user_query: str, context: list[str]) -> str:
-    """Generate response using Gemini LLM with conversation context."""
-    prompt = f"""
-    คุณเป็นผู้ช่วยที่สามารถให้คำแนะนำเกี่ยวกับการแพทย์ได้โดยอิงจาก context ที่มีให้แล้วนำมาวิเคราะห์โดยอิงจากข้อความให้มากที่สุด.
-    **สำคัญ**: ตอนตอบกลับ ให้ตอบราวกับเป็นคำตอบตรงประเด็นจากผู้ช่วยทางการแพทย์ในระบบสนทนา ถ้าสามารถให้คำแนะนำได้ให้ทำเลยโดยอิงจากข้อมูลที่มีให้ใน context.
-    Context: {context}
-    User's questiion: {user_query}
-    """
-    # response = models.generate_content(prompt)
-    response = client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=prompt,
-        config=types.GenerateContentConfig(
-            max_output_tokens=500,
-            system_instruction="คุณเป็นผู้ช่วยที่สามารถให้คำแนะนำเกี่ยวกับการแพทย์ได้",
-            temperature=0.2,
-        ),
+config = load_config()
+
+# Loads the embedding model and Chroma client once per process; later reruns
+# and other sessions reuse them
+registry = get_registry()
+resources = registry.get(config.embedding_model, config.chroma_persist_path)
+
+
+@st.cache_resource
+def get_llm_client() -> genai.Client:
+    return genai.Client(api_key=API_KEY)
+
+
+client = get_llm_client()
+
+
+@st.cache_resource
+def get_embedding_cache() -> QueryEmbeddingCache:
+    return QueryEmbeddingCache(
+        config.embedding_model,
+        max_size=config.embedding_cache_size,
+        ttl_seconds=config.embedding_cache_ttl_seconds,
+        persist_path=config.embedding_cache_path,
     )
 
-    return response.text or ""
+
+@st.cache_resource
+def get_answer_cache() -> SemanticAnswerCache:
+    return SemanticAnswerCache(
+        config.chroma_persist_path,
+        threshold=config.answer_cache_threshold,
+        max_entries=config.answer_cache_size,
+    )
+
+
+@st.cache_resource
+def get_reranker() -> Reranker | None:
+    if not config.rerank_model:
+        return None
+    reranker = Reranker(
+        config.rerank_model,
+        budget_ms=config.rerank_budget_ms,
+        cache_size=config.rerank_cache_size,
+    )
+    reranker.warm_up()
+    return reranker
+
+
+@st.cache_resource
+def get_context_packer() -> ContextPacker:
+    return ContextPacker(
+        max_tokens=config.context_max_tokens,
+        dedupe_threshold=config.context_dedupe_threshold,
+        count_tokens=tokenizer_counter(resources.model.tokenizer),
+    )
+
+
+@st.cache_resource
+def get_answer_policy() -> AnswerPolicy:
+    return AnswerPolicy(
+        min_similarity=config.answer_min_similarity,
+        below_floor=config.answer_below_floor,
+        direct_similarity=config.direct_answer_similarity,
+        direct_margin=config.direct_answer_margin,
+        short_max_output_tokens=config.short_answer_max_tokens,
+    )
+
+
+embedding_cache = get_embedding_cache()
+answer_cache = get_answer_cache()
+retrieval_options = RetrievalOptions.from_config(config, get_reranker())
+context_packer = get_context_packer()
+answer_policy = get_answer_policy()
 
 
 # Initialize chat history
@@ -67,6 +108,32 @@ if "messages" not in st.session_state:
         {"role": "assistant", "content": "สามารถสอบถามปัญหาสุขภาพได้เลย! 👇"}
     ]
 
+# Bounded history sent with each question; messages above keep everything
+# for display only
+if config.conversation_memory and "memory" not in st.session_state:
+    st.session_state.memory = ConversationMemory(
+        max_turns=config.conversation_turns,
+        max_tokens=config.conversation_max_tokens,
+        summary_tokens=config.conversation_summary_tokens,
+        rewrite_turns=config.rewrite_turns,
+        rewrite_max_tokens=config.rewrite_max_tokens,
+        count_tokens=context_packer.count_tokens,
+    )
+memory = st.session_state.get("memory") if config.conversation_memory else None
+
+# Report how long the shared resources took to load and to answer queries
+with st.sidebar:
+    st.caption(
+        f"Model load: {resources.load_seconds:.1f}s · "
+        f"retrieval: {registry.stats.mean_seconds * 1000:.0f} ms avg "
+        f"over {registry.stats.queries} queries · "
+        f"embedding cache hit rate: {embedding_cache.hit_rate:.0%} · "
+        f"cached answers served: {answer_cache.hits} · "
+        f"context: {context_packer.stats.mean_tokens:.0f} tokens avg "
+        f"(unpacked {context_packer.stats.mean_source_tokens:.0f}) · "
+        f"answered without Gemini: {answer_policy.stats.llm_skipped_rate:.0%}"
+    )
+
 # Display chat messages from history on app rerun
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
@@ -74,6 +141,11 @@ for message in st.session_state.messages:
 
 # Accept user input
 if prompt := st.chat_input("What is up?"):
+    # Stop streaming the previous answer of this session, if any
+    if "cancel_event" in st.session_state:
+        st.session_state.cancel_event.set()
+    cancel_event = st.session_state.cancel_event = threading.Event()
+
     # Add user message to chat history
     st.session_state.messages.append({"role": "user", "content": prompt})
     # Display user message in chat message container
@@ -84,23 +156,51 @@ if prompt := st.chat_input("What is up?"):
     with st.chat_message("assistant"):
         message_placeholder = st.empty()
         full_response = ""
+        history = memory.history_block() if memory else ""
         with st.spinner("Wait for it...", show_time=True):
-            context = retrieve_relevant_documents(
-                user_query=prompt,
-                embed_model=EMBED_MODEL,
-                persist_path=PERSIST_PATH,
+            result = search(
+                memory.rewrite_query(prompt) if memory else prompt,
+                retrieval_options,
+                embedding_cache,
+            )
+            decision = answer_policy.decide(result.documents)
+            # Keyed on the rewritten query, so a follow-up matches answers to
+            # the same standalone question rather than to its bare wording
+            cached_answer = decision.answer or answer_cache.lookup(
+                result.query_embedding, result.doc_ids
             )
-            assistant_response = generate_answer(prompt, context)
 
-        # Simulate stream of response with milliseconds delay
-        for chunk in assistant_response.split():
-            full_response += chunk + " "
-            time.sleep(0.05)
-            message_placeholder.markdown(
-                full_response + "▌"
-            )  # Add a blinking cursor to simulate typing
+        if cached_answer is not None:
+            full_response = cached_answer
+        else:
+            if decision.route == SHORT:
+                context, max_output_tokens = [], answer_policy.short_max_output_tokens
+            else:
+                packed = context_packer.pack(result.documents)
+                context, max_output_tokens = packed.chunks, MAX_OUTPUT_TOKENS
+            # Render chunks as Gemini emits them; closing() releases the stream
+            # if a new message interrupts this run
+            stream = stream_answer(
+                client,
+                build_prompt(prompt, context, history),
+                cancel_event,
+                model=config.llm_model,
+                max_output_tokens=max_output_tokens,
+            )
+            with closing(stream):
+                for chunk in stream:
+                    full_response += chunk
+                    message_placeholder.markdown(
+                        full_response + "▌"
+                    )  # Add a blinking cursor while the answer streams in
+            if not cancel_event.is_set():
+                answer_cache.store(
+                    result.query_embedding, result.doc_ids, full_response
+                )
 
         message_placeholder.markdown(full_response)
 
     # Add assistant response to chat history
     st.session_state.messages.append({"role": "assistant", "content": full_response})
+    if memory:
+        memory.add_turn(prompt, full_response)
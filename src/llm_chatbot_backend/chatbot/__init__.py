@@ -0,0 +1 @@
+"""Serving-side components of the chatbot: retrieval, generation and caching."""
@@ -0,0 +1,104 @@
+import logging
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+from llm_chatbot_backend.vector_store import read_collection_version
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachedAnswer:
+    embedding: np.ndarray
+    doc_ids: tuple[str, ...]
+    answer: str
+
+
+class SemanticAnswerCache:
+    """Reuses Gemini answers for questions that mean the same thing.
+
+    A cached answer is returned when the new query embedding has cosine
+    similarity of at least ``threshold`` with a cached one and retrieval
+    returned the same documents. Entries are evicted least-recently-used
+    first, and the whole cache is dropped when ``store_to_chroma`` writes
+    a new collection version under ``persist_path``.
+
+    Args:
+        persist_path: Directory of the persistent Chroma client.
+        threshold: Minimum cosine similarity for a hit.
+        max_entries: Largest number of cached answers.
+    """
+
+    def __init__(
+        self, persist_path: str, threshold: float = 0.95, max_entries: int = 256
+    ):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1.")
+        self.persist_path = persist_path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[int, CachedAnswer] = OrderedDict()
+        self._next_key = 0
+        self._version = read_collection_version(persist_path)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def lookup(self, embedding: Sequence[float], doc_ids: Sequence[str]) -> str | None:
+        """Returns a cached answer for a near-identical question, if any."""
+        query = self._normalise(embedding)
+        doc_ids = tuple(doc_ids)
+        with self._lock:
+            self._check_version()
+            best_key, best_score = None, self.threshold
+            for key, entry in self._entries.items():
+                if entry.doc_ids != doc_ids:
+                    continue
+                score = float(np.dot(query, entry.embedding))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            logger.info(f"Semantic cache hit (cosine {best_score:.3f})")
+            return self._entries[best_key].answer
+
+    def store(
+        self, embedding: Sequence[float], doc_ids: Sequence[str], answer: str
+    ) -> None:
+        if not answer:
+            return
+        entry = CachedAnswer(self._normalise(embedding), tuple(doc_ids), answer)
+        with self._lock:
+            self._check_version()
+            self._entries[self._next_key] = entry
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _check_version(self) -> None:
+        version = read_collection_version(self.persist_path)
+        if version != self._version:
+            if self._entries:
+                logger.info("Chroma collection rebuilt, dropping cached answers")
+            self._entries.clear()
+            self._version = version
+
+    @staticmethod
+    def _normalise(embedding: Sequence[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
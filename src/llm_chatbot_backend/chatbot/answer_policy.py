@@ -0,0 +1,148 @@
+import logging
+import threading
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+from .context_packing import doctor_reply
+from .retrieval import RetrievedDocument
+
+logger = logging.getLogger(__name__)
+
+# Routes an answer can take
+LLM, SHORT, DIRECT, NO_MATCH = "llm", "short", "direct", "no_match"
+# What to do when no document reaches ``min_similarity``
+BELOW_FLOOR_ROUTES = (NO_MATCH, SHORT, LLM)
+
+NO_MATCH_ANSWER = (
+    "ขออภัย ไม่พบข้อมูลในฟอรัมที่เกี่ยวข้องกับคำถามนี้ "
+    "หากมีอาการที่น่ากังวลหรืออาการไม่ดีขึ้น ควรปรึกษาแพทย์หรือเภสัชกรโดยตรง"
+)
+DIRECT_ANSWER_PREFIX = "คำตอบจากแพทย์สำหรับคำถามที่ใกล้เคียงกัน:\n\n"
+
+
+@dataclass(frozen=True)
+class AnswerDecision:
+    """How one question is answered.
+
+    Args:
+        route: ``"llm"``, ``"short"`` (Gemini without context and a smaller
+            output limit), ``"direct"`` or ``"no_match"``.
+        answer: Ready answer of the ``"direct"`` and ``"no_match"`` routes.
+        similarity: Best cosine similarity among the retrieved documents.
+        doc_id: Document whose doctor's reply is the direct answer.
+    """
+
+    route: str
+    answer: str | None = None
+    similarity: float | None = None
+    doc_id: str | None = None
+
+
+@dataclass
+class RouteStats:
+    counts: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def llm_skipped_rate(self) -> float:
+        """Share of answers served without a Gemini call."""
+        skipped = self.counts.get(DIRECT, 0) + self.counts.get(NO_MATCH, 0)
+        return skipped / self.total if self.total else 0.0
+
+
+@dataclass
+class AnswerPolicy:
+    """Decides from retrieval similarity whether an answer needs Gemini.
+
+    When no retrieved document reaches ``min_similarity``, the question is
+    answered by ``below_floor``: a fixed "nothing relevant found" reply
+    (``"no_match"``), a short Gemini answer without context (``"short"``),
+    or the usual prompt (``"llm"``). When the best document reaches
+    ``direct_similarity`` and leads the runner-up by ``direct_margin``, its
+    doctor's reply is returned as is. Documents without a similarity, e.g.
+    from a mocked collection, always go to Gemini.
+
+    Args:
+        min_similarity: Cosine similarity a document needs to count as relevant.
+        below_floor: Route taken when no document is relevant.
+        direct_similarity: Similarity at which a match answers by itself;
+            values above 1 disable direct answers.
+        direct_margin: Lead over the second best document a direct answer needs.
+        short_max_output_tokens: Output limit of the ``"short"`` route.
+    """
+
+    min_similarity: float = 0.3
+    below_floor: str = NO_MATCH
+    direct_similarity: float = 0.9
+    direct_margin: float = 0.05
+    short_max_output_tokens: int = 150
+    stats: RouteStats = field(default_factory=RouteStats)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        if self.below_floor not in BELOW_FLOOR_ROUTES:
+            raise ValueError(
+                f"below_floor must be one of {BELOW_FLOOR_ROUTES}, "
+                f"got {self.below_floor!r}"
+            )
+
+    def decide(
+        self, documents: Sequence[RetrievedDocument], record: bool = True
+    ) -> AnswerDecision:
+        """Picks the route for ``documents``.
+
+        Args:
+            documents: Retrieved documents, in any order.
+            record: Whether to count the route in ``stats``; off for callers
+                that only report the decision without answering.
+        """
+        decision = self._decide(documents)
+        if not record:
+            return decision
+        with self._lock:
+            self.stats.counts[decision.route] = (
+                self.stats.counts.get(decision.route, 0) + 1
+            )
+        if decision.route != LLM:
+            similarity = (
+                f"{decision.similarity:.2f}"
+                if decision.similarity is not None
+                else "none"
+            )
+            logger.info(
+                f"Answering by the {decision.route} route "
+                f"(best similarity {similarity})"
+            )
+        return decision
+
+    def _decide(self, documents: Sequence[RetrievedDocument]) -> AnswerDecision:
+        if not documents:
+            return self._below_floor(None)
+        scored = sorted(
+            (doc for doc in documents if doc.similarity is not None),
+            key=lambda doc: -doc.similarity,
+        )
+        if len(scored) < len(documents):
+            return AnswerDecision(LLM)
+        best = scored[0]
+        if best.similarity < self.min_similarity:
+            return self._below_floor(best.similarity)
+
+        runner_up = scored[1].similarity if len(scored) > 1 else -1.0
+        if (
+            best.similarity >= self.direct_similarity
+            and best.similarity - runner_up >= self.direct_margin
+        ):
+            reply = doctor_reply(best.text)
+            if reply:
+                return AnswerDecision(
+                    DIRECT, DIRECT_ANSWER_PREFIX + reply, best.similarity, best.id
+                )
+        return AnswerDecision(LLM, similarity=best.similarity)
+
+    def _below_floor(self, similarity: float | None) -> AnswerDecision:
+        answer = NO_MATCH_ANSWER if self.below_floor == NO_MATCH else None
+        return AnswerDecision(self.below_floor, answer, similarity)
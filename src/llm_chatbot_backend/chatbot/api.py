@@ -0,0 +1,278 @@
+"""Async HTTP service for retrieval and answering.
+
+Run with::
+
+    uvicorn --factory llm_chatbot_backend.chatbot.api:create_app
+"""
+
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import replace
+
+from dotenv import load_dotenv
+from fastapi import APIRouter, FastAPI, HTTPException, Request
+from google import genai
+from pydantic import BaseModel, Field
+
+from llm_chatbot_backend.pipelines.data_processing.nodes import clean_text
+from llm_chatbot_backend.vector_store import read_collection_version
+
+from .answer_cache import SemanticAnswerCache
+from .answer_policy import SHORT, AnswerPolicy
+from .batching import EmbeddingBatcher
+from .config import ChatbotConfig, load_config
+from .context_packing import ContextPacker, tokenizer_counter
+from .embedding_cache import QueryEmbeddingCache
+from .generation import MAX_OUTPUT_TOKENS, build_prompt, generate_answer
+from .reranking import Reranker
+from .resources import LatencyStats, ResourceRegistry, get_registry
+from .retrieval import RetrievalOptions, RetrievalResult, search
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class QueryRequest(BaseModel):
+    query: str = Field(min_length=1)
+    top_k: int | None = Field(default=None, ge=1, le=50)
+
+
+class DocumentResponse(BaseModel):
+    id: str
+    text: str
+    similarity: float | None = None
+    distance: float | None = None
+    score: float | None = None
+    metadata: dict | None = None
+
+
+class DecisionResponse(BaseModel):
+    route: str
+    answer: str | None = None
+    similarity: float | None = None
+    doc_id: str | None = None
+
+
+class RetrieveResponse(BaseModel):
+    documents: list[DocumentResponse]
+    decision: DecisionResponse
+
+
+class AnswerResponse(BaseModel):
+    answer: str
+    documents: list[str]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Loads the model, builds the per-app helpers and runs the batcher."""
+    config = app.state.config
+    resources = await asyncio.to_thread(
+        app.state.registry.get, config.embedding_model, config.chroma_persist_path
+    )
+    batcher = EmbeddingBatcher(
+        resources.model.encode,
+        max_batch_size=config.max_batch_size,
+        max_wait_ms=config.max_wait_ms,
+    )
+    await batcher.start()
+    app.state.reranker = None
+    if config.rerank_model:
+        app.state.reranker = Reranker(
+            config.rerank_model,
+            budget_ms=config.rerank_budget_ms,
+            cache_size=config.rerank_cache_size,
+        )
+        await asyncio.to_thread(app.state.reranker.warm_up)
+    app.state.retrieval_options = RetrievalOptions.from_config(
+        config, app.state.reranker
+    )
+    app.state.context_packer = ContextPacker(
+        max_tokens=config.context_max_tokens,
+        dedupe_threshold=config.context_dedupe_threshold,
+        count_tokens=tokenizer_counter(resources.model.tokenizer),
+    )
+    app.state.answer_policy = AnswerPolicy(
+        min_similarity=config.answer_min_similarity,
+        below_floor=config.answer_below_floor,
+        direct_similarity=config.direct_answer_similarity,
+        direct_margin=config.direct_answer_margin,
+        short_max_output_tokens=config.short_answer_max_tokens,
+    )
+    app.state.answer_stats = LatencyStats()
+    app.state.single_flight = SingleFlight(config.coalesce_timeout_seconds)
+    app.state.embedding_cache = QueryEmbeddingCache(
+        config.embedding_model,
+        max_size=config.embedding_cache_size,
+        ttl_seconds=config.embedding_cache_ttl_seconds,
+        persist_path=config.embedding_cache_path,
+    )
+    app.state.answer_cache = SemanticAnswerCache(
+        config.chroma_persist_path,
+        threshold=config.answer_cache_threshold,
+        max_entries=config.answer_cache_size,
+    )
+    if app.state.llm_client is None:
+        load_dotenv()
+        app.state.llm_client = genai.Client(api_key=os.getenv("API_KEY"))
+    app.state.batcher = batcher
+    yield
+    await batcher.stop()
+
+
+router = APIRouter()
+
+
+def create_app(
+    config: ChatbotConfig | None = None,
+    llm_client: genai.Client | None = None,
+    registry: ResourceRegistry | None = None,
+) -> FastAPI:
+    """Creates the FastAPI application.
+
+    Args:
+        config: Chatbot settings; read from ``conf/`` when omitted.
+        llm_client: Gemini client; built from the ``API_KEY`` env var when omitted.
+        registry: Resource registry; the process-wide one when omitted.
+    Returns:
+        Application whose lifespan loads the model and starts the batcher.
+    """
+    app = FastAPI(title="llm-chatbot-backend", lifespan=lifespan)
+    app.state.config = config or load_config()
+    app.state.llm_client = llm_client
+    app.state.registry = registry or get_registry()
+    app.include_router(router)
+    return app
+
+
+async def retrieve(request: Request, body: QueryRequest) -> RetrievalResult:
+    # Concurrent requests share an encoder batch, then search as main.py does
+    state = request.app.state
+    embedding = state.embedding_cache.get(body.query)
+    if embedding is None:
+        embedding = await state.batcher.embed(clean_text(body.query))
+        # put() writes to SQLite when the cache is persisted
+        await asyncio.to_thread(state.embedding_cache.put, body.query, embedding)
+    options = state.retrieval_options
+    if body.top_k:
+        options = replace(options, top_k=body.top_k)
+    return await asyncio.to_thread(
+        search,
+        body.query,
+        options,
+        query_embedding=embedding,
+        registry=state.registry,
+    )
+
+
+async def coalesced(request: Request, body: QueryRequest, kind: str, compute):
+    # In-place writes bump the version too, so a request arriving after
+    # any pipeline write starts a new flight
+    config = request.app.state.config
+    key = (
+        kind,
+        clean_text(body.query),
+        body.top_k or config.top_k,
+        read_collection_version(config.chroma_persist_path),
+    )
+    try:
+        return await request.app.state.single_flight.run(
+            key, lambda: compute(request, body)
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504, detail=f"Timed out computing the {kind}"
+        ) from None
+
+
+@router.post("/retrieve")
+async def retrieve_endpoint(request: Request, body: QueryRequest) -> RetrieveResponse:
+    result = await coalesced(request, body, "retrieval", retrieve)
+    # Reported only; counting it would skew the routes of /answer
+    decision = request.app.state.answer_policy.decide(result.documents, record=False)
+    return RetrieveResponse(
+        documents=[
+            DocumentResponse(
+                id=doc.id,
+                text=doc.text,
+                similarity=doc.similarity,
+                distance=doc.distance,
+                score=doc.score,
+                metadata=doc.metadata,
+            )
+            for doc in result.documents
+        ],
+        decision=DecisionResponse(
+            route=decision.route,
+            answer=decision.answer,
+            similarity=decision.similarity,
+            doc_id=decision.doc_id,
+        ),
+    )
+
+
+@router.post("/answer")
+async def answer_endpoint(request: Request, body: QueryRequest) -> AnswerResponse:
+    start = time.perf_counter()
+    response = await coalesced(request, body, "answer", compute_answer)
+    request.app.state.answer_stats.record(time.perf_counter() - start)
+    return response
+
+
+async def compute_answer(request: Request, body: QueryRequest) -> AnswerResponse:
+    state = request.app.state
+    result = await retrieve(request, body)
+    decision = state.answer_policy.decide(result.documents)
+    answer = decision.answer or state.answer_cache.lookup(
+        result.query_embedding, result.doc_ids
+    )
+    if answer is None:
+        if decision.route == SHORT:
+            context = []
+            max_output_tokens = state.answer_policy.short_max_output_tokens
+        else:
+            packed = state.context_packer.pack(result.documents)
+            context, max_output_tokens = packed.chunks, MAX_OUTPUT_TOKENS
+        answer = await asyncio.to_thread(
+            generate_answer,
+            state.llm_client,
+            build_prompt(body.query, context),
+            state.config.llm_model,
+            max_output_tokens,
+        )
+        state.answer_cache.store(result.query_embedding, result.doc_ids, answer)
+    return AnswerResponse(answer=answer, documents=result.contexts)
+
+
+@router.get("/health")
+async def health(request: Request) -> dict:
+    state = request.app.state
+    stats = state.batcher.stats
+    packing = state.context_packer.stats
+    routes = state.answer_policy.stats
+    response = {
+        "status": "ok",
+        "queries": state.registry.stats.queries,
+        "mean_retrieval_ms": state.registry.stats.mean_seconds * 1000,
+        "batches": stats.batches,
+        "mean_batch_size": stats.mean_batch_size,
+        "embedding_cache_hits": state.embedding_cache.hits,
+        "embedding_cache_misses": state.embedding_cache.misses,
+        "answer_cache_hits": state.answer_cache.hits,
+        "answer_cache_misses": state.answer_cache.misses,
+        "mean_answer_ms": state.answer_stats.mean_seconds * 1000,
+        "mean_context_tokens": packing.mean_tokens,
+        "mean_unpacked_context_tokens": packing.mean_source_tokens,
+        "answer_routes": dict(routes.counts),
+        "llm_skipped_rate": routes.llm_skipped_rate,
+        "coalesced_requests": state.single_flight.stats.shared,
+    }
+    reranker = state.reranker
+    if reranker:
+        response["reranked"] = reranker.stats.reranked
+        response["rerank_skipped"] = reranker.stats.skipped
+        response["rerank_cached_pairs"] = reranker.stats.cached_pairs
+    return response
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BatchStats:
+    batches: int = 0
+    items: int = 0
+    largest_batch: int = 0
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.items / self.batches if self.batches else 0.0
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-query encodes into batched model calls.
+
+    Each ``embed`` call enqueues its text and waits; a background task takes
+    the first waiting text, gathers more for up to ``max_wait_ms`` or until
+    ``max_batch_size`` texts are queued, and encodes them in one call in a
+    worker thread so the event loop keeps accepting requests.
+
+    Args:
+        encode: Function encoding a list of texts into a 2-D array, usually
+            ``SentenceTransformer.encode``.
+        max_batch_size: Largest number of texts per encode call.
+        max_wait_ms: Longest time the first text of a batch waits for more.
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[list[str]], Sequence],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 10.0,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1.")
+        self._encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.stats = BatchStats()
+        self._queue: asyncio.Queue | None = None
+        self._worker: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Returns the embedding of ``text``, batched with concurrent calls."""
+        await self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def _collect(self) -> list[tuple[str, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = await asyncio.to_thread(self._encode, texts)
+            except Exception as e:  # noqa: BLE001 - delivered to every waiter
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.stats.batches += 1
+            self.stats.items += len(batch)
+            self.stats.largest_batch = max(self.stats.largest_batch, len(batch))
+            logger.debug(f"Encoded batch of {len(batch)} queries")
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
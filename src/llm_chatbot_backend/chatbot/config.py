@@ -0,0 +1,83 @@
+from dataclasses import dataclass, fields
+
+from kedro.config import OmegaConfigLoader
+
+from .generation import LLM_MODEL
+
+
+@dataclass(frozen=True)
+class ChatbotConfig:
+    """Settings shared by the Streamlit app and the HTTP API.
+
+    ``embedding_model``, ``chroma_persist_path``, ``lexical_index_path`` and
+    ``disease_centroids_path`` come from the top-level pipeline parameters so
+    serving always reads what the pipeline wrote; everything else comes from
+    the ``chatbot`` section of parameters.yml. Without a lexical index,
+    retrieval is vector search only; without centroids, it is unfiltered.
+    """
+
+    embedding_model: str = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+    chroma_persist_path: str = "data/04_chroma_db"
+    llm_model: str = LLM_MODEL
+    lexical_index_path: str | None = None
+    disease_centroids_path: str | None = None
+    top_k: int = 5
+    hybrid_candidates: int = 20
+    rrf_k: int = 60
+    prefilter_keys: int = 3
+    prefilter_min_similarity: float = 0.5
+    rerank_model: str | None = None
+    rerank_candidates: int = 30
+    rerank_budget_ms: float = 300.0
+    rerank_cache_size: int = 4096
+    context_max_tokens: int = 1500
+    context_dedupe_threshold: float = 0.9
+    answer_min_similarity: float = 0.3
+    answer_below_floor: str = "no_match"
+    direct_answer_similarity: float = 0.9
+    direct_answer_margin: float = 0.05
+    short_answer_max_tokens: int = 150
+    conversation_memory: bool = True
+    conversation_turns: int = 3
+    conversation_max_tokens: int = 400
+    conversation_summary_tokens: int = 150
+    rewrite_turns: int = 2
+    rewrite_max_tokens: int = 100
+    max_batch_size: int = 32
+    max_wait_ms: float = 10.0
+    embedding_cache_size: int = 1024
+    embedding_cache_ttl_seconds: float | None = None
+    embedding_cache_path: str | None = None
+    answer_cache_threshold: float = 0.95
+    answer_cache_size: int = 256
+    coalesce_timeout_seconds: float | None = 30.0
+
+
+def load_config(conf_source: str = "conf", env: str | None = None) -> ChatbotConfig:
+    """Reads the chatbot settings from the Kedro configuration.
+
+    Args:
+        conf_source: Path to the Kedro ``conf`` directory.
+        env: Kedro environment overriding ``base``; defaults to ``local``.
+    Returns:
+        Chatbot settings, falling back to defaults for missing keys.
+    """
+    loader = OmegaConfigLoader(
+        conf_source=conf_source, base_env="base", default_run_env="local", env=env
+    )
+    params = loader["parameters"]
+    values = {
+        "embedding_model": params.get("embedding_model"),
+        "chroma_persist_path": params.get("chroma_persist_path"),
+        "lexical_index_path": params.get("lexical_index_path"),
+        "disease_centroids_path": params.get("disease_centroids_path"),
+        **params.get("chatbot", {}),
+    }
+    known = {f.name for f in fields(ChatbotConfig)}
+    return ChatbotConfig(
+        **{
+            key: value
+            for key, value in values.items()
+            if key in known and value is not None
+        }
+    )
@@ -0,0 +1,186 @@
+import logging
+import math
+import re
+import threading
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+
+from .retrieval import RetrievedDocument
+
+logger = logging.getLogger(__name__)
+
+# Rough Thai/English average when no tokenizer is given
+CHARS_PER_TOKEN = 3
+
+# Labels written by ``build_rag_context``
+QUESTION, REPLY, DISEASE, TAGS = (
+    "คำถามจากผู้ใช้",
+    "คำตอบจากแพทย์",
+    "โรคที่เกี่ยวข้อง",
+    "แท็ก",
+)
+_SECTION = re.compile(r"\[([^\]\n]+)\]\s*(.*?)\s*(?=\n\s*\[[^\]\n]+\]|\Z)", re.S)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def approx_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def tokenizer_counter(tokenizer) -> Callable[[str], int]:
+    """Counts tokens with a local Hugging Face tokenizer, e.g. the embedding model's."""
+
+    def count(text: str) -> int:
+        return len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    return count
+
+
+def _sections(text: str) -> dict[str, str]:
+    return {
+        label: _WHITESPACE.sub(" ", body).strip()
+        for label, body in _SECTION.findall(text)
+    }
+
+
+def doctor_reply(text: str) -> str | None:
+    """Returns the doctor's reply of a ``build_rag_context`` block, if it has one."""
+    return _sections(text).get(REPLY) or None
+
+
+def truncate_to_tokens(
+    text: str, max_tokens: int, count_tokens: Callable[[str], int] = approx_tokens
+) -> str:
+    """Cuts ``text`` short until ``count_tokens`` fits it in ``max_tokens``."""
+    while text and count_tokens(text) > max_tokens:
+        ratio = max_tokens / count_tokens(text)
+        text = text[: min(len(text) - 1, int(len(text) * ratio))]
+    return text
+
+
+def compact_context(text: str) -> tuple[str, str]:
+    """Rewrites a ``build_rag_context`` block without its formatting overhead.
+
+    Returns:
+        The compact chunk, and the doctor's reply used to spot duplicates.
+        Text in another format is returned with its whitespace collapsed.
+    """
+    sections = _sections(text)
+    if REPLY not in sections:
+        collapsed = _WHITESPACE.sub(" ", text).strip()
+        return collapsed, collapsed
+
+    lines = [f"ถาม: {sections.get(QUESTION, '')}", f"แพทย์ตอบ: {sections[REPLY]}"]
+    disease = sections.get(DISEASE, "")
+    # Tags mostly repeat the disease name or words of the question
+    tags = [
+        tag
+        for tag in dict.fromkeys(t.strip() for t in sections.get(TAGS, "").split(","))
+        if tag and tag not in disease and tag not in sections.get(QUESTION, "")
+    ]
+    about = "; ".join(part for part in [disease, ", ".join(tags)] if part)
+    if about:
+        lines.append(f"โรค: {about}")
+    return "\n".join(lines), sections[REPLY]
+
+
+def _shingles(text: str, size: int = 3) -> set[str]:
+    text = _WHITESPACE.sub("", text).lower()
+    return {text[i : i + size] for i in range(max(1, len(text) - size + 1))}
+
+
+def _similarity(a: set[str], b: set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+@dataclass
+class PackedContext:
+    chunks: list[str]
+    doc_ids: list[str]
+    tokens: int
+    source_tokens: int
+    duplicates: int = 0
+    over_budget: int = 0
+
+
+@dataclass
+class PackingStats:
+    prompts: int = 0
+    tokens: int = 0
+    source_tokens: int = 0
+
+    @property
+    def mean_tokens(self) -> float:
+        return self.tokens / self.prompts if self.prompts else 0.0
+
+    @property
+    def mean_source_tokens(self) -> float:
+        return self.source_tokens / self.prompts if self.prompts else 0.0
+
+
+@dataclass
+class ContextPacker:
+    """Fits retrieved documents into a token budget for the Gemini prompt.
+
+    Documents are ordered by reranker score when present, otherwise kept in
+    retrieval order. Each is rewritten without labels, indentation and
+    repeated tags, and dropped if its doctor's reply nearly matches one
+    already packed. Chunks are then added while they fit in ``max_tokens``;
+    the first chunk is shortened rather than dropped.
+
+    Args:
+        max_tokens: Token budget of the packed context.
+        dedupe_threshold: Character-trigram Jaccard similarity at which two
+            replies count as the same.
+        count_tokens: Token counter, e.g. from ``tokenizer_counter``; defaults
+            to a character-based estimate.
+    """
+
+    max_tokens: int = 1500
+    dedupe_threshold: float = 0.9
+    count_tokens: Callable[[str], int] = approx_tokens
+    stats: PackingStats = field(default_factory=PackingStats)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def pack(self, documents: Sequence[RetrievedDocument]) -> PackedContext:
+        ranked = list(documents)
+        if ranked and all(doc.score is not None for doc in ranked):
+            ranked.sort(key=lambda doc: -doc.score)
+        chunks, doc_ids, seen = [], [], []
+        tokens = duplicates = over_budget = 0
+        for doc in ranked:
+            chunk, reply = compact_context(doc.text)
+            shingles = _shingles(reply)
+            if any(_similarity(shingles, s) >= self.dedupe_threshold for s in seen):
+                duplicates += 1
+                continue
+            chunk_tokens = self.count_tokens(chunk)
+            if tokens + chunk_tokens > self.max_tokens:
+                if chunks:
+                    over_budget += 1
+                    continue
+                chunk = truncate_to_tokens(chunk, self.max_tokens, self.count_tokens)
+                chunk_tokens = self.count_tokens(chunk)
+            seen.append(shingles)
+            chunks.append(chunk)
+            doc_ids.append(doc.id)
+            tokens += chunk_tokens
+
+        packed = PackedContext(
+            chunks=chunks,
+            doc_ids=doc_ids,
+            tokens=tokens,
+            source_tokens=self.count_tokens(str([doc.text for doc in documents])),
+            duplicates=duplicates,
+            over_budget=over_budget,
+        )
+        with self._lock:
+            self.stats.prompts += 1
+            self.stats.tokens += packed.tokens
+            self.stats.source_tokens += packed.source_tokens
+        logger.info(
+            f"Packed {len(chunks)}/{len(documents)} documents into {tokens} tokens "
+            f"(from {packed.source_tokens}; {duplicates} duplicates, "
+            f"{over_budget} over budget)"
+        )
+        return packed
@@ -0,0 +1,108 @@
+import logging
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from .context_packing import approx_tokens, truncate_to_tokens
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_HEADER = "สรุปบทสนทนาก่อนหน้า:"
+# Share of a folded turn kept in the summary
+FOLD_QUESTION_TOKENS = 30
+FOLD_ANSWER_TOKENS = 40
+
+
+@dataclass(frozen=True)
+class Turn:
+    question: str
+    answer: str
+
+
+@dataclass
+class ConversationMemory:
+    """Bounded history of one chat session.
+
+    The last ``max_turns`` turns are kept verbatim. Older turns are folded
+    into a rolling summary, one line per turn holding the start of the
+    question and of the answer; once the summary exceeds ``summary_tokens``
+    its oldest lines are dropped. Folding is extractive, so it costs no
+    Gemini call and the history sent with each question stays under
+    ``max_tokens`` however long the chat runs.
+
+    Args:
+        max_turns: Recent turns kept verbatim.
+        max_tokens: Token cap of the history block, summary included.
+        summary_tokens: Token cap of the rolling summary.
+        rewrite_turns: Earlier questions added to the retrieval query.
+        rewrite_max_tokens: Token cap of the retrieval query, which the
+            embedding model would otherwise truncate.
+        count_tokens: Token counter, e.g. from ``tokenizer_counter``.
+    """
+
+    max_turns: int = 3
+    max_tokens: int = 400
+    summary_tokens: int = 150
+    rewrite_turns: int = 2
+    rewrite_max_tokens: int = 100
+    count_tokens: Callable[[str], int] = approx_tokens
+    turns: list[Turn] = field(default_factory=list)
+    summary: str = ""
+
+    def add_turn(self, question: str, answer: str) -> None:
+        self.turns.append(Turn(question, answer))
+        while len(self.turns) > self.max_turns:
+            self._fold(self.turns.pop(0))
+
+    def rewrite_query(self, query: str) -> str:
+        """Prefixes a follow-up question with the previous questions for retrieval.
+
+        Earlier questions are added newest first while the query stays under
+        ``rewrite_max_tokens``, so "แล้วถ้าเป็นเด็กล่ะ" is searched together
+        with the question it follows up on.
+        """
+        previous = self.turns[-self.rewrite_turns :] if self.rewrite_turns else []
+        parts = [query]
+        for turn in reversed(previous):
+            candidate = [turn.question, *parts]
+            if self.count_tokens(" ".join(candidate)) > self.rewrite_max_tokens:
+                break
+            parts = candidate
+        return " ".join(parts)
+
+    def history_block(self) -> str:
+        """Renders the summary and the recent turns for the Gemini prompt.
+
+        Recent turns are added newest first; the oldest one that does not fit
+        is cut short and anything before it left out.
+        """
+        summary = f"{SUMMARY_HEADER}\n{self.summary}" if self.summary else ""
+        budget = self.max_tokens - self.count_tokens(summary)
+        recent = []
+        for turn in reversed(self.turns):
+            if budget <= 0:
+                break
+            text = f"ผู้ใช้: {turn.question}\nผู้ช่วย: {turn.answer}"
+            tokens = self.count_tokens(text)
+            if tokens > budget:
+                text = truncate_to_tokens(text, budget, self.count_tokens)
+            recent.append(text)
+            budget -= tokens
+        block = "\n\n".join(part for part in [summary, *reversed(recent)] if part)
+        return truncate_to_tokens(block, self.max_tokens, self.count_tokens)
+
+    def _fold(self, turn: Turn) -> None:
+        # One line per turn, so the oldest turns are dropped line by line
+        question, answer = (
+            " ".join(text.split()) for text in (turn.question, turn.answer)
+        )
+        question = truncate_to_tokens(question, FOLD_QUESTION_TOKENS, self.count_tokens)
+        answer = truncate_to_tokens(answer, FOLD_ANSWER_TOKENS, self.count_tokens)
+        lines = [*self.summary.splitlines(), f"- {question}: {answer}"]
+        while len(lines) > 1 and self.count_tokens("\n".join(lines)) > (
+            self.summary_tokens
+        ):
+            lines.pop(0)
+        self.summary = truncate_to_tokens(
+            "\n".join(lines), self.summary_tokens, self.count_tokens
+        )
+        logger.debug(f"Folded a turn into the summary, {len(lines)} lines kept")
@@ -0,0 +1,149 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from llm_chatbot_backend.pipelines.data_processing.nodes import clean_text
+
+logger = logging.getLogger(__name__)
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU cache of query embeddings keyed on the cleaned query.
+
+    Queries are normalised with the pipeline's ``clean_text`` so spacing,
+    emoji and repeated characters do not cause a fresh encode. Entries are
+    evicted least-recently-used first and, when ``ttl_seconds`` is set,
+    expire after that many seconds. With ``persist_path`` the cache is
+    mirrored to SQLite and reloaded on start, so it survives restarts.
+
+    Args:
+        embed_model: Name of the model the embeddings come from; entries of
+            other models are never returned.
+        max_size: Largest number of cached queries.
+        ttl_seconds: Optional lifetime of an entry.
+        persist_path: Optional SQLite file backing the cache.
+    """
+
+    def __init__(
+        self,
+        embed_model: str,
+        max_size: int = 1024,
+        ttl_seconds: float | None = None,
+        persist_path: str | None = None,
+    ):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1.")
+        self.embed_model = embed_model
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, tuple[np.ndarray, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = self._open(persist_path) if persist_path else None
+
+    @staticmethod
+    def key(query: str) -> str:
+        return clean_text(query)
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, query: str) -> np.ndarray | None:
+        """Returns the cached embedding of ``query``, or None on a miss."""
+        key = self.key(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self._expired(entry[1]):
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, query: str, embedding) -> None:
+        key = self.key(query)
+        if not key:
+            return
+        vector = np.asarray(embedding, dtype=np.float32)
+        created = time.time()
+        with self._lock:
+            self._entries[key] = (vector, created)
+            self._entries.move_to_end(key)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?, ?, ?)",
+                    (self.embed_model, key, vector.tobytes(), created),
+                )
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+            if self._db is not None:
+                self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute(
+                    "DELETE FROM query_embeddings WHERE model = ?", (self.embed_model,)
+                )
+                self._db.commit()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+
+    def _remove(self, key: str) -> None:
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute(
+                "DELETE FROM query_embeddings WHERE model = ? AND query = ?",
+                (self.embed_model, key),
+            )
+
+    def _open(self, persist_path: str) -> sqlite3.Connection:
+        Path(persist_path).parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(persist_path, check_same_thread=False)
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS query_embeddings ("
+            "model TEXT, query TEXT, embedding BLOB, created REAL, "
+            "PRIMARY KEY (model, query))"
+        )
+        rows = db.execute(
+            "SELECT query, embedding, created FROM query_embeddings "
+            "WHERE model = ? ORDER BY created DESC LIMIT ?",
+            (self.embed_model, self.max_size),
+        ).fetchall()
+        for query, blob, created in reversed(rows):
+            if not self._expired(created):
+                self._entries[query] = (np.frombuffer(blob, dtype=np.float32), created)
+        logger.info(f"Loaded {len(self._entries)} cached query embeddings")
+        return db
+
+
+def embed_query(model, query: str, cache: QueryEmbeddingCache | None = None):
+    """Encodes ``query`` with ``model``, going through ``cache`` when given.
+
+    The cleaned query the cache is keyed on is what gets encoded, so every
+    variant of a query gets the same embedding, cached or not.
+    """
+    if cache is not None:
+        embedding = cache.get(query)
+        if embedding is not None:
+            return embedding
+    embedding = model.encode([clean_text(query)])[0]
+    if cache is not None:
+        cache.put(query, embedding)
+    return embedding
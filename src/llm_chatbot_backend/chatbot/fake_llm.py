@@ -0,0 +1,52 @@
+"""Offline stand-in for ``genai.Client`` used by tests and local benchmarks."""
+
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+
+
+@dataclass
+class FakeModels:
+    """Mimics ``client.models`` with a canned answer and configurable delays.
+
+    Attributes:
+        answer: Text returned by every call.
+        first_token_delay: Seconds before the first chunk (or full answer).
+        chunk_delay: Seconds between consecutive chunks.
+        chunk_size: Number of characters per streamed chunk.
+    """
+
+    answer: str = "นี่คือคำตอบทดสอบ"
+    first_token_delay: float = 0.0
+    chunk_delay: float = 0.0
+    chunk_size: int = 8
+    calls: list[dict] = field(default_factory=list)
+    chunks_sent: int = 0
+
+    def generate_content(self, *, model, contents, config=None):
+        self.calls.append({"model": model, "contents": contents, "config": config})
+        time.sleep(self.first_token_delay + self.chunk_delay * (self._num_chunks() - 1))
+        return SimpleNamespace(text=self.answer)
+
+    def generate_content_stream(self, *, model, contents, config=None):
+        self.calls.append({"model": model, "contents": contents, "config": config})
+        return self._stream()
+
+    def _num_chunks(self) -> int:
+        return max(1, -(-len(self.answer) // self.chunk_size))
+
+    def _stream(self) -> Iterator[SimpleNamespace]:
+        time.sleep(self.first_token_delay)
+        for i in range(0, len(self.answer), self.chunk_size):
+            if i:
+                time.sleep(self.chunk_delay)
+            self.chunks_sent += 1
+            yield SimpleNamespace(text=self.answer[i : i + self.chunk_size])
+
+
+class FakeStreamingClient:
+    """Drop-in replacement for ``genai.Client`` that never leaves the machine."""
+
+    def __init__(self, **kwargs):
+        self.models = FakeModels(**kwargs)
@@ -0,0 +1,105 @@
+import logging
+import threading
+import time
+from collections.abc import Iterator
+
+from google import genai
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+LLM_MODEL = "gemini-2.0-flash"
+MAX_OUTPUT_TOKENS = 500
+SYSTEM_INSTRUCTION = "คุณเป็นผู้ช่วยที่สามารถให้คำแนะนำเกี่ยวกับการแพทย์ได้"
+
+
+def build_prompt(user_query: str, context: list[str], history: str = "") -> str:
+    """Builds the Gemini prompt from the user query and retrieved context.
+
+    Context chunks are numbered and separated by blank lines, best first.
+    ``history`` is the conversation so far, e.g. from ``ConversationMemory``.
+    """
+    numbered = "\n\n".join(f"[{i}] {chunk}" for i, chunk in enumerate(context, 1))
+    conversation = f"    Conversation so far:\n{history}\n" if history else ""
+    return f"""
+    คุณเป็นผู้ช่วยที่สามารถให้คำแนะนำเกี่ยวกับการแพทย์ได้โดยอิงจาก context ที่มีให้แล้วนำมาวิเคราะห์โดยอิงจากข้อความให้มากที่สุด.
+    **สำคัญ**: ตอนตอบกลับ ให้ตอบราวกับเป็นคำตอบตรงประเด็นจากผู้ช่วยทางการแพทย์ในระบบสนทนา ถ้าสามารถให้คำแนะนำได้ให้ทำเลยโดยอิงจากข้อมูลที่มีให้ใน context.
+{conversation}    Context:
+{numbered}
+    User's questiion: {user_query}
+    """
+
+
+def build_generation_config(
+    max_output_tokens: int = MAX_OUTPUT_TOKENS,
+) -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(
+        max_output_tokens=max_output_tokens,
+        system_instruction=SYSTEM_INSTRUCTION,
+        temperature=0.2,
+    )
+
+
+def generate_answer(
+    client: genai.Client,
+    prompt: str,
+    model: str = LLM_MODEL,
+    max_output_tokens: int = MAX_OUTPUT_TOKENS,
+) -> str:
+    """Generate response using Gemini LLM for a prompt from ``build_prompt``."""
+    response = client.models.generate_content(
+        model=model,
+        contents=prompt,
+        config=build_generation_config(max_output_tokens),
+    )
+
+    return response.text or ""
+
+
+def stream_answer(
+    client: genai.Client,
+    prompt: str,
+    cancel_event: threading.Event | None = None,
+    model: str = LLM_MODEL,
+    max_output_tokens: int = MAX_OUTPUT_TOKENS,
+) -> Iterator[str]:
+    """Streams the Gemini answer chunk by chunk as it is generated.
+
+    Uses the same config as ``generate_answer``. The underlying
+    stream is closed when the consumer stops iterating or ``cancel_event``
+    is set, so an abandoned answer does not keep the connection open.
+
+    Args:
+        client: Gemini client.
+        prompt: Question, retrieved contexts and history, from ``build_prompt``.
+        cancel_event: Optional event that stops the stream when set.
+        model: Gemini model name.
+        max_output_tokens: Longest answer Gemini may generate.
+    Yields:
+        Text chunks in the order Gemini emits them.
+    """
+    start = time.perf_counter()
+    stream = client.models.generate_content_stream(
+        model=model,
+        contents=prompt,
+        config=build_generation_config(max_output_tokens),
+    )
+    first_chunk_at = None
+    try:
+        for chunk in stream:
+            if cancel_event is not None and cancel_event.is_set():
+                logger.info("Answer stream cancelled")
+                return
+            if not chunk.text:
+                continue
+            if first_chunk_at is None:
+                first_chunk_at = time.perf_counter()
+                logger.info(
+                    f"Time to first token: {(first_chunk_at - start) * 1000:.0f} ms"
+                )
+            yield chunk.text
+    finally:
+        close = getattr(stream, "close", None)
+        if close is not None:
+            close()
+        logger.info(f"Answer streamed in {time.perf_counter() - start:.2f}s")
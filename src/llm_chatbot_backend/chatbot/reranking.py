@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING
+
+from sentence_transformers import CrossEncoder
+
+from llm_chatbot_backend.pipelines.data_processing.nodes import clean_text
+
+if TYPE_CHECKING:  # retrieval imports this module
+    from .retrieval import RetrievedDocument
+
+logger = logging.getLogger(__name__)
+
+RERANK_MODEL = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+WARMUP_PAIR = ("ปวดหัวบ่อย ควรทำอย่างไร", "ควรพักผ่อนให้เพียงพอ")
+WARMUP_BATCH = 16
+
+
+@dataclass
+class RerankStats:
+    reranked: int = 0
+    skipped: int = 0
+    scored_pairs: int = 0
+    cached_pairs: int = 0
+
+
+class Reranker:
+    """Reorders retrieved documents by cross-encoder relevance to the query.
+
+    All uncached (query, document) pairs are scored in one batched CPU call.
+    Scores are cached per cleaned query, document id and content hash, so
+    repeated questions cost nothing. The cost per pair is measured as the
+    reranker runs; when scoring the uncached pairs would take longer than
+    ``budget_ms``, reranking is skipped and the retrieval order kept.
+
+    Args:
+        model_name: Name of the CrossEncoder model.
+        budget_ms: Longest expected scoring time allowed for one query.
+        cache_size: Largest number of cached pair scores.
+        max_length: Token limit of each (query, document) pair.
+    """
+
+    def __init__(
+        self,
+        model_name: str = RERANK_MODEL,
+        budget_ms: float = 300.0,
+        cache_size: int = 4096,
+        max_length: int = 256,
+    ):
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+        self.max_length = max_length
+        self.stats = RerankStats()
+        self._model: CrossEncoder | None = None
+        self._ms_per_pair: float | None = None
+        self._scores: OrderedDict[tuple, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def warm_up(self) -> None:
+        """Loads the model and measures the cost of scoring a pair."""
+        self._score([WARMUP_PAIR])  # pays for lazy initialisation
+        self._ms_per_pair = None
+        self._score([WARMUP_PAIR] * WARMUP_BATCH)
+
+    def rerank(
+        self, query: str, documents: Sequence["RetrievedDocument"], top_k: int
+    ) -> list["RetrievedDocument"]:
+        """Returns the ``top_k`` documents the cross-encoder ranks highest.
+
+        Args:
+            query: Question typed by the user.
+            documents: Retrieved candidates, best first.
+            top_k: Number of documents to keep.
+        Returns:
+            The best documents with their ``score`` set, or the first
+            ``top_k`` candidates unchanged when over the latency budget.
+        """
+        query_key = clean_text(query)
+        keys = [self._key(query_key, doc) for doc in documents]
+        with self._lock:
+            scores = [self._scores.get(key) for key in keys]
+            for key, score in zip(keys, scores):
+                if score is not None:
+                    self._scores.move_to_end(key)
+        missing = [i for i, score in enumerate(scores) if score is None]
+
+        if missing:
+            estimate = len(missing) * (self._ms_per_pair or 0.0)
+            if estimate > self.budget_ms:
+                self.stats.skipped += 1
+                # Lowered on every skip, so scoring is retried once the
+                # machine is less busy instead of staying off for good
+                self._ms_per_pair *= 0.9
+                logger.info(
+                    f"Skipped reranking {len(missing)} pairs, expected "
+                    f"{estimate:.0f} ms over the {self.budget_ms:.0f} ms budget"
+                )
+                return list(documents[:top_k])
+            new_scores = self._score([(query, documents[i].text) for i in missing])
+            with self._lock:
+                for i, score in zip(missing, new_scores):
+                    scores[i] = score
+                    self._scores[keys[i]] = score
+                while len(self._scores) > self.cache_size:
+                    self._scores.popitem(last=False)
+
+        self.stats.reranked += 1
+        self.stats.scored_pairs += len(missing)
+        self.stats.cached_pairs += len(documents) - len(missing)
+        order = sorted(range(len(documents)), key=lambda i: -scores[i])[:top_k]
+        return [replace(documents[i], score=scores[i]) for i in order]
+
+    def _score(self, pairs: list[tuple[str, str]]) -> list[float]:
+        model = self._load()
+        start = time.perf_counter()
+        scores = model.predict(pairs, batch_size=len(pairs), show_progress_bar=False)
+        ms_per_pair = (time.perf_counter() - start) * 1000 / len(pairs)
+        # Smoothed, so one slow call does not skip the next queries
+        self._ms_per_pair = (
+            ms_per_pair
+            if self._ms_per_pair is None
+            else 0.8 * self._ms_per_pair + 0.2 * ms_per_pair
+        )
+        return [float(score) for score in scores]
+
+    def _load(self) -> CrossEncoder:
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    start = time.perf_counter()
+                    self._model = CrossEncoder(
+                        self.model_name, device="cpu", max_length=self.max_length
+                    )
+                    logger.info(
+                        f"Loaded {self.model_name} in "
+                        f"{time.perf_counter() - start:.2f}s"
+                    )
+        return self._model
+
+    @staticmethod
+    def _key(query_key: str, document: "RetrievedDocument") -> tuple:
+        content_hash = (document.metadata or {}).get("content_hash")
+        return query_key, document.id, content_hash
@@ -0,0 +1,196 @@
+import logging
+import os
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field, replace
+from typing import TypeVar
+
+import chromadb
+from chromadb.errors import NotFoundError
+from sentence_transformers import SentenceTransformer
+
+from llm_chatbot_backend.disease_index import DiseaseCentroids
+from llm_chatbot_backend.embedding_models import load_embedding_model
+from llm_chatbot_backend.lexical_index import BM25Index
+from llm_chatbot_backend.vector_store import CHROMA_COLLECTION, active_collection_name
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+WARMUP_QUERY = "ปวดหัว"
+
+
+@dataclass
+class RetrievalResources:
+    """Embedding model and Chroma handles loaded for one (model, path) pair."""
+
+    embed_model: str
+    persist_path: str
+    model: SentenceTransformer
+    client: chromadb.ClientAPI
+    collection: chromadb.Collection
+    load_seconds: float
+    collection_name: str = CHROMA_COLLECTION
+
+
+@dataclass
+class LatencyStats:
+    """Running counters for the queries served with the current resources."""
+
+    queries: int = 0
+    total_seconds: float = 0.0
+    last_seconds: float = 0.0
+
+    def record(self, seconds: float) -> None:
+        self.queries += 1
+        self.total_seconds += seconds
+        self.last_seconds = seconds
+
+    @property
+    def mean_seconds(self) -> float:
+        return self.total_seconds / self.queries if self.queries else 0.0
+
+
+@dataclass
+class ResourceRegistry:
+    """Process-wide holder for the retrieval resources.
+
+    Resources are loaded on first use and kept until a different embedding
+    model or persist path is requested, so Streamlit reruns and sessions
+    share a single model and Chroma client. When the pipeline points readers
+    at a rebuilt collection, only the collection handle is swapped; queries
+    already running finish on the previous one.
+    """
+
+    collection_name: str = CHROMA_COLLECTION
+    stats: LatencyStats = field(default_factory=LatencyStats)
+    _resources: RetrievalResources | None = field(default=None, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    # Indexes written by the pipeline, with the mtime they were loaded at
+    _files: dict[str, tuple[int, object]] = field(default_factory=dict, repr=False)
+
+    def get(self, embed_model: str, persist_path: str) -> RetrievalResources:
+        """Returns the loaded resources, (re)loading them if the key changed.
+
+        Args:
+            embed_model: Name of the SentenceTransformer model.
+            persist_path: Directory of the persistent Chroma client.
+        Returns:
+            Loaded retrieval resources.
+        """
+        resources = self._resources
+        if self._matches(resources, embed_model, persist_path):
+            return self._follow_pointer(resources)
+
+        with self._lock:
+            resources = self._resources
+            if not self._matches(resources, embed_model, persist_path):
+                resources = self._load(embed_model, persist_path)
+                self._resources = resources
+                self.stats = LatencyStats()
+            return resources
+
+    def _follow_pointer(self, resources: RetrievalResources) -> RetrievalResources:
+        name = active_collection_name(resources.persist_path, self.collection_name)
+        if name == resources.collection_name:
+            return resources
+        with self._lock:
+            current = self._resources
+            if current is not resources:
+                return current
+            try:
+                collection = resources.client.get_collection(name=name)
+            except NotFoundError:
+                logger.warning(
+                    f"Collection {name} not found, still serving "
+                    f"{resources.collection_name}"
+                )
+                return resources
+            logger.info(f"Switching from {resources.collection_name} to {name}")
+            self._resources = replace(
+                resources, collection=collection, collection_name=name
+            )
+            return self._resources
+
+    def lexical_index(self, index_path: str | None) -> BM25Index | None:
+        """Returns the BM25 index at ``index_path``, reloading it when rewritten.
+
+        Returns None when no path is configured or the pipeline has not
+        written the index yet, so retrieval falls back to vector search.
+        """
+        return self._load_file(index_path, BM25Index.load)
+
+    def disease_centroids(self, centroids_path: str | None) -> DiseaseCentroids | None:
+        """Returns the disease centroids at ``centroids_path``, like ``lexical_index``."""
+        return self._load_file(centroids_path, DiseaseCentroids.load)
+
+    def _load_file(self, path: str | None, loader: Callable[[str], T]) -> T | None:
+        if not path:
+            return None
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        cached = self._files.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with self._lock:
+            cached = self._files.get(path)
+            if not (cached and cached[0] == mtime):
+                start = time.perf_counter()
+                cached = (mtime, loader(path))
+                self._files[path] = cached
+                logger.info(f"Loaded {path} in {time.perf_counter() - start:.2f}s")
+            return cached[1]
+
+    def record_query(self, seconds: float) -> None:
+        self.stats.record(seconds)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._resources = None
+            self._files = {}
+            self.stats = LatencyStats()
+
+    @staticmethod
+    def _matches(
+        resources: RetrievalResources | None, embed_model: str, persist_path: str
+    ) -> bool:
+        return (
+            resources is not None
+            and resources.embed_model == embed_model
+            and resources.persist_path == persist_path
+        )
+
+    def _load(self, embed_model: str, persist_path: str) -> RetrievalResources:
+        start = time.perf_counter()
+        client = chromadb.PersistentClient(path=persist_path)
+        collection_name = active_collection_name(persist_path, self.collection_name)
+        collection = client.get_or_create_collection(name=collection_name)
+        model = load_embedding_model(embed_model)
+        # A first encode pays for lazy initialisation inside torch/tokenizers,
+        # so do it here rather than on the first user question.
+        model.encode([WARMUP_QUERY])
+        load_seconds = time.perf_counter() - start
+        logger.info(
+            f"Loaded {embed_model} and Chroma at {persist_path} in {load_seconds:.2f}s"
+        )
+        return RetrievalResources(
+            embed_model=embed_model,
+            persist_path=persist_path,
+            model=model,
+            client=client,
+            collection=collection,
+            load_seconds=load_seconds,
+            collection_name=collection_name,
+        )
+
+
+_registry = ResourceRegistry()
+
+
+def get_registry() -> ResourceRegistry:
+    """Returns the registry shared by every caller in this process."""
+    return _registry
@@ -0,0 +1,368 @@
+import logging
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+
+import chromadb
+import numpy as np
+
+from llm_chatbot_backend.disease_index import DiseaseCentroids
+from llm_chatbot_backend.lexical_index import BM25Index
+
+from .config import ChatbotConfig
+from .embedding_cache import QueryEmbeddingCache, embed_query
+from .reranking import Reranker
+from .resources import ResourceRegistry, get_registry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class RetrievedDocument:
+    id: str
+    text: str
+    distance: float | None = None
+    metadata: dict | None = None
+    score: float | None = None  # cross-encoder relevance, when reranked
+    similarity: float | None = None  # cosine similarity to the query
+
+
+@dataclass(frozen=True)
+class RetrievalResult:
+    query_embedding: np.ndarray
+    documents: list[RetrievedDocument]
+
+    @property
+    def contexts(self) -> list[str]:
+        return [doc.text for doc in self.documents]
+
+    @property
+    def doc_ids(self) -> tuple[str, ...]:
+        return tuple(doc.id for doc in self.documents)
+
+
+@dataclass(frozen=True)
+class RetrievalOptions:
+    """What :func:`search` retrieves and how.
+
+    With a lexical index, the vector and BM25 results are fused with
+    reciprocal rank fusion; otherwise only vector search is used. With
+    disease centroids, vector search is first limited to the likeliest
+    diseases. With a reranker, ``rerank_candidates`` documents are retrieved
+    and the cross-encoder keeps the best ``top_k``.
+
+    Args:
+        embed_model: Name of the SentenceTransformer model.
+        persist_path: Directory of the persistent Chroma client.
+        top_k: Number of documents to return.
+        lexical_index_path: Optional BM25 index written by the pipeline.
+        candidates: Results taken from each retriever before fusion.
+        rrf_k: Reciprocal rank fusion constant.
+        disease_centroids_path: Optional centroid index written by the pipeline.
+        prefilter_keys: Disease keys searched when prefiltering.
+        prefilter_min_similarity: Best-hit similarity below which the
+            prefilter is dropped.
+        reranker: Optional cross-encoder reranker.
+        rerank_candidates: Candidate pool handed to the reranker.
+    """
+
+    embed_model: str
+    persist_path: str
+    top_k: int = 5
+    lexical_index_path: str | None = None
+    candidates: int = 20
+    rrf_k: int = 60
+    disease_centroids_path: str | None = None
+    prefilter_keys: int = 3
+    prefilter_min_similarity: float = 0.5
+    reranker: Reranker | None = None
+    rerank_candidates: int = 30
+
+    @classmethod
+    def from_config(
+        cls, config: ChatbotConfig, reranker: Reranker | None = None
+    ) -> "RetrievalOptions":
+        """Takes the retrieval settings of the chatbot configuration."""
+        return cls(
+            embed_model=config.embedding_model,
+            persist_path=config.chroma_persist_path,
+            top_k=config.top_k,
+            lexical_index_path=config.lexical_index_path,
+            candidates=config.hybrid_candidates,
+            rrf_k=config.rrf_k,
+            disease_centroids_path=config.disease_centroids_path,
+            prefilter_keys=config.prefilter_keys,
+            prefilter_min_similarity=config.prefilter_min_similarity,
+            reranker=reranker,
+            rerank_candidates=config.rerank_candidates,
+        )
+
+
+def search(
+    user_query: str,
+    options: RetrievalOptions,
+    cache: QueryEmbeddingCache | None = None,
+    *,
+    query_embedding: Sequence[float] | None = None,
+    registry: ResourceRegistry | None = None,
+) -> RetrievalResult:
+    """Embeds the user query and finds the closest forum documents.
+
+    Args:
+        user_query: Question typed by the user.
+        options: Retrieval settings, see :class:`RetrievalOptions`.
+        cache: Optional cache of query embeddings.
+        query_embedding: Embedding of the query when the caller already has
+            it, e.g. from the API's batcher; ``cache`` is then not used.
+        registry: Resource registry; the process-wide one when omitted.
+    Returns:
+        Query embedding and the most similar documents.
+    """
+    registry = registry or get_registry()
+    resources = registry.get(options.embed_model, options.persist_path)
+    index = registry.lexical_index(options.lexical_index_path)
+    centroids = registry.disease_centroids(options.disease_centroids_path)
+    prefilter = (
+        Prefilter(centroids, options.prefilter_keys, options.prefilter_min_similarity)
+        if centroids is not None
+        else None
+    )
+    reranker = options.reranker
+    query_options = QueryOptions(
+        top_k=max(options.top_k, options.rerank_candidates)
+        if reranker
+        else options.top_k,
+        candidates=options.candidates,
+        rrf_k=options.rrf_k,
+        prefilter=prefilter,
+    )
+
+    start = time.perf_counter()
+    if query_embedding is None:
+        query_embedding = embed_query(resources.model, user_query, cache)
+    encoded = time.perf_counter()
+    if index is None:
+        documents = query_collection(
+            resources.collection, query_embedding, query_options.top_k, prefilter
+        )
+    else:
+        documents = hybrid_query(
+            resources.collection, index, user_query, query_embedding, query_options
+        )
+    queried = time.perf_counter()
+    if reranker:
+        documents = reranker.rerank(user_query, documents, options.top_k)
+    finished = time.perf_counter()
+
+    registry.record_query(finished - start)
+    logger.info(
+        f"Retrieved top-{options.top_k} {'hybrid' if index else 'dense'} in "
+        f"{(finished - start) * 1000:.1f} ms "
+        f"(encode {(encoded - start) * 1000:.1f} ms, "
+        f"query {(queried - encoded) * 1000:.1f} ms"
+        + (f", rerank {(finished - queried) * 1000:.1f} ms)" if reranker else ")")
+    )
+
+    return RetrievalResult(np.asarray(query_embedding), documents)
+
+
+def retrieve_relevant_documents(
+    user_query: str,
+    embed_model: str,
+    persist_path: str,
+    top_k: int = 5,
+    cache: QueryEmbeddingCache | None = None,
+) -> list[RetrievedDocument]:
+    """Retrieves the forum documents closest to the user query.
+
+    Each hit keeps its id, metadata, Chroma distance and cosine similarity,
+    so callers can judge how relevant the retrieval was.
+    """
+    options = RetrievalOptions(embed_model, persist_path, top_k=top_k)
+    return search(user_query, options, cache).documents
+
+
+@dataclass(frozen=True)
+class Prefilter:
+    """Narrows vector search to the diseases a query is most likely about.
+
+    Args:
+        centroids: Disease centroids built by the pipeline.
+        max_keys: Number of likeliest disease keys to search.
+        min_similarity: Cosine similarity the best filtered hit must reach.
+            Below it, or with fewer than ``top_k`` hits, the whole
+            collection is searched instead.
+    """
+
+    centroids: DiseaseCentroids
+    max_keys: int = 3
+    min_similarity: float = 0.5
+
+
+@dataclass(frozen=True)
+class QueryOptions:
+    """How :func:`hybrid_query` searches one collection.
+
+    Args:
+        top_k: Number of documents to return.
+        candidates: Results taken from each retriever before fusion.
+        rrf_k: Reciprocal rank fusion constant.
+        prefilter: Optional disease prefilter for the vector search.
+    """
+
+    top_k: int = 5
+    candidates: int = 20
+    rrf_k: int = 60
+    prefilter: Prefilter | None = None
+
+
+# Embeddings are only used to compute the cosine similarity of each hit
+_INCLUDE = ["documents", "metadatas", "distances", "embeddings"]
+
+
+def query_collection(
+    collection: chromadb.Collection,
+    query_embedding: Sequence[float],
+    top_k: int = 5,
+    prefilter: Prefilter | None = None,
+) -> list[RetrievedDocument]:
+    """Returns the ``top_k`` documents nearest to an embedding.
+
+    The collection uses L2 distance on unnormalized embeddings, so the
+    embeddings are fetched too and each hit gets its cosine ``similarity``.
+    """
+    if prefilter is not None:
+        documents = _prefiltered_query(collection, query_embedding, top_k, prefilter)
+        if documents is not None:
+            return documents
+    results = collection.query(
+        query_embeddings=[query_embedding], n_results=top_k, include=_INCLUDE
+    )
+    return _documents(results, query_embedding)
+
+
+def _prefiltered_query(
+    collection: chromadb.Collection,
+    query_embedding: Sequence[float],
+    top_k: int,
+    prefilter: Prefilter,
+) -> list[RetrievedDocument] | None:
+    predicted = prefilter.centroids.predict(query_embedding, prefilter.max_keys)
+    keys = [key for key, _ in predicted]
+    if not keys:
+        return None
+    results = collection.query(
+        query_embeddings=[query_embedding],
+        n_results=top_k,
+        where={"disease_key": {"$in": keys}},
+        include=_INCLUDE,
+    )
+    documents = _documents(results, query_embedding)
+    best = max((doc.similarity for doc in documents), default=-1.0)
+    if len(documents) < top_k or best < prefilter.min_similarity:
+        logger.info(
+            f"Prefilter on {keys} found {len(documents)} documents "
+            f"(best similarity {best:.2f}), searching the whole collection"
+        )
+        return None
+    return documents
+
+
+def _cosine(query_embedding: Sequence[float], embeddings) -> np.ndarray:
+    query = np.asarray(query_embedding, dtype=np.float32)
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+    return matrix @ query / np.where(norms == 0, 1, norms)
+
+
+def _similarities(query_embedding: Sequence[float], embeddings) -> list[float]:
+    if len(embeddings) == 0:
+        return []
+    return [float(value) for value in _cosine(query_embedding, embeddings)]
+
+
+def _documents(
+    results: dict, query_embedding: Sequence[float] | None = None
+) -> list[RetrievedDocument]:
+    documents = []
+    if results["documents"] is not None:
+        ids = results["ids"][0]
+        distances = (results.get("distances") or [[None] * len(ids)])[0]
+        metadatas = (results.get("metadatas") or [[None] * len(ids)])[0]
+        embeddings = results.get("embeddings")
+        similarities = (
+            _similarities(query_embedding, embeddings[0])
+            if embeddings is not None and query_embedding is not None
+            else [None] * len(ids)
+        )
+        for i in range(len(results["documents"][0])):
+            documents.append(
+                RetrievedDocument(
+                    id=ids[i],
+                    text=results["documents"][0][i],
+                    distance=distances[i],
+                    metadata=metadatas[i],
+                    similarity=similarities[i],
+                )
+            )
+    return documents
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[str]], k: int = 60
+) -> list[tuple[str, float]]:
+    """Merges ranked id lists, scoring each id by ``sum(1 / (k + rank))``.
+
+    Args:
+        rankings: Ids ordered best first, one list per retriever.
+        k: Damping constant; larger values flatten the rank differences.
+    Returns:
+        ``(id, score)`` pairs, best first; ties keep first-seen order.
+    """
+    scores: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+
+def hybrid_query(
+    collection: chromadb.Collection,
+    index: BM25Index,
+    user_query: str,
+    query_embedding: Sequence[float],
+    options: QueryOptions | None = None,
+) -> list[RetrievedDocument]:
+    """Fuses vector and BM25 results into the ``top_k`` documents.
+
+    Documents found only by BM25 are fetched from the collection by id and
+    have a similarity but no distance. Ids the collection no longer holds
+    are skipped.
+    """
+    options = options or QueryOptions()
+    top_k = options.top_k
+    dense = query_collection(
+        collection,
+        query_embedding,
+        max(top_k, options.candidates),
+        options.prefilter,
+    )
+    lexical = [doc_id for doc_id, _ in index.search(user_query, options.candidates)]
+    fused = reciprocal_rank_fusion([[doc.id for doc in dense], lexical], options.rrf_k)
+
+    by_id = {doc.id: doc for doc in dense}
+    missing = [doc_id for doc_id, _ in fused[:top_k] if doc_id not in by_id]
+    if missing:
+        found = collection.get(
+            ids=missing, include=["documents", "metadatas", "embeddings"]
+        )
+        for doc_id, text, metadata, similarity in zip(
+            found["ids"],
+            found["documents"],
+            found["metadatas"],
+            _similarities(query_embedding, found["embeddings"]),
+        ):
+            by_id[doc_id] = RetrievedDocument(
+                id=doc_id, text=text, metadata=metadata, similarity=similarity
+            )
+    return [by_id[doc_id] for doc_id, _ in fused if doc_id in by_id][:top_k]
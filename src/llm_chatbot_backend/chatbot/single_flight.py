@@ -0,0 +1,73 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable, Hashable
+from dataclasses import dataclass
+from typing import TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class FlightStats:
+    flights: int = 0
+    shared: int = 0  # callers served by a flight another caller started
+    errors: int = 0
+
+
+class SingleFlight:
+    """Runs one computation per key for all concurrent callers asking for it.
+
+    The first caller of a key starts the computation as its own task; callers
+    arriving while it runs wait for the same task and get the same result or
+    exception. The key is forgotten as soon as the task ends, so results and
+    errors are never reused by later callers.
+
+    A caller that times out or is cancelled stops waiting, but the
+    computation keeps running for the others.
+
+    Args:
+        timeout: Longest time in seconds a caller waits; ``None`` waits as
+            long as the computation takes.
+    """
+
+    def __init__(self, timeout: float | None = None):
+        self.timeout = timeout
+        self.stats = FlightStats()
+        self._flights: dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable[T]]) -> T:
+        """Returns the result of ``compute``, sharing it with concurrent callers.
+
+        Args:
+            key: Identifies equal requests, e.g. the normalized query.
+            compute: Coroutine function started if no flight for ``key`` runs.
+        Returns:
+            Result of the flight for ``key``.
+        Raises:
+            asyncio.TimeoutError: The flight took longer than ``timeout``.
+        """
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(compute())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+            self.stats.flights += 1
+        else:
+            self.stats.shared += 1
+        # shield() keeps one caller's timeout or cancellation from ending
+        # the flight of the others
+        return await asyncio.wait_for(asyncio.shield(task), self.timeout)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        # Retrieved here so a flight whose callers all timed out does not
+        # log "exception was never retrieved"
+        if not task.cancelled() and task.exception() is not None:
+            self.stats.errors += 1
+            logger.warning(f"Flight {key!r} failed: {task.exception()!r}")
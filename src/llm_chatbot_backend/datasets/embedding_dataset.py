@@ -0,0 +1,132 @@
+import json
+import os
+from collections.abc import Iterator, Sequence
+from pathlib import Path
+
+import numpy as np
+from kedro.io import AbstractDataset
+
+EMBEDDINGS_FILE = "embeddings.npy"
+COLUMNS_FILE = "columns.json"
+
+
+class EmbeddedCorpus(Sequence):
+    """Embedded forum records held column by column.
+
+    Indexing returns the same ``{"id", "embedding", "context", "metadata"}``
+    dicts ``embed_forum_data`` produces, with each embedding a view into the
+    shared float32 matrix rather than a copy.
+
+    Args:
+        ids: Document id of each row.
+        contexts: RAG context of each row.
+        metadata: Metadata values by key, one value (or None) per row.
+        embeddings: Float32 matrix with one row per document.
+    """
+
+    def __init__(
+        self,
+        ids: list[str],
+        contexts: list[str],
+        metadata: dict[str, list],
+        embeddings: np.ndarray,
+    ):
+        self.ids = ids
+        self.contexts = contexts
+        self.metadata = metadata
+        self.embeddings = embeddings
+
+    @classmethod
+    def from_records(cls, records: Sequence[dict]) -> "EmbeddedCorpus":
+        if isinstance(records, cls):
+            return records
+        keys = dict.fromkeys(key for item in records for key in item["metadata"])
+        embeddings = np.asarray(
+            [item["embedding"] for item in records], dtype=np.float32
+        )
+        return cls(
+            ids=[item["id"] for item in records],
+            contexts=[item["context"] for item in records],
+            metadata={
+                key: [item["metadata"].get(key) for item in records] for key in keys
+            },
+            embeddings=embeddings.reshape(len(records), -1) if records else embeddings,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return {
+            "id": self.ids[index],
+            "embedding": self.embeddings[index],
+            "context": self.contexts[index],
+            "metadata": {
+                key: values[index]
+                for key, values in self.metadata.items()
+                if values[index] is not None
+            },
+        }
+
+    def batches(self, batch_size: int) -> Iterator[list[dict]]:
+        """Yields rows ``batch_size`` at a time, for streaming into a store."""
+        for start in range(0, len(self), batch_size):
+            yield self[start : start + batch_size]
+
+
+class EmbeddingDataset(AbstractDataset):
+    """Stores embedded forum records as a float32 matrix plus a columnar sidecar.
+
+    ``filepath`` is a local directory holding ``embeddings.npy`` and
+    ``columns.json`` (ids, contexts and metadata stored as one list per
+    field). Loading memory-maps the matrix, so no vector is read or copied
+    until it is used.
+
+    Args:
+        filepath: Directory to store the dataset in.
+        mmap_mode: ``numpy.load`` memory-map mode; None reads the matrix.
+    """
+
+    def __init__(self, filepath: str, mmap_mode: str | None = "r"):
+        self._filepath = Path(filepath)
+        self._mmap_mode = mmap_mode
+
+    def _load(self) -> EmbeddedCorpus:
+        with open(self._filepath / COLUMNS_FILE, encoding="utf-8") as f:
+            columns = json.load(f)
+        embeddings = np.load(
+            self._filepath / EMBEDDINGS_FILE, mmap_mode=self._mmap_mode
+        )
+        return EmbeddedCorpus(
+            columns["ids"], columns["contexts"], columns["metadata"], embeddings
+        )
+
+    def _save(self, data: Sequence[dict]) -> None:
+        corpus = EmbeddedCorpus.from_records(data)
+        self._filepath.mkdir(parents=True, exist_ok=True)
+        # Write both files under temporary names first so a crash never
+        # leaves a matrix that does not match its sidecar
+        tmp_embeddings = self._filepath / f"{EMBEDDINGS_FILE}.tmp"
+        tmp_columns = self._filepath / f"{COLUMNS_FILE}.tmp"
+        with open(tmp_embeddings, "wb") as f:
+            np.save(f, np.ascontiguousarray(corpus.embeddings, dtype=np.float32))
+        with open(tmp_columns, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "ids": corpus.ids,
+                    "contexts": corpus.contexts,
+                    "metadata": corpus.metadata,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_embeddings, self._filepath / EMBEDDINGS_FILE)
+        os.replace(tmp_columns, self._filepath / COLUMNS_FILE)
+
+    def _exists(self) -> bool:
+        return (self._filepath / COLUMNS_FILE).exists()
+
+    def _describe(self):
+        return dict(filepath=self._filepath, mmap_mode=self._mmap_mode)
@@ -1,6 +1,11 @@
 import json
-from pathlib import Path
+from collections.abc import Iterable, Iterator
+from pathlib import Path, PurePosixPath
 
+from fsspec import open as fs_open
+from fsspec.compression import compr
+from fsspec.core import url_to_fs
+from fsspec.utils import infer_compression
 from kedro.io import AbstractDataset
 from kedro.io.core import (
     get_filepath_str,
@@ -29,8 +34,6 @@ class Utf8JSON(AbstractDataset):
             json.dump(data, f, **self._save_args)
 
     def _fs_open(self, mode):
-        from fsspec import open as fs_open
-
         return fs_open(
             get_filepath_str(self._filepath, self._protocol),
             mode=mode,
@@ -39,3 +42,107 @@ class Utf8JSON(AbstractDataset):
 
     def _describe(self):
         return dict(filepath=self._filepath)
+
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+
+def _dumps(record) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(record)
+    return json.dumps(record, ensure_ascii=False).encode("utf-8")
+
+
+def _loads(line: bytes):
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+class ReplaceRecords(list):
+    """Records that replace the file of an appending ``Utf8JSONLines``.
+
+    Lets a node whose output is usually appended, such as the scraper,
+    rewrite the whole file after a full crawl.
+    """
+
+
+class Utf8JSONLines(AbstractDataset):
+    """Stores a list of records as UTF-8 JSON Lines, one record per line.
+
+    Compression is inferred from the file extension (``.gz``, ``.zst``, ...)
+    unless given, and handled by fsspec; zstd needs the ``zstandard``
+    package. ``orjson`` is used for (de)serialisation when it is installed.
+
+    Args:
+        filepath: File to read and write, local or any fsspec URL.
+        compression: fsspec compression name, "infer" or None.
+        lazy: Load as a generator that parses one record at a time instead
+            of a list.
+        append: Add saved records to the end of the file instead of
+            replacing it, unless they are ``ReplaceRecords``. Compressed
+            files get one gzip, bz2 or xz stream per save, which the loader
+            reads back to back. zstd is not supported, since its reader stops
+            after the first frame.
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        compression: str | None = "infer",
+        lazy: bool = False,
+        append: bool = False,
+    ):
+        if compression not in (None, "infer") and compression not in compr:
+            raise ValueError(
+                f"Compression '{compression}' is not available; "
+                "zstd needs the 'zstandard' package."
+            )
+        resolved = (
+            infer_compression(filepath) if compression == "infer" else compression
+        )
+        if append and resolved == "zstd":
+            raise ValueError("Appending is not supported for zstd-compressed files.")
+        self._protocol, path = get_protocol_and_path(filepath)
+        self._filepath = PurePosixPath(path)
+        self._compression = compression
+        self._lazy = lazy
+        self._append = append
+
+    def _load(self) -> Iterator[dict] | list[dict]:
+        records = self._iter_records()
+        return records if self._lazy else list(records)
+
+    def _iter_records(self) -> Iterator[dict]:
+        with self._fs_open("rb") as f:
+            for line in f:
+                if line.strip():
+                    yield _loads(line)
+
+    def _save(self, data: Iterable[dict]) -> None:
+        append = self._append and not isinstance(data, ReplaceRecords)
+        with self._fs_open("ab" if append else "wb") as f:
+            for record in data:
+                f.write(_dumps(record) + b"\n")
+
+    def _exists(self) -> bool:
+        fs, path = url_to_fs(get_filepath_str(self._filepath, self._protocol))
+        return fs.exists(path)
+
+    def _fs_open(self, mode):
+        return fs_open(
+            get_filepath_str(self._filepath, self._protocol),
+            mode=mode,
+            compression=self._compression,
+        )
+
+    def _describe(self):
+        return dict(
+            filepath=self._filepath,
+            compression=self._compression,
+            lazy=self._lazy,
+            append=self._append,
+        )
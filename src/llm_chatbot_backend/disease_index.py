@@ -0,0 +1,124 @@
+"""Centroids of the document embeddings of each ``disease_key``.
+
+The data_processing pipeline averages the embeddings of every disease's
+documents. At query time the nearest centroids name the diseases a question
+is most likely about, and retrieval searches only their documents.
+"""
+
+import os
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+
+import numpy as np
+
+# Rows normalized at a time, so a memory-mapped corpus is never copied whole
+_BLOCK_ROWS = 4096
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class DiseaseCentroids:
+    """Unit-length mean embedding of each disease's documents.
+
+    Args:
+        keys: ``disease_key`` of each centroid.
+        centroids: Float32 matrix with one unit-length row per key.
+        counts: Number of documents averaged into each centroid.
+    """
+
+    def __init__(self, keys: list[str], centroids: np.ndarray, counts: Sequence[int]):
+        self.keys = keys
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.counts = np.asarray(counts, dtype=np.int64)
+
+    @classmethod
+    def build(
+        cls, disease_keys: Sequence[str | None], embeddings: np.ndarray
+    ) -> "DiseaseCentroids":
+        """Averages the normalized ``embeddings`` of each disease key.
+
+        Rows without a disease key are skipped.
+        """
+        return cls.from_blocks(
+            (
+                disease_keys[start : start + _BLOCK_ROWS],
+                embeddings[start : start + _BLOCK_ROWS],
+            )
+            for start in range(0, len(disease_keys), _BLOCK_ROWS)
+        )
+
+    @classmethod
+    def from_blocks(
+        cls, blocks: Iterable[tuple[Sequence[str | None], np.ndarray]]
+    ) -> "DiseaseCentroids":
+        """Like ``build``, for embeddings read one block of rows at a time.
+
+        Args:
+            blocks: ``(disease_keys, embeddings)`` pairs, e.g. pages read
+                from a Chroma collection.
+        """
+        sums: dict[str, np.ndarray] = {}
+        counts: dict[str, int] = {}
+        for disease_keys, embeddings in blocks:
+            rows = [i for i, key in enumerate(disease_keys) if key]
+            if not rows:
+                continue
+            block_keys, groups = np.unique(
+                [disease_keys[i] for i in rows], return_inverse=True
+            )
+            normalized = _normalize(np.asarray(embeddings, dtype=np.float32)[rows])
+            block_sums = np.zeros((len(block_keys), normalized.shape[1]), np.float32)
+            np.add.at(block_sums, groups, normalized)
+            for key, total, count in zip(
+                block_keys.tolist(), block_sums, np.bincount(groups)
+            ):
+                sums[key] = sums[key] + total if key in sums else total
+                counts[key] = counts.get(key, 0) + int(count)
+        keys = sorted(sums)
+        centroids = (
+            np.stack([sums[key] for key in keys])
+            if keys
+            else np.zeros((0, 0), np.float32)
+        )
+        return cls(keys, _normalize(centroids), [counts[key] for key in keys])
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def predict(self, query_embedding, top_n: int = 3) -> list[tuple[str, float]]:
+        """Returns the ``top_n`` disease keys nearest to a query, best first.
+
+        Args:
+            query_embedding: Embedding of the user query.
+            top_n: Number of keys to return.
+        Returns:
+            ``(disease_key, cosine similarity)`` pairs.
+        """
+        if not self.keys:
+            return []
+        query = _normalize(np.asarray(query_embedding, dtype=np.float32))
+        similarities = self.centroids @ query
+        best = np.argsort(-similarities, kind="stable")[:top_n]
+        return [(self.keys[i], float(similarities[i])) for i in best]
+
+    def save(self, path: str) -> None:
+        """Writes the centroids as ``.npz``, replacing any previous file atomically."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                keys=np.asarray(self.keys, dtype=str),
+                centroids=self.centroids,
+                counts=self.counts,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "DiseaseCentroids":
+        with np.load(path) as data:
+            return cls(data["keys"].tolist(), data["centroids"], data["counts"])
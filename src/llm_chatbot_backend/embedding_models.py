@@ -0,0 +1,174 @@
+"""Loading of the embedding model shared by the pipeline and the chatbot.
+
+The ``embedding_model`` parameter names a SentenceTransformer model, run in
+full precision with PyTorch. Appending ``@onnx-int8`` runs it instead with
+ONNX Runtime and int8 dynamic quantization, which is faster on CPU. The
+quantized model is exported on first use into ``data/06_models``.
+
+Check that the quantized model agrees with the float one, and compare their
+speed, with::
+
+    python -m llm_chatbot_backend.embedding_models check \\
+        sentence-transformers/paraphrase-multilingual-mpnet-base-v2@onnx-int8
+"""
+
+import argparse
+import logging
+import re
+import statistics
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from sentence_transformers import (
+    SentenceTransformer,
+    export_dynamic_quantized_onnx_model,
+)
+
+logger = logging.getLogger(__name__)
+
+ONNX_INT8 = "onnx-int8"
+ONNX_EXPORT_DIR = "data/06_models"
+QUANTIZATION_CONFIG = "avx2"
+QUANTIZED_FILE = f"onnx/model_qint8_{QUANTIZATION_CONFIG}.onnx"
+
+# Short Thai health questions and doctor-style replies used by ``check``
+SAMPLE_TEXTS = [
+    "ปวดหัวบ่อยมาก ควรทำอย่างไรดี",
+    "มีไข้ ไอ เจ็บคอ มาสามวันแล้วค่ะ",
+    "ท้องเสียหลังกินอาหารทะเล ต้องไปหาหมอไหม",
+    "นอนไม่หลับติดต่อกันหลายสัปดาห์",
+    "ผื่นแดงคันตามแขนและขา เป็นภูมิแพ้หรือเปล่า",
+    "ควรดื่มน้ำให้เพียงพอ พักผ่อน และสังเกตอาการ หากไม่ดีขึ้นควรพบแพทย์",
+    "อาการดังกล่าวอาจเกิดจากกรดไหลย้อน แนะนำให้รับประทานอาหารตรงเวลา",
+    "เจ็บหน้าอกเวลาออกกำลังกาย ควรรีบไปโรงพยาบาล",
+]
+
+
+def parse_model_spec(spec: str) -> tuple[str, str | None]:
+    """Splits ``"name@backend"`` into the model name and backend, if any."""
+    name, _, backend = spec.partition("@")
+    if backend and backend != ONNX_INT8:
+        raise ValueError(f"Unknown embedding backend '{backend}' in '{spec}'.")
+    return name, backend or None
+
+
+def load_embedding_model(spec: str) -> SentenceTransformer:
+    """Loads the embedding model described by ``spec``.
+
+    Args:
+        spec: Model name, optionally followed by ``@onnx-int8``.
+    Returns:
+        The loaded model; both backends expose the same ``encode``.
+    """
+    name, backend = parse_model_spec(spec)
+    if backend is None:
+        return SentenceTransformer(name)
+
+    export_dir = Path(ONNX_EXPORT_DIR) / re.sub(r"[^\w.-]", "_", name)
+    if not (export_dir / QUANTIZED_FILE).exists():
+        _export_quantized(name, export_dir)
+    return SentenceTransformer(
+        str(export_dir), backend="onnx", model_kwargs={"file_name": QUANTIZED_FILE}
+    )
+
+
+def _export_quantized(name: str, export_dir: Path) -> None:
+    logger.info(f"Exporting {name} to int8 ONNX in {export_dir}")
+    model = SentenceTransformer(name, backend="onnx")
+    model.save_pretrained(str(export_dir))
+    export_dynamic_quantized_onnx_model(model, QUANTIZATION_CONFIG, str(export_dir))
+
+
+@dataclass
+class ParityReport:
+    min_cosine: float
+    mean_cosine: float
+    threshold: float
+
+    @property
+    def passed(self) -> bool:
+        return self.min_cosine >= self.threshold
+
+
+def parity_check(
+    candidate, reference, texts: list[str], threshold: float = 0.98
+) -> ParityReport:
+    """Compares two models' embeddings of the same texts.
+
+    Args:
+        candidate: Model under test, e.g. the quantized one.
+        reference: Model it should agree with, e.g. the float one.
+        texts: Texts to embed with both.
+        threshold: Lowest acceptable cosine similarity for any text.
+    Returns:
+        Lowest and mean cosine similarity between matching embeddings.
+    """
+    a = np.asarray(candidate.encode(texts), dtype=np.float32)
+    b = np.asarray(reference.encode(texts), dtype=np.float32)
+    cosines = np.sum(a * b, axis=1) / (
+        np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1)
+    )
+    return ParityReport(float(cosines.min()), float(cosines.mean()), threshold)
+
+
+def measure_speed(model, texts: list[str], repeats: int = 20) -> dict[str, float]:
+    """Single-query latency and bulk throughput of ``model`` on CPU.
+
+    Returns:
+        Median and p95 single-query latency in ms, and bulk docs/sec.
+    """
+    model.encode(texts[:1])  # warm up
+    latencies = []
+    for i in range(repeats):
+        start = time.perf_counter()
+        model.encode([texts[i % len(texts)]])
+        latencies.append((time.perf_counter() - start) * 1000)
+    bulk = texts * max(1, 256 // len(texts))
+    start = time.perf_counter()
+    model.encode(bulk, batch_size=32)
+    seconds = time.perf_counter() - start
+    return {
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "docs_per_sec": len(bulk) / seconds,
+    }
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m llm_chatbot_backend.embedding_models"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    check = subparsers.add_parser(
+        "check", help="compare a backend with the float model"
+    )
+    check.add_argument("spec", help="model name with a backend, e.g. NAME@onnx-int8")
+    check.add_argument("--threshold", type=float, default=0.98)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "check":
+        name, _ = parse_model_spec(args.spec)
+        candidate = load_embedding_model(args.spec)
+        reference = load_embedding_model(name)
+        report = parity_check(candidate, reference, SAMPLE_TEXTS, args.threshold)
+        logger.info(
+            f"Cosine min {report.min_cosine:.4f} mean {report.mean_cosine:.4f} "
+            f"(threshold {report.threshold}): {'ok' if report.passed else 'FAILED'}"
+        )
+        for label, model in [(name, reference), (args.spec, candidate)]:
+            speed = measure_speed(model, SAMPLE_TEXTS)
+            logger.info(
+                f"{label}: query p50 {speed['p50_ms']:.1f} ms, "
+                f"p95 {speed['p95_ms']:.1f} ms, bulk {speed['docs_per_sec']:.1f} docs/sec"
+            )
+        if not report.passed:
+            raise SystemExit(
+                "Quantized embeddings differ too much from the float model"
+            )
+
+
+if __name__ == "__main__":
+    main()
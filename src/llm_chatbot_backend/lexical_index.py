@@ -0,0 +1,154 @@
+"""BM25 inverted index over the RAG contexts stored in Chroma.
+
+Dense embeddings often miss exact Thai drug names, disease names and tags.
+The data_processing pipeline therefore also writes a keyword index of the
+same documents, tokenized with pythainlp, and the chatbot fuses its results
+with the vector search.
+"""
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from collections.abc import Sequence
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+from pythainlp.corpus import thai_stopwords
+from pythainlp.tokenize import word_tokenize
+from pythainlp.util import normalize
+
+# Tokens made only of punctuation, symbols or whitespace carry no meaning
+_NOISE_TOKEN = re.compile(r"^[\W_]+$")
+
+
+@lru_cache(maxsize=1)
+def _stopwords() -> frozenset[str]:
+    return frozenset(thai_stopwords())
+
+
+def tokenize(text: str) -> list[str]:
+    """Splits Thai (and Latin) text into lowercase index terms.
+
+    Stopwords and punctuation are dropped.
+    """
+    stopwords = _stopwords()
+    return [
+        token
+        for token in (
+            t.lower()
+            for t in word_tokenize(
+                normalize(text), engine="newmm", keep_whitespace=False
+            )
+        )
+        if token not in stopwords and not _NOISE_TOKEN.match(token)
+    ]
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed set of documents.
+
+    Args:
+        ids: Document id of each indexed document.
+        lengths: Number of terms in each document.
+        postings: For each term, the indices of the documents containing it
+            and how often it occurs in each.
+        k1: Term frequency saturation.
+        b: Document length normalization.
+    """
+
+    def __init__(
+        self,
+        ids: list[str],
+        lengths: Sequence[int],
+        postings: dict[str, tuple[Sequence[int], Sequence[int]]],
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.ids = ids
+        self.lengths = np.asarray(lengths, dtype=np.float32)
+        self.postings = {
+            term: (np.asarray(docs, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            for term, (docs, tfs) in postings.items()
+        }
+        self.k1 = k1
+        self.b = b
+        self._avg_length = float(self.lengths.mean()) if len(ids) else 0.0
+
+    @classmethod
+    def build(
+        cls, ids: Sequence[str], texts: Sequence[str], k1: float = 1.5, b: float = 0.75
+    ) -> "BM25Index":
+        """Tokenizes ``texts`` and indexes them under ``ids``."""
+        lengths = []
+        postings: dict[str, tuple[list[int], list[int]]] = {}
+        for i, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                docs, tfs = postings.setdefault(term, ([], []))
+                docs.append(i)
+                tfs.append(tf)
+        return cls(list(ids), lengths, postings, k1, b)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def search(self, query: str, top_k: int = 20) -> list[tuple[str, float]]:
+        """Returns up to ``top_k`` ``(id, score)`` pairs, best first.
+
+        Only documents sharing at least one term with the query are returned.
+        """
+        terms = [
+            term for term in dict.fromkeys(tokenize(query)) if term in self.postings
+        ]
+        if not terms or not self.ids:
+            return []
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.lengths / self._avg_length)
+        for term in terms:
+            docs, tfs = self.postings[term]
+            idf = math.log(1 + (len(self.ids) - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm[docs])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        best = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(self.ids[i], float(scores[i])) for i in best]
+
+    def save(self, path: str) -> None:
+        """Writes the index as JSON, replacing any previous file atomically."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "k1": self.k1,
+                    "b": self.b,
+                    "ids": self.ids,
+                    "lengths": self.lengths.astype(int).tolist(),
+                    "postings": {
+                        term: [docs.tolist(), tfs.astype(int).tolist()]
+                        for term, (docs, tfs) in self.postings.items()
+                    },
+                },
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            data["ids"],
+            data["lengths"],
+            {term: tuple(posting) for term, posting in data["postings"].items()},
+            data["k1"],
+            data["b"],
+        )
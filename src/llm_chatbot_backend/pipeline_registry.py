@@ -13,5 +13,9 @@ def register_pipelines() -> dict[str, Pipeline]:
         A mapping from pipeline names to ``Pipeline`` objects.
     """
     pipelines = find_pipelines()
-    pipelines["__default__"] = sum(pipelines.values())
+    # streaming_ingest does the work of the other pipelines in one pass, so it
+    # only runs on request: ``kedro run --pipeline streaming_ingest``
+    pipelines["__default__"] = sum(
+        pipeline for name, pipeline in pipelines.items() if name != "streaming_ingest"
+    )
     return pipelines
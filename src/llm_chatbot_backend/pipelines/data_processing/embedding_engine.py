@@ -0,0 +1,113 @@
+import logging
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EncodeReport:
+    documents: int = 0
+    seconds: float = 0.0
+    bucket_sizes: dict[int, int] = field(default_factory=dict)
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.documents / self.seconds if self.seconds else 0.0
+
+
+class EmbeddingEngine:
+    """Encodes texts in token-length buckets, optionally across processes.
+
+    Forum posts vary a lot in length, and every batch is padded to its
+    longest text. Grouping texts of similar token length keeps padding low,
+    and lets short buckets use larger batches than long ones. With
+    ``workers`` > 1, each bucket is split across a SentenceTransformer
+    multi-process pool of CPU workers. Embeddings are always returned in the
+    order of the input texts.
+
+    Args:
+        model: Loaded SentenceTransformer model.
+        bucket_batch_sizes: Batch size for texts of up to each token length,
+            e.g. ``{32: 128, 64: 64, 128: 32}``; longer texts use the last
+            bucket. None encodes everything as one bucket.
+        workers: CPU processes to encode with; 1 encodes in this process.
+        batch_size: Batch size used when ``bucket_batch_sizes`` is None.
+    """
+
+    def __init__(
+        self,
+        model,
+        bucket_batch_sizes: dict[int, int] | None = None,
+        workers: int = 1,
+        batch_size: int = 32,
+    ):
+        self.model = model
+        self.bucket_batch_sizes = dict(sorted((bucket_batch_sizes or {}).items()))
+        self.workers = workers
+        self.batch_size = batch_size
+        self.last_report = EncodeReport()
+
+    def encode(self, texts: list[str]) -> np.ndarray:
+        """Encodes ``texts`` and returns their embeddings in input order."""
+        start = time.perf_counter()
+        buckets = self._bucket(texts)
+        pool = (
+            self.model.start_multi_process_pool(["cpu"] * self.workers)
+            if self.workers > 1 and texts
+            else None
+        )
+        embeddings = None
+        try:
+            for (bound, batch_size), indices in buckets.items():
+                encoded = np.asarray(
+                    self.model.encode(
+                        [texts[i] for i in indices],
+                        batch_size=batch_size,
+                        show_progress_bar=len(indices) > batch_size,
+                        **({"pool": pool} if pool else {}),
+                    ),
+                    dtype=np.float32,
+                )
+                if embeddings is None:
+                    embeddings = np.empty((len(texts), encoded.shape[1]), np.float32)
+                embeddings[indices] = encoded
+        finally:
+            if pool:
+                self.model.stop_multi_process_pool(pool)
+
+        self.last_report = EncodeReport(
+            documents=len(texts),
+            seconds=time.perf_counter() - start,
+            bucket_sizes={bound: len(idx) for (bound, _), idx in buckets.items()},
+        )
+        if texts:
+            logger.info(
+                f"Encoded {len(texts)} documents in {self.last_report.seconds:.1f}s "
+                f"({self.last_report.docs_per_second:.1f} docs/sec), "
+                f"bucket sizes {self.last_report.bucket_sizes}"
+            )
+        return embeddings if embeddings is not None else np.empty((0, 0), np.float32)
+
+    def _bucket(self, texts: list[str]) -> dict[tuple[int, int], list[int]]:
+        if not self.bucket_batch_sizes:
+            return {(0, self.batch_size): list(range(len(texts)))} if texts else {}
+        lengths = self.token_lengths(texts)
+        bounds = list(self.bucket_batch_sizes)
+        buckets: dict[tuple[int, int], list[int]] = {}
+        # Longest first within each bucket, so each batch holds similar lengths
+        for i in sorted(range(len(texts)), key=lambda i: -lengths[i]):
+            bound = bounds[min(bisect_left(bounds, lengths[i]), len(bounds) - 1)]
+            buckets.setdefault((bound, self.bucket_batch_sizes[bound]), []).append(i)
+        return dict(sorted(buckets.items()))
+
+    def token_lengths(self, texts: list[str]) -> list[int]:
+        encoded = self.model.tokenizer(
+            texts,
+            truncation=True,
+            max_length=self.model.max_seq_length,
+        )
+        return [len(ids) for ids in encoded["input_ids"]]
@@ -0,0 +1,78 @@
+import sqlite3
+from collections.abc import Iterable
+from pathlib import Path
+
+import numpy as np
+
+
+class EmbeddingStore:
+    """Content-addressed store of document embeddings backed by SQLite.
+
+    Embeddings are keyed on the model name and the ``content_hash`` of the
+    text they were computed from, so an unchanged document is never encoded
+    twice by the same model.
+
+    Args:
+        path: SQLite file holding the embeddings.
+        model_name: Model whose embeddings are read and written.
+    """
+
+    def __init__(self, path: str, model_name: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.model_name = model_name
+        # The streaming pipeline uses the store from worker threads, one call
+        # at a time
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT, hash TEXT, embedding BLOB, PRIMARY KEY (model, hash))"
+        )
+
+    def get_many(self, hashes: Iterable[str]) -> dict[str, np.ndarray]:
+        wanted = list(set(hashes))
+        found = {}
+        # Look hashes up in chunks to stay under SQLite's bound-parameter limit
+        for start in range(0, len(wanted), 500):
+            chunk = wanted[start : start + 500]
+            rows = self._db.execute(
+                "SELECT hash, embedding FROM embeddings WHERE model = ? "
+                f"AND hash IN ({', '.join('?' * len(chunk))})",
+                (self.model_name, *chunk),
+            )
+            found.update(
+                (digest, np.frombuffer(blob, dtype=np.float32)) for digest, blob in rows
+            )
+        return found
+
+    def put_many(self, embeddings: dict[str, np.ndarray]) -> None:
+        self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+            (
+                (self.model_name, digest, np.asarray(vector, np.float32).tobytes())
+                for digest, vector in embeddings.items()
+            ),
+        )
+        self._db.commit()
+
+    def prune(self, keep: Iterable[str]) -> int:
+        """Deletes embeddings whose hash is not in ``keep``.
+
+        Returns:
+            Number of deleted embeddings.
+        """
+        keep = set(keep)
+        stale = [
+            (self.model_name, digest)
+            for (digest,) in self._db.execute(
+                "SELECT hash FROM embeddings WHERE model = ?", (self.model_name,)
+            ).fetchall()
+            if digest not in keep
+        ]
+        self._db.executemany(
+            "DELETE FROM embeddings WHERE model = ? AND hash = ?", stale
+        )
+        self._db.commit()
+        return len(stale)
+
+    def close(self) -> None:
+        self._db.close()
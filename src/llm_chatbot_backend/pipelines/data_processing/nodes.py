@@ -1,106 +1,495 @@
 import logging
+import os
 import re
+import time
+from collections import deque
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from itertools import islice
 
 import chromadb
+import numpy as np
+from chromadb.errors import NotFoundError
 from pythainlp.util import normalize
-from sentence_transformers import SentenceTransformer
 
+from llm_chatbot_backend.datasets.embedding_dataset import EmbeddedCorpus
+from llm_chatbot_backend.disease_index import DiseaseCentroids
+from llm_chatbot_backend.embedding_models import load_embedding_model
+from llm_chatbot_backend.lexical_index import BM25Index
+from llm_chatbot_backend.vector_store import (
+    active_collection_name,
+    build_rag_context,
+    content_hash,
+    document_id,
+    garbage_collect_collections,
+    new_collection_version,
+    validate_collection,
+    versioned_collection_name,
+    write_collection_version,
+)
+
+from .embedding_engine import EmbeddingEngine
+from .embedding_store import EmbeddingStore
+
+logger = logging.getLogger(__name__)
 logging.getLogger("kedro.io.data_catalog").setLevel(logging.WARNING)
 
+EMBEDDING_MODEL = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+WRITE_MODES = ("in_place", "blue_green")
+
+
+# Compiled once rather than on every clean_text call
+_URL = re.compile(r"https?://\S+")
+_DISALLOWED = re.compile(r"[^\u0E00-\u0E7F\w\s.,!?']")  # Keep Thai, basic punctuations
+_WHITESPACE = re.compile(r"\s+")
+_REPEATED_THAI = re.compile(r"([ก-๙])\1{1,}")
+
+# Templated doctor replies and disease names repeat across posts; only fields
+# this short are memoized, so the cache never holds whole forum posts
+MEMO_MAX_LENGTH = 256
+
 
 def clean_text(text: str) -> str:
     """Cleans and normalizes input text, specifically for Thai language processing."""
 
     if not isinstance(text, str):
         return ""
+    if len(text) <= MEMO_MAX_LENGTH:
+        return _clean_short(text)
+    return _clean_str(text)
+
 
+def _clean_str(text: str) -> str:
     text = normalize(text)
-    text = re.sub(r"https?://\S+", "", text)  # Remove URLs
-    text = re.sub(
-        r"[^\u0E00-\u0E7F\w\s.,!?']", "", text
-    )  # Keep Thai, basic punctuations
-    text = re.sub(r"\s+", " ", text)  # Collapse multiple whitespace
-    text = re.sub(r"([ก-๙])\1{1,}", r"\1\1", text)  # Reduce repeated Thai chars
+    text = _URL.sub("", text)  # Remove URLs
+    text = _DISALLOWED.sub("", text)
+    text = _WHITESPACE.sub(" ", text)  # Collapse multiple whitespace
+    text = _REPEATED_THAI.sub(r"\1\1", text)  # Reduce repeated Thai chars
 
     return text.strip()
 
 
-def process_text(data: list[dict]) -> list[dict]:
-    """Apply cleaning function to target fields in the data."""
+_clean_short = lru_cache(maxsize=4096)(_clean_str)
+
+
+def clean_record(item: dict) -> dict | None:
+    """Cleans the text fields of one record; None if it has no doctor reply."""
+    doctor_reply = clean_text(item.get("doctor_reply", ""))
+    if not doctor_reply:
+        return None
+    return {
+        **item,  # Copy all original fields
+        "forum_text": clean_text(item.get("forum_text", "")),
+        "doctor_reply": doctor_reply,
+        "disease_text": clean_text(item.get("disease_text", "")),
+    }
+
+
+def clean_records(data: list[dict]) -> list[dict]:
+    """Cleans a chunk of records, dropping those without a doctor reply."""
     cleaned_data = []
     for item in data:
-        forum = clean_text(item.get("forum_text", ""))
-        doctor_reply = clean_text(item.get("doctor_reply", ""))
-        disease_text = clean_text(item.get("disease_text", ""))
+        cleaned_item = clean_record(item)
+        if cleaned_item is not None:
+            cleaned_data.append(cleaned_item)
+    return cleaned_data
 
-        if not doctor_reply:
-            continue
 
-        cleaned_item = {
-            **item,  # Copy all original fields
-            "forum_text": forum,
-            "doctor_reply": doctor_reply,
-            "disease_text": disease_text,
-        }
-        cleaned_data.append(cleaned_item)
-    return cleaned_data
+def _chunks(data: Iterable[dict], chunk_size: int) -> Iterator[list[dict]]:
+    iterator = iter(data)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield chunk
 
 
-def build_rag_context(data) -> str:
-    """Constructs a context string for retrieval-augmented generation (RAG) from the input data."""
-    return f"""[คำถามจากผู้ใช้]
-        {data["forum_text"]}
+def process_text(
+    data: Iterable[dict], workers: int | None = 1, chunk_size: int = 1000
+) -> list[dict]:
+    """Apply cleaning function to target fields in the data.
 
-        [คำตอบจากแพทย์]
-        {data["doctor_reply"]}
+    Args:
+        data: Raw forum records.
+        workers: Processes cleaning chunks of records in parallel; None uses
+            every core and 1 cleans in this process.
+        chunk_size: Records sent to a worker at a time.
+    Returns:
+        Cleaned records with a doctor reply, in input order.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        cleaned_data = clean_records(data)
+        logger.debug(f"clean_text cache: {_clean_short.cache_info()}")
+        return cleaned_data
 
-        [โรคที่เกี่ยวข้อง]
-        {data["disease_text"]}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return [
+            item
+            for chunk in executor.map(clean_records, _chunks(data, chunk_size))
+            for item in chunk
+        ]
 
-        [แท็ก]
-        {", ".join(data["tags"])}
-        """
 
+def embedded_record(
+    item: dict, doc_id: str, context: str, digest: str, embedding
+) -> dict:
+    """Builds the stored form of one cleaned record.
 
-def embed_forum_data(data_list: list) -> list:
-    """Generates embeddings for forum data using a pre-trained SentenceTransformer model."""
-    model = SentenceTransformer(
-        "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
-    )
+    Tags are stored as a list so queries can filter on them with
+    ``{"tags": {"$contains": tag}}``; Chroma rejects empty lists, so posts
+    without tags have no ``tags`` key.
+    """
+    metadata = {"disease_key": item["disease_key"], "content_hash": digest}
+    if item["tags"]:
+        metadata["tags"] = [str(tag) for tag in item["tags"]]
+    return {
+        "id": doc_id,
+        "embedding": np.asarray(embedding, dtype=np.float32),
+        "context": context,
+        "metadata": metadata,
+    }
+
+
+def embed_forum_data(
+    data_list: list,
+    embedding_model: str = EMBEDDING_MODEL,
+    embedding_store_path: str | None = None,
+    engine_params: dict | None = None,
+) -> EmbeddedCorpus:
+    """Generates embeddings for forum data using a pre-trained SentenceTransformer model.
 
+    When ``embedding_store_path`` is given, embeddings of documents whose
+    context is unchanged since a previous run are reused from the store and
+    only new or changed documents are encoded.
+
+    Args:
+        data_list: Cleaned forum records.
+        embedding_model: Name of the SentenceTransformer model, optionally
+            with a backend suffix such as ``@onnx-int8``.
+        embedding_store_path: Optional SQLite file caching embeddings by content.
+        engine_params: Keyword arguments for ``EmbeddingEngine``, such as
+            ``bucket_batch_sizes`` and ``workers``.
+    Returns:
+        Records with id, embedding, context and metadata, with the
+        embeddings held in one float32 matrix.
+    """
     contexts = [build_rag_context(item) for item in data_list]
-    embeddings = model.encode(contexts, batch_size=32, show_progress_bar=True).tolist()
+    hashes = [content_hash(context) for context in contexts]
+
+    store = (
+        EmbeddingStore(embedding_store_path, embedding_model)
+        if embedding_store_path
+        else None
+    )
+    known = store.get_many(hashes) if store else {}
+
+    # Encode each distinct unseen context once
+    pending = {}
+    for digest, context in zip(hashes, contexts):
+        if digest not in known:
+            pending.setdefault(digest, context)
+
+    if pending:
+        model = load_embedding_model(embedding_model)
+        engine = EmbeddingEngine(model, **(engine_params or {}))
+        encoded = engine.encode(list(pending.values()))
+        new_embeddings = dict(zip(pending, encoded))
+        if store:
+            store.put_many(new_embeddings)
+        known.update(new_embeddings)
+
+    deleted = store.prune(hashes) if store else 0
+    if store:
+        store.close()
+    logger.info(
+        f"Embeddings: {len(data_list) - len(pending)} reused, "
+        f"{len(pending)} encoded, {deleted} deleted"
+    )
 
     embedded_data = []
-    for item, context, embedding in zip(data_list, contexts, embeddings):
+    seen_ids = set()
+    for item, context, digest in zip(data_list, contexts, hashes):
+        doc_id = document_id(item, digest)
+        if doc_id in seen_ids:
+            # The same post can show up on two pages while the forum shifts
+            continue
+        seen_ids.add(doc_id)
         embedded_data.append(
-            {
-                "id": item.get("id") or f"doc_{hash(context)}",
-                "embedding": embedding,
-                "context": context,
-                "metadata": {
-                    "disease_key": item["disease_key"],
-                    "tags": ", ".join(item["tags"]),
-                },
-            }
+            embedded_record(item, doc_id, context, digest, known[digest])
         )
 
-    return embedded_data
+    duplicates = len(data_list) - len(embedded_data)
+    if duplicates:
+        logger.info(f"Dropped {duplicates} duplicate documents")
 
+    return EmbeddedCorpus.from_records(embedded_data)
+
+
+def _log_upsert_progress(upserted: int, start_time: float) -> None:
+    elapsed = time.perf_counter() - start_time
+    logger.info(
+        f"Upserted {upserted} documents in {elapsed:.1f}s "
+        f"({upserted / elapsed if elapsed else 0:.0f} docs/sec)"
+    )
+
+
+def stored_hashes(existing: dict) -> dict[str, str | None]:
+    """Maps each id of a ``collection.get`` result to its stored content hash.
+
+    Rows written when tags were a comma-joined string map to None, so they
+    are rewritten with filterable tags.
+    """
+    hashes = {}
+    for doc_id, stored in zip(existing["ids"], existing["metadatas"]):
+        metadata = stored or {}
+        legacy_tags = isinstance(metadata.get("tags"), str)
+        hashes[doc_id] = None if legacy_tags else metadata.get("content_hash")
+    return hashes
+
+
+def read_stored_hashes(collection, batch_size: int) -> dict[str, str | None]:
+    """Reads ``stored_hashes`` of a whole collection, ``batch_size`` rows at a time."""
+    hashes = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+        hashes.update(stored_hashes(page))
+        if len(page["ids"]) < batch_size:
+            return hashes
+        offset += batch_size
 
-def store_to_chroma(embedded_data: list[dict], persist_path: str) -> str:
-    """Stores the embedded data into a ChromaDB collection."""
-    client = chromadb.PersistentClient(path=persist_path)
-    collection = client.get_or_create_collection(name="forum_data")
 
-    ids = [item["id"] for item in embedded_data]
-    documents = [item["context"] for item in embedded_data]
-    embeddings = [item["embedding"] for item in embedded_data]
-    ids = [item["id"] for item in embedded_data]
-    metadatas = [item["metadata"] for item in embedded_data]
+def changed_records(
+    embedded_data: Sequence[dict], existing_hashes: dict[str, str | None]
+) -> list[dict]:
+    """Returns the records that are new or differ from what is stored.
 
+    Args:
+        embedded_data: Records as produced by ``embed_forum_data``.
+        existing_hashes: Stored ``content_hash`` of each id, from
+            ``stored_hashes``.
+    Returns:
+        Records whose ``content_hash`` is not the one already stored.
+    """
+    return [
+        item
+        for item in embedded_data
+        if existing_hashes.get(item["id"]) != item["metadata"].get("content_hash")
+        or "content_hash" not in item["metadata"]
+    ]
+
+
+def _upsert(collection, rows: list[dict]) -> int:
     collection.upsert(
-        ids=ids, documents=documents, embeddings=embeddings, metadatas=metadatas
+        ids=[item["id"] for item in rows],
+        documents=[item["context"] for item in rows],
+        embeddings=[item["embedding"] for item in rows],
+        metadatas=[item["metadata"] for item in rows],
+    )
+    return len(rows)
+
+
+def _write_rows(
+    collection,
+    embedded_data: Sequence[dict],
+    existing_hashes: dict[str, str | None],
+    batch_size: int,
+    upsert_workers: int,
+) -> tuple[int, set[str]]:
+    """Upserts the rows of ``embedded_data`` that differ from ``existing_hashes``.
+
+    Returns:
+        Number of upserted rows, and every id in ``embedded_data``.
+    """
+    current_ids = set()
+
+    def changed_chunks() -> Iterator[list[dict]]:
+        pending = []
+        for start in range(0, len(embedded_data), batch_size):
+            rows = embedded_data[start : start + batch_size]
+            current_ids.update(item["id"] for item in rows)
+            pending.extend(changed_records(rows, existing_hashes))
+            while len(pending) >= batch_size:
+                yield pending[:batch_size]
+                pending = pending[batch_size:]
+        if pending:
+            yield pending
+
+    upserted = 0
+    start_time = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=upsert_workers) as executor:
+        in_flight = deque()
+        for chunk in changed_chunks():
+            # Wait for the oldest chunk first, so at most ``upsert_workers``
+            # chunks are held in memory
+            if len(in_flight) >= upsert_workers:
+                upserted += in_flight.popleft().result()
+                _log_upsert_progress(upserted, start_time)
+            in_flight.append(executor.submit(_upsert, collection, chunk))
+        while in_flight:
+            upserted += in_flight.popleft().result()
+            _log_upsert_progress(upserted, start_time)
+    return upserted, current_ids
+
+
+def store_to_chroma(
+    embedded_data: Sequence[dict],
+    persist_path: str,
+    upsert_workers: int = 4,
+    mode: str = "in_place",
+    keep_versions: int = 2,
+) -> str:
+    """Stores the embedded data into a ChromaDB collection.
+
+    Rows are read one client batch at a time, so a memory-mapped
+    ``EmbeddedCorpus`` is streamed rather than loaded whole, and upserted in
+    chunks of the client's max batch size with up to ``upsert_workers``
+    chunks in flight.
+
+    With ``mode="in_place"``, only rows that are new or whose
+    ``content_hash`` changed are upserted into the active collection, and ids that
+    no longer appear in ``embedded_data`` are deleted. With
+    ``mode="blue_green"``, a changed corpus is written to a new
+    ``forum_data_<version>`` collection, which is validated before the
+    collection pointer is switched to it; readers keep querying the previous
+    collection until then.
+
+    Args:
+        embedded_data: Records as produced by ``embed_forum_data``.
+        persist_path: Directory of the persistent Chroma client.
+        upsert_workers: Chunks upserted concurrently.
+        mode: "in_place" or "blue_green".
+        keep_versions: Versioned collections kept by blue/green rebuilds.
+    Returns:
+        Summary of the stored, upserted and deleted documents.
+    """
+    if mode not in WRITE_MODES:
+        raise ValueError(f"Unknown mode '{mode}', expected one of {WRITE_MODES}.")
+    client = chromadb.PersistentClient(path=persist_path)
+    batch_size = client.get_max_batch_size()
+    if mode == "blue_green":
+        return _store_blue_green(
+            client, embedded_data, persist_path, upsert_workers, keep_versions
+        )
+
+    name = active_collection_name(persist_path)
+    collection = client.get_or_create_collection(name=name)
+    existing_hashes = read_stored_hashes(collection, batch_size)
+    upserted, current_ids = _write_rows(
+        collection, embedded_data, existing_hashes, batch_size, upsert_workers
+    )
+    stale_ids = [doc_id for doc_id in existing_hashes if doc_id not in current_ids]
+    for start in range(0, len(stale_ids), batch_size):
+        collection.delete(ids=stale_ids[start : start + batch_size])
+    if upserted or stale_ids:
+        # Lets the serving side drop answers cached against the old contents
+        write_collection_version(persist_path, name)
+
+    return (
+        f"Stored {len(embedded_data)} documents to ChromaDB at {persist_path} "
+        f"({upserted} upserted, {len(stale_ids)} deleted)"
     )
 
-    return f"Stored {len(documents)} documents to ChromaDB at {persist_path}"
+
+def _store_blue_green(
+    client,
+    embedded_data: Sequence[dict],
+    persist_path: str,
+    upsert_workers: int,
+    keep_versions: int,
+) -> str:
+    batch_size = client.get_max_batch_size()
+    active_name = active_collection_name(persist_path)
+    try:
+        active = client.get_collection(name=active_name)
+    except NotFoundError:
+        active = None
+    if active is not None and not _corpus_changed(
+        read_stored_hashes(active, batch_size), embedded_data, batch_size
+    ):
+        return (
+            f"Stored {len(embedded_data)} documents to ChromaDB at {persist_path} "
+            f"(unchanged, still serving {active_name})"
+        )
+
+    version = new_collection_version()
+    name = versioned_collection_name(version)
+    collection = client.create_collection(name=name)
+    try:
+        upserted, current_ids = _write_rows(
+            collection, embedded_data, {}, batch_size, upsert_workers
+        )
+        # A handful of rows spread over the corpus must find themselves
+        samples = embedded_data[:: max(1, len(embedded_data) // 5)][:5]
+        validate_collection(collection, len(current_ids), samples)
+    except Exception:
+        client.delete_collection(name=name)
+        raise
+    write_collection_version(persist_path, name, version)
+    logger.info(f"Switched readers from {active_name} to {name}")
+    garbage_collect_collections(client, persist_path, keep=keep_versions)
+
+    return (
+        f"Stored {len(embedded_data)} documents to ChromaDB at {persist_path} "
+        f"(built {name}, {upserted} upserted)"
+    )
+
+
+def _corpus_changed(
+    existing_hashes: dict[str, str | None],
+    embedded_data: Sequence[dict],
+    batch_size: int,
+) -> bool:
+    seen = 0
+    for start in range(0, len(embedded_data), batch_size):
+        rows = embedded_data[start : start + batch_size]
+        if changed_records(rows, existing_hashes):
+            return True
+        seen += len(rows)
+    # Every row is stored unchanged, so only deletions are left to detect
+    return seen != len(existing_hashes)
+
+
+def build_lexical_index(embedded_data: Sequence[dict], index_path: str) -> str:
+    """Builds the BM25 keyword index over the stored RAG contexts.
+
+    Args:
+        embedded_data: Embedded records; only their ids and contexts are read.
+        index_path: File the index is written to, next to the Chroma store.
+    Returns:
+        A message with the number of indexed documents and terms.
+    """
+    if isinstance(embedded_data, EmbeddedCorpus):
+        ids, contexts = embedded_data.ids, embedded_data.contexts
+    else:
+        ids = [item["id"] for item in embedded_data]
+        contexts = [item["context"] for item in embedded_data]
+    start = time.perf_counter()
+    index = BM25Index.build(ids, contexts)
+    index.save(index_path)
+    logger.info(f"Indexed {len(index)} documents in {time.perf_counter() - start:.1f}s")
+    return (
+        f"Indexed {len(index)} documents ({len(index.postings)} terms) to {index_path}"
+    )
+
+
+def build_disease_centroids(embedded_data: Sequence[dict], centroids_path: str) -> str:
+    """Builds the centroid index used to prefilter retrieval by disease.
+
+    Args:
+        embedded_data: Embedded records; only their embeddings and
+            ``disease_key`` are read.
+        centroids_path: File the centroids are written to.
+    Returns:
+        A message with the number of diseases indexed.
+    """
+    if isinstance(embedded_data, EmbeddedCorpus):
+        disease_keys = embedded_data.metadata.get("disease_key", [])
+        embeddings = embedded_data.embeddings
+    else:
+        disease_keys = [item["metadata"].get("disease_key") for item in embedded_data]
+        embeddings = np.asarray(
+            [item["embedding"] for item in embedded_data], dtype=np.float32
+        )
+    centroids = DiseaseCentroids.build(disease_keys, embeddings)
+    centroids.save(centroids_path)
+    return f"Indexed {len(centroids)} disease centroids to {centroids_path}"
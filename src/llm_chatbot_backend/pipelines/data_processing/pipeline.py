@@ -1,5 +1,11 @@
 from kedro.pipeline import node, Pipeline, pipeline  # noqa
-from .nodes import process_text, embed_forum_data, store_to_chroma
+from .nodes import (
+    build_disease_centroids,
+    build_lexical_index,
+    embed_forum_data,
+    process_text,
+    store_to_chroma,
+)
 
 
 def create_pipeline(**kwargs) -> Pipeline:
@@ -7,13 +13,22 @@ def create_pipeline(**kwargs) -> Pipeline:
         [
             node(
                 func=process_text,
-                inputs="raw_forum_data",
+                inputs={
+                    "data": "raw_forum_data",
+                    "workers": "params:text_cleaning.workers",
+                    "chunk_size": "params:text_cleaning.chunk_size",
+                },
                 outputs="cleaned_forum_data",
                 name="process_text_node",
             ),
             node(
                 func=embed_forum_data,
-                inputs="cleaned_forum_data",
+                inputs={
+                    "data_list": "cleaned_forum_data",
+                    "embedding_model": "params:embedding_model",
+                    "embedding_store_path": "params:embedding_store_path",
+                    "engine_params": "params:embedding_engine",
+                },
                 outputs="embedded_forum_data",
                 name="embed_data_node",
             ),
@@ -22,9 +37,30 @@ def create_pipeline(**kwargs) -> Pipeline:
                 inputs={
                     "embedded_data": "embedded_forum_data",
                     "persist_path": "params:chroma_persist_path",
+                    "upsert_workers": "params:chroma_upsert_workers",
+                    "mode": "params:chroma_write_mode",
+                    "keep_versions": "params:chroma_keep_versions",
                 },
                 outputs="chroma_store",
                 name="vector_db_node",
             ),
+            node(
+                func=build_lexical_index,
+                inputs={
+                    "embedded_data": "embedded_forum_data",
+                    "index_path": "params:lexical_index_path",
+                },
+                outputs="lexical_index",
+                name="lexical_index_node",
+            ),
+            node(
+                func=build_disease_centroids,
+                inputs={
+                    "embedded_data": "embedded_forum_data",
+                    "centroids_path": "params:disease_centroids_path",
+                },
+                outputs="disease_centroids",
+                name="disease_centroids_node",
+            ),
         ]
     )
@@ -0,0 +1,10 @@
+"""
+Pipeline 'streaming_ingest': scrapes, cleans, embeds and stores forum posts
+batch by batch instead of materializing each stage.
+"""
+
+from .pipeline import create_pipeline
+
+__all__ = ["create_pipeline"]
+
+__version__ = "0.1"
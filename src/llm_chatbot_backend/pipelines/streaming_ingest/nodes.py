@@ -0,0 +1,449 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
+from pathlib import Path
+
+import chromadb
+from chromadb.errors import NotFoundError
+
+from llm_chatbot_backend.disease_index import DiseaseCentroids
+from llm_chatbot_backend.embedding_models import load_embedding_model
+from llm_chatbot_backend.lexical_index import BM25Index
+from llm_chatbot_backend.pipelines.data_processing.embedding_engine import (
+    EmbeddingEngine,
+)
+from llm_chatbot_backend.pipelines.data_processing.embedding_store import (
+    EmbeddingStore,
+)
+from llm_chatbot_backend.pipelines.data_processing.nodes import (
+    EMBEDDING_MODEL,
+    WRITE_MODES,
+    build_rag_context,
+    changed_records,
+    clean_record,
+    document_id,
+    embedded_record,
+    stored_hashes,
+)
+from llm_chatbot_backend.pipelines.web_scraping.nodes import (
+    PageStream,
+    get_total_pages,
+    make_client,
+)
+from llm_chatbot_backend.vector_store import (
+    VERSIONED_PREFIX,
+    active_collection_name,
+    content_hash,
+    garbage_collect_collections,
+    new_collection_version,
+    validate_collection,
+    versioned_collection_name,
+    write_collection_version,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IngestStats:
+    documents: int = 0
+    encoded: int = 0
+    upserted: int = 0
+    deleted: int = 0
+    kept: int = 0  # live documents copied into a new version after a failed page
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.upserted or self.deleted)
+
+
+async def clean_batches(
+    pages: AsyncIterator[list[dict]], batch_size: int
+) -> AsyncIterator[list[dict]]:
+    """Cleans records as their pages arrive and regroups them into batches.
+
+    Args:
+        pages: Raw forum records, one page at a time.
+        batch_size: Cleaned records per yielded batch; the last may be smaller.
+    Yields:
+        Cleaned records, ``batch_size`` at a time.
+    """
+    batch = []
+    async for forums in pages:
+        for item in forums:
+            cleaned_item = clean_record(item)
+            if cleaned_item is None:
+                continue
+            batch.append(cleaned_item)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+class BatchWriter:
+    """Embeds cleaned records and upserts them to Chroma one batch at a time.
+
+    Only the ids and content hashes written so far are kept across batches,
+    so memory does not grow with the embeddings of the whole corpus.
+
+    Without ``live``, ``collection`` is updated in place: changed records are
+    upserted and documents gone from the forum deleted. With ``live``,
+    ``collection`` is a new blue/green version that receives every record;
+    embeddings of posts unchanged since ``live`` are copied from it, and
+    ``upserted`` and ``deleted`` count the changes against it.
+
+    Args:
+        collection: Chroma collection to write to.
+        load_engine: Returns the ``EmbeddingEngine``; called on the first
+            batch with posts to encode, so unchanged runs load no model.
+        store: Optional embedding store; embeddings of unchanged posts are
+            reused from it instead of being encoded again.
+        max_batch_size: Ids deleted or copied per call, the client's max
+            batch size.
+        live: Collection readers use while ``collection`` is being built.
+    """
+
+    def __init__(
+        self,
+        collection,
+        load_engine: Callable[[], EmbeddingEngine],
+        store: EmbeddingStore | None = None,
+        max_batch_size: int = 1000,
+        live=None,
+    ):
+        self.collection = collection
+        self.live = live
+        self.load_engine = load_engine
+        self.store = store
+        self.max_batch_size = max_batch_size
+        self.stats = IngestStats()
+        self._engine = None
+        self._seen_ids: set[str] = set()
+        self._seen_hashes: set[str] = set()
+
+    def write(self, batch: list[dict]) -> None:
+        records = []
+        for item in batch:
+            context = build_rag_context(item)
+            digest = content_hash(context)
+            doc_id = document_id(item, digest)
+            if doc_id in self._seen_ids:
+                continue
+            self._seen_ids.add(doc_id)
+            self._seen_hashes.add(digest)
+            records.append((item, doc_id, context, digest))
+        if not records:
+            return
+
+        previous = self.collection if self.live is None else self.live
+        existing = previous.get(
+            ids=[r[1] for r in records],
+            include=["metadatas"] if self.live is None else ["metadatas", "embeddings"],
+        )
+        existing_hashes = stored_hashes(existing)
+        known = self.store.get_many(r[3] for r in records) if self.store else {}
+        if self.live is not None:
+            for doc_id, embedding in zip(existing["ids"], existing["embeddings"]):
+                known.setdefault(existing_hashes[doc_id], embedding)
+        pending = {r[3]: r[2] for r in records if r[3] not in known}
+        if pending:
+            if self._engine is None:
+                self._engine = self.load_engine()
+            encoded = self._engine.encode(list(pending.values()))
+            new_embeddings = dict(zip(pending, encoded))
+            if self.store:
+                self.store.put_many(new_embeddings)
+            known.update(new_embeddings)
+
+        embedded_data = [
+            embedded_record(item, doc_id, context, digest, known[digest])
+            for item, doc_id, context, digest in records
+        ]
+        changed = changed_records(embedded_data, existing_hashes)
+        rows = changed if self.live is None else embedded_data
+        if rows:
+            self.collection.upsert(
+                ids=[item["id"] for item in rows],
+                documents=[item["context"] for item in rows],
+                embeddings=[item["embedding"] for item in rows],
+                metadatas=[item["metadata"] for item in rows],
+            )
+        self.stats.documents += len(records)
+        self.stats.encoded += len(pending)
+        self.stats.upserted += len(changed)
+
+    def finish(self, complete: bool) -> IngestStats:
+        """Deletes documents that are gone from the forum and closes the store.
+
+        Args:
+            complete: Whether every page was fetched. Deletion is skipped
+                otherwise, since missing posts may sit on a failed page; a
+                new version gets those posts copied from ``live`` instead.
+        Returns:
+            Counters for the whole run.
+        """
+        previous = self.collection if self.live is None else self.live
+        unseen = (
+            [
+                doc_id
+                for doc_id in previous.get(include=[])["ids"]
+                if doc_id not in self._seen_ids
+            ]
+            if complete or self.live is not None
+            else []
+        )
+        for start in range(0, len(unseen), self.max_batch_size):
+            ids = unseen[start : start + self.max_batch_size]
+            if self.live is None:
+                self.collection.delete(ids=ids)
+            elif not complete:
+                kept = self.live.get(
+                    ids=ids, include=["documents", "metadatas", "embeddings"]
+                )
+                self.collection.upsert(
+                    ids=kept["ids"],
+                    documents=kept["documents"],
+                    embeddings=kept["embeddings"],
+                    metadatas=kept["metadatas"],
+                )
+        if complete:
+            self.stats.deleted = len(unseen)
+            if self.store:
+                self.store.prune(self._seen_hashes)
+        else:
+            self.stats.kept = len(unseen)
+        if self.store:
+            self.store.close()
+        return self.stats
+
+
+def rebuild_indexes(
+    collection,
+    lexical_index_path: str | None,
+    centroids_path: str | None,
+    batch_size: int,
+) -> None:
+    """Rebuilds the BM25 index and the disease centroids from a collection.
+
+    A streaming run never holds the whole corpus, so both are rebuilt from
+    the stored documents, read ``batch_size`` at a time; only the ids and
+    contexts the BM25 index needs are kept across pages.
+
+    Args:
+        collection: Collection holding the whole corpus.
+        lexical_index_path: File of the BM25 index; None skips it.
+        centroids_path: File of the disease centroids; None skips them.
+        batch_size: Documents read per call.
+    """
+    if not lexical_index_path and not centroids_path:
+        return
+    ids, contexts = [], []
+
+    def pages():
+        for offset in range(0, collection.count(), batch_size):
+            page = collection.get(
+                include=["documents", "metadatas", "embeddings"],
+                limit=batch_size,
+                offset=offset,
+            )
+            ids.extend(page["ids"])
+            contexts.extend(page["documents"])
+            yield (
+                [(metadata or {}).get("disease_key") for metadata in page["metadatas"]],
+                page["embeddings"],
+            )
+
+    start = time.perf_counter()
+    centroids = DiseaseCentroids.from_blocks(pages())
+    if centroids_path:
+        centroids.save(centroids_path)
+    if lexical_index_path:
+        BM25Index.build(ids, contexts).save(lexical_index_path)
+    logger.info(
+        f"Rebuilt indexes over {len(ids)} documents and {len(centroids)} diseases "
+        f"in {time.perf_counter() - start:.1f}s"
+    )
+
+
+def publish_version(
+    client, collection, persist_path: str, expected_count: int, keep_versions: int
+) -> None:
+    """Validates a streamed blue/green collection and points readers at it.
+
+    Raises:
+        RuntimeError: If validation fails; the collection is dropped and
+            readers stay on the previous one.
+    """
+    count = collection.count()
+    step = max(1, count // 5)
+    samples = []
+    for offset in range(0, count, step)[:5]:
+        row = collection.get(limit=1, offset=offset, include=["embeddings"])
+        samples.append({"id": row["ids"][0], "embedding": row["embeddings"][0]})
+    try:
+        validate_collection(collection, expected_count, samples)
+    except Exception:
+        client.delete_collection(name=collection.name)
+        raise
+    version = collection.name.removeprefix(VERSIONED_PREFIX)
+    write_collection_version(persist_path, collection.name, version)
+    logger.info(f"Switched readers to {collection.name}")
+    garbage_collect_collections(client, persist_path, keep=keep_versions)
+
+
+def _open_target(chroma_client, persist_path: str, mode: str):
+    """Returns the collection to write to and, for blue/green, the live one."""
+    active_name = active_collection_name(persist_path)
+    if mode == "in_place":
+        return chroma_client.get_or_create_collection(name=active_name), None
+    try:
+        live = chroma_client.get_collection(name=active_name)
+    except NotFoundError:
+        live = None
+    version = new_collection_version()
+    collection = chroma_client.create_collection(
+        name=versioned_collection_name(version)
+    )
+    return collection, live
+
+
+async def _crawl(
+    writer: BatchWriter, scrape_params: dict, stream_params: dict
+) -> PageStream:
+    """Feeds every forum page through cleaning to ``writer``.
+
+    Returns:
+        The consumed stream, holding the pages that failed.
+    """
+    base_url = scrape_params["base_url"]
+    client, sem = make_client(scrape_params)
+    async with client:
+        total_pages = await get_total_pages(client, base_url)
+        pages = PageStream(
+            client,
+            sem,
+            base_url,
+            list(range(1, total_pages + 1)),
+            max_buffered=stream_params.get("max_buffered_pages", 8),
+        )
+        async for batch in clean_batches(pages, stream_params.get("batch_size", 64)):
+            await asyncio.to_thread(writer.write, batch)
+    return pages
+
+
+async def _commit(chroma_client, collection, live, stats: IngestStats, params: dict):
+    """Points readers at the written collection if anything changed.
+
+    Returns:
+        The collection readers now query.
+    """
+    persist_path = params["chroma_persist_path"]
+    if params.get("chroma_write_mode", "in_place") == "in_place":
+        if stats.changed:
+            # Lets the serving side drop answers cached against the old contents
+            write_collection_version(persist_path, collection.name)
+        return collection
+    if live is not None and not stats.changed:
+        chroma_client.delete_collection(name=collection.name)
+        logger.info(f"Corpus unchanged, still serving {live.name}")
+        return live
+    await asyncio.to_thread(
+        publish_version,
+        chroma_client,
+        collection,
+        persist_path,
+        stats.documents + stats.kept,
+        params.get("chroma_keep_versions", 2),
+    )
+    return collection
+
+
+async def stream_ingest(params: dict) -> IngestStats:
+    """Scrapes, cleans, embeds and stores the forum as a stream of batches.
+
+    Pages are cleaned as they arrive and their records embedded and upserted
+    ``streaming_ingest.batch_size`` at a time. Encoding runs in a worker
+    thread, so the next pages are fetched while a batch is being embedded;
+    fetching pauses when ``streaming_ingest.max_buffered_pages`` pages are
+    waiting. Once the crawl ends, the BM25 index and the disease centroids
+    are rebuilt from the collection if it changed.
+
+    With ``chroma_write_mode: in_place`` the active collection is updated.
+    With ``blue_green`` the stream is written to a new
+    ``forum_data_<version>`` collection, which is validated before the
+    collection pointer is switched to it, as ``store_to_chroma`` does; if
+    nothing changed, the new collection is dropped.
+
+    Args:
+        params: The project parameters. Besides ``web_scraping`` and
+            ``streaming_ingest``, the same ``embedding_model``,
+            ``embedding_store_path``, ``embedding_engine``,
+            ``chroma_persist_path``, ``chroma_write_mode``,
+            ``chroma_keep_versions``, ``lexical_index_path`` and
+            ``disease_centroids_path`` as ``data_processing`` are read. With
+            ``embedding_engine.workers`` > 1 a process pool is started for
+            every batch, which only pays off with a large batch size.
+    Returns:
+        Counters for the run.
+    """
+    scrape_params = params.get("web_scraping", {})
+    if not scrape_params.get("base_url"):
+        raise ValueError("Base URL is required.")
+    mode = params.get("chroma_write_mode", "in_place")
+    if mode not in WRITE_MODES:
+        raise ValueError(f"Unknown mode '{mode}', expected one of {WRITE_MODES}.")
+
+    embedding_model = params.get("embedding_model", EMBEDDING_MODEL)
+    engine_params = params.get("embedding_engine") or {}
+    store_path = params.get("embedding_store_path")
+    chroma_client = chromadb.PersistentClient(path=params["chroma_persist_path"])
+    collection, live = _open_target(chroma_client, params["chroma_persist_path"], mode)
+    max_batch_size = chroma_client.get_max_batch_size()
+    writer = BatchWriter(
+        collection,
+        lambda: EmbeddingEngine(load_embedding_model(embedding_model), **engine_params),
+        EmbeddingStore(store_path, embedding_model) if store_path else None,
+        max_batch_size,
+        live,
+    )
+    start = time.perf_counter()
+    try:
+        pages = await _crawl(writer, scrape_params, params.get("streaming_ingest", {}))
+        failed = pages.failed
+        stats = await asyncio.to_thread(writer.finish, not failed)
+    except BaseException:
+        if mode == "blue_green":
+            chroma_client.delete_collection(name=collection.name)
+        raise
+
+    served = await _commit(chroma_client, collection, live, stats, params)
+    index_paths = [
+        params.get("lexical_index_path"),
+        params.get("disease_centroids_path"),
+    ]
+    if stats.changed or not all(Path(p).exists() for p in index_paths if p):
+        await asyncio.to_thread(rebuild_indexes, served, *index_paths, max_batch_size)
+    logger.info(
+        f"Streamed {stats.documents} documents from "
+        f"{len(pages.pages) - len(failed)}/{len(pages.pages)} pages in {time.perf_counter() - start:.1f}s: "
+        f"{stats.encoded} encoded, {stats.upserted} upserted, {stats.deleted} deleted"
+    )
+    if failed:
+        logger.warning(
+            f"{len(failed)} pages failed, stale documents were not deleted: "
+            f"{sorted(failed)}"
+        )
+    return stats
+
+
+def run_streaming_ingest(params: dict) -> str:
+    stats = asyncio.run(stream_ingest(params))
+    return (
+        f"Stored {stats.documents} documents to ChromaDB at "
+        f"{params['chroma_persist_path']} "
+        f"({stats.upserted} upserted, {stats.deleted} deleted)"
+    )
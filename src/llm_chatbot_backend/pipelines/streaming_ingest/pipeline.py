@@ -0,0 +1,15 @@
+from kedro.pipeline import node, Pipeline, pipeline  # noqa
+from .nodes import run_streaming_ingest
+
+
+def create_pipeline(**kwargs) -> Pipeline:
+    return Pipeline(
+        [
+            node(
+                func=run_streaming_ingest,
+                inputs="parameters",
+                outputs="streamed_chroma_store",
+                name="streaming_ingest_node",
+            ),
+        ]
+    )
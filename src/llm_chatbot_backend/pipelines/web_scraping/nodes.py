@@ -1,11 +1,19 @@
 import asyncio
 import logging
 import math
+import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
 
 import httpx
-from tenacity import retry, stop_after_attempt, wait_fixed
+from tenacity import retry, stop_after_attempt
 from tqdm.asyncio import tqdm_asyncio
 
+from llm_chatbot_backend.datasets.utf8_json import ReplaceRecords
+
+from .state import ScrapeState
+from .throttle import AdaptiveLimiter, parse_retry_after, wait_retry_after
+
 logger = logging.getLogger(__name__)
 
 
@@ -18,6 +26,7 @@ def extract_forum_info(forum_obj: dict) -> dict:
         Extracted forum information.
     """
     forum = forum_obj.get("forum", {})
+    forum_id = forum.get("id") or forum_obj.get("id") or ""
     forum_text = forum.get("content_text", "")
     doctor_comments = forum_obj.get("doctor_comments", [])
     doctor_text = doctor_comments[0].get("content_text", "") if doctor_comments else ""
@@ -31,6 +40,7 @@ def extract_forum_info(forum_obj: dict) -> dict:
         if tag.get("name", "")
     ]
     return {
+        "id": str(forum_id),
         "forum_text": forum_text.strip(),
         "doctor_reply": doctor_text.strip(),
         "disease_key": disease_key.strip(),
@@ -51,34 +61,282 @@ async def get_total_pages(client: httpx.AsyncClient, base_url: str) -> int:
 
 @retry(
     stop=stop_after_attempt(3),
-    wait=wait_fixed(5),  # Wait 5 seconds between attempts
+    wait=wait_retry_after,  # Server's Retry-After, else exponential backoff
     reraise=True,  # Reraise the last exception
 )
 async def fetch_forum_page(
-    *, client: httpx.AsyncClient, page: int, sem: asyncio.Semaphore, base_url: str
+    *,
+    client: httpx.AsyncClient,
+    page: int,
+    sem: asyncio.Semaphore | AdaptiveLimiter,
+    base_url: str,
 ) -> list[dict]:
     """Fetches a page of forum data.
 
     Args:
         client: HTTP client for making requests.
-        url: URL of the page to fetch.
+        page: Page number to fetch.
+        sem: Semaphore or adaptive limiter bounding concurrent requests; an
+            adaptive limiter is told how each request went.
+        base_url: URL template with a ``{page}`` placeholder.
     Returns:
         List of forum objects.
     """
     url = base_url.format(page=page)
+    record = getattr(sem, "record", None)
     async with sem:
-        res = await client.get(url)
+        start = time.monotonic()
+        try:
+            res = await client.get(url)
+        except httpx.TransportError:
+            if record is not None:
+                await record(time.monotonic() - start)
+            raise
+        if record is not None:
+            await record(
+                time.monotonic() - start,
+                res.status_code,
+                parse_retry_after(res.headers.get("Retry-After")),
+            )
         res.raise_for_status()
         data = res.json()
         forums = data.get("pageProps", {}).get("forums", [])
         return [extract_forum_info(f) for f in forums]
 
 
-async def scrape_forum_page(params: dict) -> list[dict]:
-    base_url = params.get("base_url")
-    if not base_url:
-        raise ValueError("Base URL is required.")
+@dataclass
+class ScrapeSummary:
+    fetched: int = 0
+    failed: int = 0
+    retried: int = 0
+
+
+async def fetch_pages(
+    *,
+    client: httpx.AsyncClient,
+    sem: asyncio.Semaphore | AdaptiveLimiter,
+    base_url: str,
+    pages: list[int],
+    state: ScrapeState | None = None,
+) -> tuple[dict[int, list[dict]], dict[int, str]]:
+    """Fetches ``pages`` concurrently without letting one failure sink the rest.
+
+    Args:
+        client: HTTP client for making requests.
+        sem: Semaphore or adaptive limiter bounding concurrent requests.
+        base_url: URL template with a ``{page}`` placeholder.
+        pages: Page numbers to fetch.
+        state: Optional scraper state; each fetched page is checkpointed in
+            the current crawl.
+    Returns:
+        Records of the fetched pages, and the error of each failed page.
+    """
+
+    async def fetch_and_checkpoint(page: int) -> list[dict]:
+        forums = await fetch_forum_page(
+            client=client, page=page, sem=sem, base_url=base_url
+        )
+        if state is not None:
+            state.checkpoint_page(page, forums)
+        return forums
+
+    results = await tqdm_asyncio.gather(
+        *(fetch_and_checkpoint(page) for page in pages), return_exceptions=True
+    )
+    fetched, failed = {}, {}
+    for page, result in zip(pages, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Page {page} failed: {result!r}")
+            failed[page] = repr(result)
+        else:
+            fetched[page] = result
+    return fetched, failed
+
+
+async def crawl_all_pages(
+    *,
+    client: httpx.AsyncClient,
+    sem: asyncio.Semaphore | AdaptiveLimiter,
+    base_url: str,
+    state: ScrapeState | None = None,
+    summary: ScrapeSummary | None = None,
+) -> list[dict]:
+    """Fetches every forum page, resuming an unfinished crawl if ``state`` has one.
+
+    Pages that still fail after retrying are put in the retry queue of
+    ``state`` for the next run. Their posts are not known, so every
+    previously stored record missing from this crawl is kept in their
+    place; otherwise one transient failure would delete a page of posts
+    from the vector store. Without ``state``, failed pages are left out.
+
+    Args:
+        client: HTTP client for making requests.
+        sem: Semaphore or adaptive limiter bounding concurrent requests.
+        base_url: URL template with a ``{page}`` placeholder.
+        state: Optional scraper state used to checkpoint completed pages.
+        summary: Optional counters updated with the pages fetched and failed.
+    Returns:
+        Forum records of all fetched pages, in page order.
+    """
+    summary = summary if summary is not None else ScrapeSummary()
+    if state is not None and state.crawl is not None:
+        page_end = state.crawl["total_pages"]
+        done = set(state.crawl["completed"])
+        logger.info(f"Resuming crawl: {len(done)}/{page_end} pages already done")
+    else:
+        page_end = await get_total_pages(client, base_url)
+        done = set()
+        if state is not None:
+            state.start_crawl(page_end)
+
+    pages = [page for page in range(1, page_end + 1) if page not in done]
+    fetched, failed = await fetch_pages(
+        client=client, sem=sem, base_url=base_url, pages=pages, state=state
+    )
+    summary.fetched += len(fetched)
+    summary.failed += len(failed)
+
+    forums, first_failed = [], None
+    for page in range(1, page_end + 1):
+        if page in fetched:
+            forums.extend(fetched[page])
+        elif page in done:
+            forums.extend(state.load_page(page))
+        elif first_failed is None:
+            first_failed = len(forums)
+    if failed and state is not None:
+        forums = _keep_previous_records(forums, state.load_records(), first_failed)
+    if state is not None:
+        # A new crawl covers every page, so older queued pages are obsolete
+        state.set_retry_queue(failed)
+        state.finish_crawl(forums)
+    return forums
+
+
+def _keep_previous_records(
+    forums: list[dict], previous: list[dict], position: int
+) -> list[dict]:
+    # Inserted where the first failed page would be, so the records stay
+    # roughly newest first and the high-water mark never moves past them
+    crawled_ids = {forum.get("id") for forum in forums}
+    kept = [record for record in previous if record.get("id") not in crawled_ids]
+    if kept:
+        logger.warning(
+            f"Keeping {len(kept)} previously scraped posts in place of failed pages"
+        )
+    return forums[:position] + kept + forums[position:]
+
+
+async def drain_retry_queue(
+    *,
+    client: httpx.AsyncClient,
+    sem: asyncio.Semaphore | AdaptiveLimiter,
+    params: dict,
+    state: ScrapeState,
+    summary: ScrapeSummary,
+) -> None:
+    """Refetches the pages that failed in earlier runs and merges their records.
+
+    Args:
+        client: HTTP client for making requests.
+        sem: Semaphore or adaptive limiter bounding concurrent requests.
+        params: The ``web_scraping`` parameters; ``base_url`` and
+            ``max_retry_attempts``, the runs after which a page is dropped
+            from the queue, are read.
+        state: Scraper state holding the retry queue and records.
+        summary: Counters updated with the retried, fetched and failed pages.
+    """
+    queued = [entry["page"] for entry in state.retry_queue]
+    if not queued:
+        return
+    logger.info(f"Retrying {len(queued)} pages that failed in earlier runs")
+    fetched, failed = await fetch_pages(
+        client=client, sem=sem, base_url=params["base_url"], pages=queued
+    )
+    summary.retried += len(queued)
+    summary.fetched += len(fetched)
+    summary.failed += len(failed)
+
+    known = state.load_records()
+    known_ids = {record["id"] for record in known if record.get("id")}
+    recovered = [
+        forum
+        for page in queued
+        for forum in fetched.get(page, [])
+        if forum.get("id") not in known_ids
+    ]
+    state.save_records(known + recovered)
+    state.set_retry_queue(failed, max_attempts=params.get("max_retry_attempts", 5))
+
+
+async def scrape_new_forums(
+    *,
+    client: httpx.AsyncClient,
+    sem: asyncio.Semaphore | AdaptiveLimiter,
+    params: dict,
+    state: ScrapeState,
+    summary: ScrapeSummary | None = None,
+) -> list[dict]:
+    """Fetches pages newest-first until reaching posts scraped by an earlier run.
+
+    A page that still fails after retrying ends the run early and is queued
+    for the next one; the posts found before it are kept.
+
+    Args:
+        client: HTTP client for making requests.
+        sem: Semaphore or adaptive limiter bounding concurrent requests.
+        params: The ``web_scraping`` parameters; ``base_url`` and
+            ``incremental_max_pages``, the most pages fetched in one run, are
+            read.
+        state: Scraper state holding the previously scraped records.
+        summary: Optional counters updated with the pages fetched and failed.
+    Returns:
+        New records followed by the previously scraped ones.
+    """
+    summary = summary if summary is not None else ScrapeSummary()
+    base_url = params["base_url"]
+    max_pages = params.get("incremental_max_pages", 50)
+    known = state.load_records()
+    known_ids = {record["id"] for record in known if record.get("id")}
 
+    new_forums = []
+    for page in range(1, max_pages + 1):
+        try:
+            forums = await fetch_forum_page(
+                client=client, page=page, sem=sem, base_url=base_url
+            )
+        except Exception as e:  # noqa: BLE001 - queued for the next run
+            logger.warning(f"Page {page} failed: {e!r}")
+            summary.failed += 1
+            state.add_to_retry_queue(page, repr(e))
+            break
+        summary.fetched += 1
+        unseen = [forum for forum in forums if forum.get("id") not in known_ids]
+        new_forums.extend(unseen)
+        if not forums or len(unseen) < len(forums):
+            break
+    else:
+        logger.warning(
+            f"High-water mark {state.high_water_mark} not found in {max_pages} pages"
+        )
+
+    new_ids = {forum["id"] for forum in new_forums if forum.get("id")}
+    forums = new_forums + [
+        record for record in known if record.get("id") not in new_ids
+    ]
+    state.save_records(forums)
+    logger.info(f"Incremental scrape found {len(new_forums)} new posts")
+    return forums
+
+
+def make_client(params: dict) -> tuple[httpx.AsyncClient, AdaptiveLimiter]:
+    """Builds the HTTP client and concurrency limiter described by ``params``.
+
+    Args:
+        params: The ``web_scraping`` parameters.
+    Returns:
+        HTTP client, and the adaptive limiter bounding its requests.
+    """
     concurrent_limit = params.get("concurrent_limit", 3)
     timeout_sec = params.get("timeout", 20)
     headers = params.get("headers", {})
@@ -86,22 +344,138 @@ async def scrape_forum_page(params: dict) -> list[dict]:
         logger.warning("Invalid headers, using empty dict.")
         headers = {}
 
-    sem = asyncio.Semaphore(concurrent_limit)
+    max_concurrency = params.get("max_concurrency", max(concurrent_limit, 16))
+    sem = AdaptiveLimiter(
+        initial=concurrent_limit,
+        max_limit=max_concurrency,
+        target_latency=params.get("target_latency", 2.0),
+        max_requests_per_second=params.get("max_requests_per_second"),
+    )
     timeout = httpx.Timeout(timeout_sec)
+    limits = httpx.Limits(
+        max_connections=max_concurrency, max_keepalive_connections=max_concurrency
+    )
+    client = httpx.AsyncClient(timeout=timeout, headers=headers, limits=limits)
+    return client, sem
 
-    # sem = asyncio.Semaphore(params["concurrent_limit"])
-    # timeout = httpx.Timeout(params["timeout"])
-    # base_url = params["base_url"]
-    # headers = params["headers"]
 
-    async with httpx.AsyncClient(timeout=timeout, headers=headers) as client:
-        page_end = await get_total_pages(client, base_url)
+class PageStream:
+    """Yields the records of each page as soon as it is fetched.
+
+    At most ``max_buffered`` fetched pages wait for the consumer; once they
+    do, fetching pauses until it catches up, so memory does not grow with
+    the number of pages. Pages arrive in completion order, not page order.
+
+    Args:
+        client: HTTP client for making requests.
+        sem: Semaphore or adaptive limiter bounding concurrent requests.
+        base_url: URL template with a ``{page}`` placeholder.
+        pages: Page numbers to fetch.
+        max_buffered: Fetched pages held while the consumer is busy.
+    Attributes:
+        failed: Error of each page that still failed after retrying.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        sem: asyncio.Semaphore | AdaptiveLimiter,
+        base_url: str,
+        pages: list[int],
+        max_buffered: int = 8,
+    ):
+        self.client = client
+        self.sem = sem
+        self.base_url = base_url
+        self.pages = pages
+        self.max_buffered = max_buffered
+        self.failed: dict[int, str] = {}
+
+    async def __aiter__(self) -> AsyncIterator[list[dict]]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_buffered)
+        remaining = iter(self.pages)
+        worker_done = object()
+        # One fetching coroutine per request an adaptive limiter may allow;
+        # ``sem`` still bounds how many are in flight
+        workers = getattr(self.sem, "max_limit", self.max_buffered)
+
+        async def worker() -> None:
+            for page in remaining:
+                try:
+                    forums = await fetch_forum_page(
+                        client=self.client,
+                        page=page,
+                        sem=self.sem,
+                        base_url=self.base_url,
+                    )
+                except Exception as e:  # noqa: BLE001 - reported through ``failed``
+                    logger.warning(f"Page {page} failed: {e!r}")
+                    self.failed[page] = repr(e)
+                    continue
+                await queue.put(forums)
+            await queue.put(worker_done)
+
         tasks = [
-            fetch_forum_page(client=client, page=page, sem=sem, base_url=base_url)
-            for page in range(1, page_end + 1)
+            asyncio.create_task(worker()) for _ in range(min(workers, len(self.pages)))
         ]
-        results = await tqdm_asyncio.gather(*tasks)
-        return [forum for sublist in results for forum in sublist]
+        running = len(tasks)
+        try:
+            while running:
+                forums = await queue.get()
+                if forums is worker_done:
+                    running -= 1
+                else:
+                    yield forums
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def scrape_forum_page(params: dict) -> list[dict]:
+    base_url = params.get("base_url")
+    if not base_url:
+        raise ValueError("Base URL is required.")
+
+    client, sem = make_client(params)
+    state_dir = params.get("state_dir")
+    state = ScrapeState(state_dir) if state_dir else None
+    incremental = (
+        params.get("mode", "full") == "incremental"
+        and state is not None
+        and state.high_water_mark is not None
+        and state.crawl is None
+    )
+    summary = ScrapeSummary()
+
+    async with client:
+        if incremental:
+            known_ids = {r["id"] for r in state.load_records() if r.get("id")}
+            await drain_retry_queue(
+                client=client, sem=sem, params=params, state=state, summary=summary
+            )
+            forums = await scrape_new_forums(
+                client=client, sem=sem, params=params, state=state, summary=summary
+            )
+            # Only the posts this run added; raw_forum_data appends them
+            forums = [forum for forum in forums if forum.get("id") not in known_ids]
+        else:
+            forums = ReplaceRecords(
+                await crawl_all_pages(
+                    client=client,
+                    sem=sem,
+                    base_url=base_url,
+                    state=state,
+                    summary=summary,
+                )
+            )
+
+    logger.info(
+        f"Scrape summary: {summary.fetched} pages fetched, "
+        f"{summary.failed} failed, {summary.retried} retried, "
+        f"final concurrency {int(sem.limit)}"
+    )
+    return forums
 
 
 def run_scraping_pipeline(params: dict) -> list[dict]:
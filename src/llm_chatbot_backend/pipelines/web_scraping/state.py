@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class ScrapeState:
+    """On-disk progress of the forum scraper.
+
+    The state directory holds:
+
+    * ``state.json`` with the high-water mark (newest forum id seen), the
+      pages already completed by an unfinished full crawl and the retry
+      queue of pages that failed in earlier runs.
+    * ``pages/`` with the records of each completed page of that crawl, so a
+      crashed crawl resumes instead of starting over.
+    * ``records.json`` with every record scraped so far, which incremental
+      runs extend with the new posts.
+
+    Args:
+        state_dir: Directory holding the scraper state.
+    """
+
+    def __init__(self, state_dir: str):
+        self._dir = Path(state_dir)
+        self._pages_dir = self._dir / "pages"
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._state = self._read(self._dir / "state.json", {})
+
+    @property
+    def high_water_mark(self) -> str | None:
+        return self._state.get("high_water_mark")
+
+    @property
+    def crawl(self) -> dict | None:
+        """The unfinished full crawl, with ``total_pages`` and ``completed``."""
+        return self._state.get("crawl")
+
+    @property
+    def retry_queue(self) -> list[dict]:
+        """Failed pages as ``{"page", "error", "attempts"}`` entries."""
+        return self._state.get("retry_queue", [])
+
+    def set_retry_queue(
+        self, failed: dict[int, str], max_attempts: int | None = None
+    ) -> None:
+        """Replaces the retry queue with the pages that failed in this run.
+
+        Args:
+            failed: Error message of each failed page.
+            max_attempts: Pages that failed this many runs are dropped.
+        """
+        attempts = {entry["page"]: entry["attempts"] for entry in self.retry_queue}
+        queue = []
+        for page, error in sorted(failed.items()):
+            entry = {
+                "page": page,
+                "error": error,
+                "attempts": attempts.get(page, 0) + 1,
+            }
+            if max_attempts is not None and entry["attempts"] >= max_attempts:
+                logger.warning(f"Giving up on page {page} after {max_attempts} runs")
+                continue
+            queue.append(entry)
+        self._state["retry_queue"] = queue
+        self._save_state()
+
+    def add_to_retry_queue(self, page: int, error: str) -> None:
+        attempts = next(
+            (entry["attempts"] for entry in self.retry_queue if entry["page"] == page),
+            0,
+        )
+        queue = [entry for entry in self.retry_queue if entry["page"] != page]
+        queue.append({"page": page, "error": error, "attempts": attempts + 1})
+        self._state["retry_queue"] = sorted(queue, key=lambda entry: entry["page"])
+        self._save_state()
+
+    def start_crawl(self, total_pages: int) -> None:
+        self._state["crawl"] = {"total_pages": total_pages, "completed": []}
+        self._save_state()
+
+    def checkpoint_page(self, page: int, records: list[dict]) -> None:
+        """Persists the records of a completed page of the current crawl."""
+        self._write(self._pages_dir / f"page_{page}.json", records)
+        self.crawl["completed"] = sorted({*self.crawl["completed"], page})
+        self._save_state()
+
+    def load_page(self, page: int) -> list[dict]:
+        return self._read(self._pages_dir / f"page_{page}.json", [])
+
+    def finish_crawl(self, records: list[dict]) -> None:
+        """Stores the crawled corpus, moves the high-water mark, drops checkpoints."""
+        self.save_records(records)
+        self._state.pop("crawl", None)
+        self._save_state()
+        shutil.rmtree(self._pages_dir, ignore_errors=True)
+
+    def load_records(self) -> list[dict]:
+        return self._read(self._dir / "records.json", [])
+
+    def save_records(self, records: list[dict]) -> None:
+        self._write(self._dir / "records.json", records)
+        newest = next((record["id"] for record in records if record.get("id")), None)
+        if newest:
+            self._state["high_water_mark"] = newest
+        self._save_state()
+
+    def _save_state(self) -> None:
+        self._write(self._dir / "state.json", self._state)
+
+    @staticmethod
+    def _read(path: Path, default):
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return default
+
+    @staticmethod
+    def _write(path: Path, data) -> None:
+        # Write then rename so a crash never leaves a half-written file behind
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from email.utils import parsedate_to_datetime
+
+from tenacity import RetryCallState, wait_exponential_jitter
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Converts a ``Retry-After`` header (seconds or HTTP date) to seconds."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+_backoff = wait_exponential_jitter(initial=1, max=30)
+
+
+def wait_retry_after(retry_state: RetryCallState) -> float:
+    """Tenacity wait honouring ``Retry-After``, else exponential backoff."""
+    response = getattr(retry_state.outcome.exception(), "response", None)
+    if response is not None:
+        delay = parse_retry_after(response.headers.get("Retry-After"))
+        if delay is not None:
+            return delay
+    return _backoff(retry_state)
+
+
+class AdaptiveLimiter:
+    """Concurrency limit that adapts to how the server is coping (AIMD).
+
+    Used like ``asyncio.Semaphore``. Each healthy response (fast and not
+    throttled) grows the limit by ``1 / limit``, i.e. by one slot per full
+    window of requests. A 429 or 5xx halves it and pauses new requests for
+    the server's ``Retry-After``. Request starts are also spaced to stay
+    under ``max_requests_per_second``.
+
+    Args:
+        initial: Starting number of concurrent requests.
+        min_limit: Lowest concurrency the limiter backs off to.
+        max_limit: Highest concurrency it grows to.
+        target_latency: Responses slower than this (seconds) stop growth.
+        max_requests_per_second: Optional ceiling on the request rate.
+    """
+
+    def __init__(
+        self,
+        initial: int = 3,
+        min_limit: int = 1,
+        max_limit: int = 16,
+        target_latency: float = 2.0,
+        max_requests_per_second: float | None = None,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.limit = float(min(max(initial, min_limit), max_limit))
+        self._interval = 1 / max_requests_per_second if max_requests_per_second else 0
+        self._next_start = 0.0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+
+    async def __aenter__(self) -> "AdaptiveLimiter":
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < int(self.limit))
+            self._in_flight += 1
+        await self._wait_for_turn()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    async def record(
+        self,
+        latency: float,
+        status: int | None = None,
+        retry_after: float | None = None,
+    ) -> None:
+        """Feeds back the outcome of one request.
+
+        Args:
+            latency: Seconds the request took.
+            status: HTTP status code, or None if the request errored.
+            retry_after: Seconds the server asked us to wait, if any.
+        """
+        now = time.monotonic()
+        if status is None or status in THROTTLE_STATUS:
+            # Requests already in flight at the last back-off all see the same
+            # overload; only halve once per round-trip
+            if now - latency >= self._last_decrease:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self._last_decrease = now
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            logger.debug(f"Throttled ({status}), concurrency -> {int(self.limit)}")
+        elif latency <= self.target_latency:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        async with self._condition:
+            self._condition.notify_all()
+
+    async def _wait_for_turn(self) -> None:
+        # Reserve the next start slot before sleeping so concurrent callers
+        # space themselves out instead of all waking at once
+        now = time.monotonic()
+        start = max(now, self._next_start, self._paused_until)
+        self._next_start = start + self._interval
+        if start > now:
+            await asyncio.sleep(start - now)
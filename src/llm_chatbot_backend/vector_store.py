@@ -0,0 +1,291 @@
+"""Helpers shared by the pipeline that writes the Chroma store and the
+serving code that reads it.
+
+``collection_version.json`` under the persist path is the pointer between
+the two: the pipeline replaces it atomically after writing a collection, and
+readers query whichever collection it names.
+
+Duplicate vectors left by older pipeline runs can be removed with::
+
+    python -m llm_chatbot_backend.vector_store compact data/04_chroma_db \
+        --records data/02_cleaned/forum_data.jsonl.gz
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import uuid
+from collections.abc import Iterable, Mapping
+from datetime import datetime, timezone
+from pathlib import Path
+
+import chromadb
+
+from llm_chatbot_backend.datasets.utf8_json import Utf8JSONLines
+
+logger = logging.getLogger(__name__)
+
+CHROMA_COLLECTION = "forum_data"
+VERSION_FILE = "collection_version.json"
+# Blue/green rebuilds write ``forum_data_<version>`` next to the live collection
+VERSIONED_PREFIX = f"{CHROMA_COLLECTION}_"
+
+# L2 distance under which a validation sample counts as finding itself
+SELF_MATCH_MAX_DISTANCE = 1e-3
+
+# Ids produced by the old ``f"doc_{hash(context)}"`` fallback, salted per process
+_LEGACY_ID = re.compile(r"^doc_-?\d+$")
+
+
+def content_hash(context: str) -> str:
+    """Stable digest of a RAG context, identical across processes and runs."""
+    return hashlib.sha256(context.encode("utf-8")).hexdigest()
+
+
+def document_id(item: dict, digest: str) -> str:
+    """Returns a stable Chroma id: the source forum id, else the content digest."""
+    return item.get("id") or f"doc_{digest}"
+
+
+def build_rag_context(data) -> str:
+    """Constructs a context string for retrieval-augmented generation (RAG) from the input data."""
+    return f"""[คำถามจากผู้ใช้]
+        {data["forum_text"]}
+
+        [คำตอบจากแพทย์]
+        {data["doctor_reply"]}
+
+        [โรคที่เกี่ยวข้อง]
+        {data["disease_text"]}
+
+        [แท็ก]
+        {", ".join(data["tags"])}
+        """
+
+
+def document_ids_by_digest(records: Iterable[dict]) -> dict[str, str]:
+    """Maps the ``content_hash`` of each cleaned record's context to its Chroma id."""
+    ids = {}
+    for item in records:
+        digest = content_hash(build_rag_context(item))
+        ids[digest] = document_id(item, digest)
+    return ids
+
+
+def new_collection_version() -> str:
+    """Returns a version string that sorts after every earlier one."""
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S%f")
+    return f"{timestamp}{uuid.uuid4().hex[:4]}"
+
+
+def versioned_collection_name(version: str) -> str:
+    return f"{VERSIONED_PREFIX}{version}"
+
+
+def write_collection_version(
+    persist_path: str,
+    collection_name: str = CHROMA_COLLECTION,
+    version: str | None = None,
+) -> str:
+    """Points readers at ``collection_name`` under a new version.
+
+    The file is replaced atomically so readers never see a partial write.
+
+    Args:
+        persist_path: Directory of the persistent Chroma client.
+        collection_name: Collection that was written.
+        version: Version to record; a new one is generated by default.
+    Returns:
+        The new version string.
+    """
+    version = version or new_collection_version()
+    path = Path(persist_path) / VERSION_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"collection": collection_name, "version": version}, f)
+    os.replace(tmp_path, path)
+    return version
+
+
+def read_collection_pointer(persist_path: str) -> dict | None:
+    """Returns the ``{"collection", "version"}`` readers should use, if any."""
+    try:
+        with open(Path(persist_path) / VERSION_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def read_collection_version(persist_path: str) -> str | None:
+    """Returns the current collection version, or None if none was written."""
+    return (read_collection_pointer(persist_path) or {}).get("version")
+
+
+def active_collection_name(persist_path: str, default: str = CHROMA_COLLECTION) -> str:
+    """Returns the collection readers should query under ``persist_path``."""
+    return (read_collection_pointer(persist_path) or {}).get("collection") or default
+
+
+def garbage_collect_collections(
+    client: chromadb.ClientAPI, persist_path: str, keep: int = 2
+) -> list[str]:
+    """Deletes old versioned collections.
+
+    The active collection and the ``keep`` newest versions are kept, so
+    readers still holding the previous collection can finish their queries.
+
+    Args:
+        client: Client of the persistent Chroma store.
+        persist_path: Directory of the persistent Chroma client.
+        keep: Number of newest versioned collections to keep.
+    Returns:
+        Names of the deleted collections.
+    """
+    active = active_collection_name(persist_path)
+    versions = sorted(
+        (
+            collection.name
+            for collection in client.list_collections()
+            if collection.name.startswith(VERSIONED_PREFIX)
+        ),
+        reverse=True,
+    )
+    stale = [name for name in versions[keep:] if name != active]
+    for name in stale:
+        client.delete_collection(name=name)
+    if stale:
+        logger.info(f"Deleted old collections: {', '.join(stale)}")
+    return stale
+
+
+def validate_collection(collection, expected_count: int, samples: list[dict]) -> None:
+    """Checks a freshly built collection before readers are pointed at it.
+
+    Args:
+        collection: Collection to check.
+        expected_count: Number of documents it should hold.
+        samples: Records written to it; each must be its own nearest match.
+    Raises:
+        RuntimeError: If the collection is empty, has the wrong size, or a
+            sample is not found.
+    """
+    count = collection.count()
+    if count == 0 or count != expected_count:
+        raise RuntimeError(
+            f"Collection {collection.name} has {count} documents, "
+            f"expected {expected_count}"
+        )
+    for sample in samples:
+        result = collection.query(
+            query_embeddings=[sample["embedding"]],
+            n_results=1,
+            include=["distances"],
+        )
+        # Identical posts share a vector, so check the distance, not the id
+        if (
+            not result["distances"][0]
+            or result["distances"][0][0] > SELF_MATCH_MAX_DISTANCE
+        ):
+            raise RuntimeError(
+                f"Collection {collection.name} does not return document "
+                f"{sample['id']} for its own embedding"
+            )
+
+
+def compact_collection(
+    persist_path: str,
+    collection_name: str | None = None,
+    ids_by_digest: Mapping[str, str] | None = None,
+) -> dict[str, int]:
+    """Removes duplicate documents from a Chroma collection.
+
+    Documents with identical text are collapsed into one. Survivors that
+    still carry a legacy process-salted id are re-keyed to the id the
+    pipeline gives their text, usually the source forum id, so later upserts
+    overwrite them instead of adding new copies. The forum id is not stored
+    in Chroma, so legacy ids whose text is not in ``ids_by_digest`` are kept;
+    the next ``in_place`` pipeline run deletes them as stale.
+
+    Args:
+        persist_path: Directory of the persistent Chroma client.
+        collection_name: Collection to compact; defaults to the active one.
+        ids_by_digest: Id the pipeline writes for each ``content_hash``, e.g.
+            from ``document_ids_by_digest`` over the cleaned records.
+    Returns:
+        Document counts before and after, and how many were removed.
+    """
+    ids_by_digest = ids_by_digest or {}
+    collection_name = collection_name or active_collection_name(persist_path)
+    client = chromadb.PersistentClient(path=persist_path)
+    collection = client.get_collection(name=collection_name)
+    records = collection.get(include=["documents", "embeddings", "metadatas"])
+    batch_size = client.get_max_batch_size()
+
+    # Prefer keeping documents whose id is already stable
+    order = sorted(
+        range(len(records["ids"])),
+        key=lambda i: bool(_LEGACY_ID.match(records["ids"][i])),
+    )
+    seen, stale_ids, rekeyed = set(), [], []
+    for i in order:
+        doc_id = records["ids"][i]
+        digest = content_hash(records["documents"][i])
+        if digest in seen:
+            stale_ids.append(doc_id)
+            continue
+        seen.add(digest)
+        if _LEGACY_ID.match(doc_id) and digest in ids_by_digest:
+            stale_ids.append(doc_id)
+            rekeyed.append(i)
+
+    for start in range(0, len(rekeyed), batch_size):
+        chunk = rekeyed[start : start + batch_size]
+        collection.upsert(
+            ids=[ids_by_digest[content_hash(records["documents"][i])] for i in chunk],
+            documents=[records["documents"][i] for i in chunk],
+            embeddings=[records["embeddings"][i] for i in chunk],
+            metadatas=[records["metadatas"][i] for i in chunk],
+        )
+    for start in range(0, len(stale_ids), batch_size):
+        collection.delete(ids=stale_ids[start : start + batch_size])
+
+    if stale_ids and collection_name == active_collection_name(persist_path):
+        write_collection_version(persist_path, collection_name)
+    stats = {
+        "before": len(records["ids"]),
+        "after": collection.count(),
+        "removed": len(stale_ids) - len(rekeyed),
+    }
+    logger.info(
+        f"Compacted {collection_name}: {stats['before']} -> {stats['after']} documents"
+    )
+    return stats
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m llm_chatbot_backend.vector_store")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compact = subparsers.add_parser("compact", help="remove duplicate documents")
+    compact.add_argument("persist_path")
+    compact.add_argument("--collection", help="defaults to the active collection")
+    compact.add_argument(
+        "--records",
+        help="cleaned forum records (JSON Lines) giving the ids to re-key legacy ids to",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "compact":
+        ids_by_digest = None
+        if args.records:
+            records = Utf8JSONLines(args.records, lazy=True).load()
+            ids_by_digest = document_ids_by_digest(records)
+        compact_collection(args.persist_path, args.collection, ids_by_digest)
+
+
+if __name__ == "__main__":
+    main()
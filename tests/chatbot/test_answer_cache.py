@@ -0,0 +1,51 @@
+import pytest
+
+from llm_chatbot_backend.chatbot.answer_cache import SemanticAnswerCache
+from llm_chatbot_backend.vector_store import (
+    read_collection_version,
+    write_collection_version,
+)
+
+
+@pytest.fixture
+def cache(tmp_path) -> SemanticAnswerCache:
+    return SemanticAnswerCache(str(tmp_path), threshold=0.95, max_entries=2)
+
+
+def test_near_duplicate_query_hits(cache):
+    cache.store([1.0, 0.0], ["doc1", "doc2"], "answer")
+
+    assert cache.lookup([0.99, 0.05], ["doc1", "doc2"]) == "answer"
+    assert cache.lookup([0.0, 1.0], ["doc1", "doc2"]) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_different_context_misses(cache):
+    cache.store([1.0, 0.0], ["doc1", "doc2"], "answer")
+    assert cache.lookup([1.0, 0.0], ["doc1", "doc3"]) is None
+
+
+def test_size_bounded_eviction(cache):
+    cache.store([1.0, 0.0], ["a"], "answer a")
+    cache.store([0.0, 1.0], ["b"], "answer b")
+    cache.lookup([1.0, 0.0], ["a"])
+    cache.store([1.0, 1.0], ["c"], "answer c")
+
+    assert len(cache) == 2
+    assert cache.lookup([0.0, 1.0], ["b"]) is None
+    assert cache.lookup([1.0, 0.0], ["a"]) == "answer a"
+
+
+def test_invalidated_when_collection_rebuilt(tmp_path, cache):
+    cache.store([1.0, 0.0], ["doc1"], "answer")
+    write_collection_version(str(tmp_path))
+
+    assert cache.lookup([1.0, 0.0], ["doc1"]) is None
+    assert len(cache) == 0
+
+
+def test_collection_version_roundtrip(tmp_path):
+    assert read_collection_version(str(tmp_path)) is None
+    version = write_collection_version(str(tmp_path / "db"))
+    assert read_collection_version(str(tmp_path / "db")) == version
+    assert write_collection_version(str(tmp_path / "db")) != version
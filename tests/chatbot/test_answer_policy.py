@@ -0,0 +1,79 @@
+import pytest
+
+from llm_chatbot_backend.chatbot.answer_policy import (
+    DIRECT,
+    LLM,
+    NO_MATCH,
+    NO_MATCH_ANSWER,
+    SHORT,
+    AnswerPolicy,
+)
+from llm_chatbot_backend.chatbot.retrieval import RetrievedDocument
+from llm_chatbot_backend.pipelines.data_processing.nodes import build_rag_context
+
+
+def document(
+    doc_id: str, similarity: float | None, reply: str = "พักผ่อน"
+) -> RetrievedDocument:
+    text = build_rag_context(
+        {"forum_text": "ปวดหัว", "doctor_reply": reply, "disease_text": "", "tags": []}
+    )
+    return RetrievedDocument(id=doc_id, text=text, similarity=similarity)
+
+
+def test_no_documents_answer_without_llm():
+    decision = AnswerPolicy().decide([])
+
+    assert decision.route == NO_MATCH
+    assert decision.answer == NO_MATCH_ANSWER
+
+
+@pytest.mark.parametrize("below_floor", [NO_MATCH, SHORT, LLM])
+def test_weak_retrieval_takes_below_floor_route(below_floor):
+    policy = AnswerPolicy(min_similarity=0.3, below_floor=below_floor)
+
+    decision = policy.decide([document("a", 0.2), document("b", 0.1)])
+
+    assert decision.route == below_floor
+    assert decision.similarity == pytest.approx(0.2)
+    assert (decision.answer is not None) == (below_floor == NO_MATCH)
+
+
+def test_strong_match_returns_doctor_reply():
+    policy = AnswerPolicy(direct_similarity=0.9, direct_margin=0.05)
+
+    decision = policy.decide(
+        [document("a", 0.7), document("b", 0.95, reply="ดื่มน้ำมาก ๆ ค่ะ")]
+    )
+
+    assert decision.route == DIRECT
+    assert decision.doc_id == "b"
+    assert decision.answer.endswith("ดื่มน้ำมาก ๆ ค่ะ")
+
+
+def test_close_runner_up_goes_to_llm():
+    policy = AnswerPolicy(direct_similarity=0.9, direct_margin=0.05)
+
+    decision = policy.decide([document("a", 0.95), document("b", 0.93)])
+
+    assert decision.route == LLM and decision.answer is None
+
+
+def test_unknown_similarity_goes_to_llm():
+    decision = AnswerPolicy().decide([RetrievedDocument(id="a", text="doc a")])
+
+    assert decision.route == LLM
+
+
+def test_counts_routes():
+    policy = AnswerPolicy()
+    policy.decide([])
+    policy.decide([document("a", 0.5), document("b", 0.4)])
+
+    assert policy.stats.counts == {NO_MATCH: 1, LLM: 1}
+    assert policy.stats.llm_skipped_rate == 0.5
+
+
+def test_rejects_unknown_below_floor_route():
+    with pytest.raises(ValueError, match="below_floor"):
+        AnswerPolicy(below_floor=DIRECT)
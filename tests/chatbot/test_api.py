@@ -0,0 +1,166 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from llm_chatbot_backend.chatbot.api import create_app
+from llm_chatbot_backend.chatbot.config import ChatbotConfig
+from llm_chatbot_backend.chatbot.fake_llm import FakeStreamingClient
+from llm_chatbot_backend.chatbot.resources import ResourceRegistry
+
+
+@pytest.fixture
+def config() -> ChatbotConfig:
+    return ChatbotConfig(embedding_model="model-a", chroma_persist_path="/tmp/chroma")
+
+
+@pytest.fixture
+def registry(config) -> ResourceRegistry:
+    resources = MagicMock()
+    resources.embed_model = config.embedding_model
+    resources.persist_path = config.chroma_persist_path
+    resources.collection_name = "forum_data"
+    resources.model.encode.side_effect = lambda texts: np.ones((len(texts), 2))
+    resources.collection.query.return_value = {
+        "ids": [["id-a", "id-b"]],
+        "documents": [["doc a", "doc b"]],
+    }
+    registry = ResourceRegistry()
+    registry._resources = resources
+    return registry
+
+
+def test_retrieve_endpoint(config, registry):
+    app = create_app(config, FakeStreamingClient(), registry)
+    with TestClient(app) as client:
+        response = client.post("/retrieve", json={"query": "ปวดหัว", "top_k": 2})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [doc["id"] for doc in body["documents"]] == ["id-a", "id-b"]
+    assert [doc["text"] for doc in body["documents"]] == ["doc a", "doc b"]
+    # The mocked collection returns no embeddings, so Gemini would answer
+    assert body["decision"]["route"] == "llm"
+    registry._resources.collection.query.assert_called_once()
+    assert registry._resources.collection.query.call_args.kwargs["n_results"] == 2
+
+
+def test_retrieve_endpoint_reports_similarity_and_decision(config, registry):
+    registry._resources.collection.query.return_value = {
+        "ids": [["id-a", "id-b"]],
+        "documents": [["[คำตอบจากแพทย์]\nดื่มน้ำมาก ๆ", "doc b"]],
+        "distances": [[0.0, 4.0]],
+        "metadatas": [[{"disease_key": "headache"}, None]],
+        "embeddings": [np.array([[1.0, 1.0], [1.0, -1.0]])],
+    }
+    app = create_app(config, FakeStreamingClient(), registry)
+    with TestClient(app) as client:
+        body = client.post("/retrieve", json={"query": "ปวดหัว"}).json()
+        health = client.get("/health").json()
+
+    first = body["documents"][0]
+    assert first["similarity"] == pytest.approx(1.0)
+    assert first["distance"] == 0.0
+    assert first["metadata"] == {"disease_key": "headache"}
+    assert body["decision"]["route"] == "direct"
+    assert body["decision"]["doc_id"] == "id-a"
+    # Only answers count towards the routes
+    assert health["answer_routes"] == {}
+
+
+def test_answer_endpoint(config, registry):
+    llm_client = FakeStreamingClient(answer="พักผ่อนให้เพียงพอ")
+    app = create_app(config, llm_client, registry)
+    with TestClient(app) as client:
+        response = client.post("/answer", json={"query": "ปวดหัว"})
+        health = client.get("/health").json()
+
+    assert response.json()["answer"] == "พักผ่อนให้เพียงพอ"
+    contents = llm_client.models.calls[0]["contents"]
+    assert "[1] doc a" in contents and "[2] doc b" in contents
+    assert health["batches"] == 1
+    assert health["mean_answer_ms"] > 0
+
+
+def test_answer_endpoint_reuses_cached_answer(config, registry):
+    llm_client = FakeStreamingClient(answer="พักผ่อนให้เพียงพอ")
+    app = create_app(config, llm_client, registry)
+    with TestClient(app) as client:
+        first = client.post("/answer", json={"query": "ปวดหัว"}).json()
+        second = client.post("/answer", json={"query": "ปวดหัว ๆ"}).json()
+        health = client.get("/health").json()
+
+    assert first["answer"] == second["answer"]
+    assert len(llm_client.models.calls) == 1
+    assert health["answer_cache_hits"] == 1
+
+
+def test_answer_endpoint_skips_llm_for_strong_match(config, registry):
+    # Query embeddings are all ones, so "id-a" is an exact match
+    registry._resources.collection.query.return_value = {
+        "ids": [["id-a", "id-b"]],
+        "documents": [["[คำตอบจากแพทย์]\nดื่มน้ำมาก ๆ", "doc b"]],
+        "embeddings": [np.array([[1.0, 1.0], [1.0, -1.0]])],
+    }
+    llm_client = FakeStreamingClient()
+    app = create_app(config, llm_client, registry)
+    with TestClient(app) as client:
+        response = client.post("/answer", json={"query": "ปวดหัว"})
+        health = client.get("/health").json()
+
+    assert response.json()["answer"].endswith("ดื่มน้ำมาก ๆ")
+    assert llm_client.models.calls == []
+    assert health["answer_routes"] == {"direct": 1}
+    assert health["llm_skipped_rate"] == 1.0
+
+
+def test_answer_endpoint_shortens_llm_call_for_weak_match(registry):
+    config = ChatbotConfig(
+        embedding_model="model-a",
+        chroma_persist_path="/tmp/chroma",
+        answer_below_floor="short",
+        short_answer_max_tokens=100,
+    )
+    registry._resources.collection.query.return_value = {
+        "ids": [["id-a"]],
+        "documents": [["doc a"]],
+        "embeddings": [np.array([[1.0, -1.0]])],
+    }
+    llm_client = FakeStreamingClient()
+    app = create_app(config, llm_client, registry)
+    with TestClient(app) as client:
+        client.post("/answer", json={"query": "ปวดหัว"})
+
+    call = llm_client.models.calls[0]
+    assert "doc a" not in call["contents"]
+    assert call["config"].max_output_tokens == 100
+
+
+def test_concurrent_identical_questions_call_backends_once(config, registry):
+    llm_client = FakeStreamingClient(answer="พักผ่อน", first_token_delay=0.3)
+    app = create_app(config, llm_client, registry)
+    with TestClient(app) as client:
+        # Each request blocks its thread, but all run on the app's event loop
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            responses = list(
+                pool.map(
+                    lambda query: client.post("/answer", json={"query": query}),
+                    ["ปวดหัว"] * 4 + ["ปวดหัว  "] * 4,
+                )
+            )
+        health = client.get("/health").json()
+
+    assert [response.json()["answer"] for response in responses] == ["พักผ่อน"] * 8
+    assert len(llm_client.models.calls) == 1
+    registry._resources.collection.query.assert_called_once()
+    assert registry._resources.model.encode.call_count == 1
+    assert health["coalesced_requests"] == 7
+
+
+def test_rejects_empty_query(config, registry):
+    app = create_app(config, FakeStreamingClient(), registry)
+    with TestClient(app) as client:
+        response = client.post("/retrieve", json={"query": ""})
+    assert response.status_code == 422
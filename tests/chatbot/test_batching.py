@@ -0,0 +1,61 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from llm_chatbot_backend.chatbot.batching import EmbeddingBatcher
+
+
+class CountingEncoder:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(text), 1.0] for text in texts])
+
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_are_batched():
+    encoder = CountingEncoder()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=32, max_wait_ms=50)
+
+    texts = [f"q{i}" * (i % 5 + 1) for i in range(200)]
+    results = await asyncio.gather(*(batcher.embed(text) for text in texts))
+    await batcher.stop()
+
+    assert [r[0] for r in results] == [len(text) for text in texts]
+    assert len(encoder.calls) <= 10
+    assert max(len(call) for call in encoder.calls) == 32
+    assert batcher.stats.items == 200
+
+
+@pytest.mark.asyncio
+async def test_single_query_waits_at_most_max_wait():
+    encoder = CountingEncoder()
+    batcher = EmbeddingBatcher(encoder, max_batch_size=32, max_wait_ms=20)
+
+    result = await asyncio.wait_for(batcher.embed("ปวดหัว"), timeout=1)
+    await batcher.stop()
+
+    assert result[0] == len("ปวดหัว")
+    assert encoder.calls == [["ปวดหัว"]]
+
+
+@pytest.mark.asyncio
+async def test_encode_errors_reach_every_waiter():
+    def failing_encode(texts):
+        raise RuntimeError("model failed")
+
+    batcher = EmbeddingBatcher(failing_encode, max_wait_ms=20)
+    results = await asyncio.gather(
+        batcher.embed("a"), batcher.embed("b"), return_exceptions=True
+    )
+    await batcher.stop()
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+def test_invalid_batch_size():
+    with pytest.raises(ValueError, match="max_batch_size"):
+        EmbeddingBatcher(CountingEncoder(), max_batch_size=0)
@@ -0,0 +1,25 @@
+from llm_chatbot_backend.chatbot.config import ChatbotConfig, load_config
+
+
+def test_load_config(tmp_path):
+    base = tmp_path / "base"
+    base.mkdir()
+    (tmp_path / "local").mkdir()
+    (base / "parameters.yml").write_text(
+        "chroma_persist_path: data/db\n"
+        "embedding_model: model-a\n"
+        "lexical_index_path: data/db/lexical_index.json\n"
+        "chatbot:\n"
+        "  top_k: 3\n"
+        "  max_wait_ms: 0\n"
+        "  unknown_key: 1\n"
+    )
+
+    config = load_config(str(tmp_path))
+
+    assert config.chroma_persist_path == "data/db"
+    assert config.embedding_model == "model-a"
+    assert config.lexical_index_path == "data/db/lexical_index.json"
+    assert config.top_k == 3
+    assert config.max_wait_ms == 0
+    assert config.max_batch_size == ChatbotConfig.max_batch_size
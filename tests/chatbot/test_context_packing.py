@@ -0,0 +1,75 @@
+from llm_chatbot_backend.chatbot.context_packing import (
+    ContextPacker,
+    compact_context,
+    tokenizer_counter,
+)
+from llm_chatbot_backend.chatbot.generation import build_prompt
+from llm_chatbot_backend.chatbot.retrieval import RetrievedDocument
+from llm_chatbot_backend.pipelines.data_processing.nodes import build_rag_context
+
+
+def rag_context(question: str, reply: str) -> str:
+    return build_rag_context(
+        {
+            "forum_text": question,
+            "doctor_reply": reply,
+            "disease_text": "ปวดศีรษะ",
+            "tags": ["ปวดศีรษะ", "ไมเกรน", "ไมเกรน", "ปวดหัว"],
+        }
+    )
+
+
+def test_compact_context_strips_labels_and_repeated_tags():
+    chunk, reply = compact_context(rag_context("ปวดหัวบ่อย", "ควรพักผ่อน\nให้เพียงพอ"))
+
+    assert chunk == "ถาม: ปวดหัวบ่อย\nแพทย์ตอบ: ควรพักผ่อน ให้เพียงพอ\nโรค: ปวดศีรษะ; ไมเกรน"
+    assert reply == "ควรพักผ่อน ให้เพียงพอ"
+    assert compact_context("  plain\n   text ") == ("plain text", "plain text")
+
+
+def test_pack_drops_near_identical_replies():
+    documents = [
+        RetrievedDocument("a", rag_context("ปวดหัว 1", "พักผ่อนและดื่มน้ำให้เพียงพอนะคะ")),
+        RetrievedDocument("b", rag_context("ปวดหัว 2", "พักผ่อนและดื่มน้ำให้เพียงพอนะคะ!")),
+        RetrievedDocument("c", rag_context("ปวดหัว 3", "ทานยาพาราเซตามอลได้ครั้งละหนึ่งเม็ด")),
+    ]
+
+    packed = ContextPacker().pack(documents)
+
+    assert packed.doc_ids == ["a", "c"]
+    assert packed.duplicates == 1
+    assert packed.tokens < packed.source_tokens
+
+
+def test_pack_orders_by_score_and_fills_budget():
+    documents = [
+        RetrievedDocument("low", "x" * 30, score=0.1),
+        RetrievedDocument("high", "y" * 60, score=0.9),
+        RetrievedDocument("mid", "z" * 90, score=0.5),
+    ]
+    packer = ContextPacker(max_tokens=35, count_tokens=len)
+
+    packed = packer.pack(documents)
+
+    assert packed.chunks == ["y" * 35]  # the best chunk is shortened to fit
+    assert packer.stats.prompts == 1 and packer.stats.tokens == 35
+
+    # "mid" does not fit after "high", but the smaller "low" still does
+    packed = ContextPacker(max_tokens=100, count_tokens=len).pack(documents)
+    assert packed.doc_ids == ["high", "low"]
+    assert packed.over_budget == 1
+
+
+def test_tokenizer_counter():
+    def tokenizer(text, add_special_tokens):
+        assert not add_special_tokens
+        return {"input_ids": text.split()}
+
+    assert tokenizer_counter(tokenizer)("ปวด หัว มาก") == 3
+
+
+def test_build_prompt_numbers_chunks_instead_of_a_list_repr():
+    prompt = build_prompt("ปวดหัว", ["chunk a", "chunk b"])
+
+    assert "[1] chunk a\n\n[2] chunk b" in prompt
+    assert "['chunk a'" not in prompt
@@ -0,0 +1,48 @@
+from llm_chatbot_backend.chatbot.context_packing import approx_tokens
+from llm_chatbot_backend.chatbot.conversation import SUMMARY_HEADER, ConversationMemory
+
+
+def test_empty_memory_leaves_query_and_prompt_unchanged():
+    memory = ConversationMemory()
+
+    assert memory.rewrite_query("ปวดหัว") == "ปวดหัว"
+    assert memory.history_block() == ""
+
+
+def test_old_turns_are_folded_into_summary():
+    memory = ConversationMemory(max_turns=2)
+    for i in range(4):
+        memory.add_turn(f"คำถาม {i}", f"คำตอบ {i}\nบรรทัดที่สอง")
+
+    assert [turn.question for turn in memory.turns] == ["คำถาม 2", "คำถาม 3"]
+    assert memory.summary.splitlines() == [
+        "- คำถาม 0: คำตอบ 0 บรรทัดที่สอง",
+        "- คำถาม 1: คำตอบ 1 บรรทัดที่สอง",
+    ]
+    block = memory.history_block()
+    assert block.startswith(SUMMARY_HEADER)
+    assert block.endswith("ผู้ใช้: คำถาม 3\nผู้ช่วย: คำตอบ 3\nบรรทัดที่สอง")
+
+
+def test_history_stays_under_token_cap_in_long_chats():
+    memory = ConversationMemory(max_turns=3, max_tokens=200, summary_tokens=80)
+    sizes = []
+    for i in range(100):
+        memory.add_turn(f"อาการที่ {i} " * 10, "ควรพักผ่อนและดื่มน้ำ " * 30)
+        sizes.append(approx_tokens(memory.history_block()))
+
+    assert max(sizes) <= 200
+    assert approx_tokens(memory.summary) <= 80
+    # The newest folded turn is kept, the oldest ones dropped
+    assert "อาการที่ 96" in memory.summary and "อาการที่ 0 " not in memory.summary
+
+
+def test_rewrite_query_adds_previous_questions_within_cap():
+    memory = ConversationMemory(rewrite_turns=2, rewrite_max_tokens=20)
+    memory.add_turn("ปวดหัวบ่อย", "พักผ่อน")
+    memory.add_turn("กินพาราได้ไหม", "ได้")
+
+    assert memory.rewrite_query("เด็กล่ะ") == "ปวดหัวบ่อย กินพาราได้ไหม เด็กล่ะ"
+    # Only the newest question fits the cap
+    short = ConversationMemory(rewrite_max_tokens=8, turns=memory.turns)
+    assert short.rewrite_query("เด็กล่ะ") == "กินพาราได้ไหม เด็กล่ะ"
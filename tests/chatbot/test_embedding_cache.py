@@ -0,0 +1,72 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from llm_chatbot_backend.chatbot.embedding_cache import QueryEmbeddingCache, embed_query
+
+
+def test_normalised_queries_share_an_entry():
+    cache = QueryEmbeddingCache("model-a")
+    cache.put("ปวดหัว  มาก", [1.0, 2.0])
+
+    assert cache.get("  ปวดหัว มาก ") is not None
+    assert cache.get("ปวดหัว มาก🥲") is not None
+    assert cache.get("เป็นไข้") is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+
+def test_lru_eviction():
+    cache = QueryEmbeddingCache("model-a", max_size=2)
+    cache.put("a", [1.0])
+    cache.put("b", [2.0])
+    cache.get("a")
+    cache.put("c", [3.0])
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+
+def test_ttl_expiry():
+    cache = QueryEmbeddingCache("model-a", ttl_seconds=10)
+    with patch("llm_chatbot_backend.chatbot.embedding_cache.time.time") as now:
+        now.return_value = 100.0
+        cache.put("a", [1.0])
+        now.return_value = 105.0
+        assert cache.get("a") is not None
+        now.return_value = 111.0
+        assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_persistence_survives_restart(tmp_path):
+    path = str(tmp_path / "cache" / "queries.sqlite")
+    cache = QueryEmbeddingCache("model-a", max_size=2, persist_path=path)
+    cache.put("a", [1.0, 2.0])
+    cache.put("b", [3.0, 4.0])
+    cache.put("c", [5.0, 6.0])  # evicts "a" from memory and disk
+
+    reloaded = QueryEmbeddingCache("model-a", max_size=2, persist_path=path)
+    other_model = QueryEmbeddingCache("model-b", persist_path=path)
+
+    assert reloaded.get("a") is None
+    np.testing.assert_array_equal(reloaded.get("c"), [5.0, 6.0])
+    assert len(other_model) == 0
+
+
+def test_embed_query_uses_cache():
+    model = MagicMock()
+    model.encode.return_value = np.array([[0.5, 0.5]])
+    cache = QueryEmbeddingCache("model-a")
+
+    embed_query(model, "ปวดหัว ", cache)
+    embed_query(model, "ปวดหัว", cache)
+
+    # The cleaned key is encoded, not whichever variant arrived first
+    model.encode.assert_called_once_with(["ปวดหัว"])
+
+
+def test_invalid_max_size():
+    with pytest.raises(ValueError, match="max_size"):
+        QueryEmbeddingCache("model-a", max_size=0)
@@ -0,0 +1,64 @@
+import threading
+import time
+
+from llm_chatbot_backend.chatbot.fake_llm import FakeStreamingClient
+from llm_chatbot_backend.chatbot.generation import (
+    LLM_MODEL,
+    build_prompt,
+    generate_answer,
+    stream_answer,
+)
+
+
+def test_build_prompt_includes_query_and_context():
+    prompt = build_prompt("ปวดหัว", ["ctx a"])
+    assert "ปวดหัว" in prompt
+    assert "ctx a" in prompt
+
+
+def test_build_prompt_includes_history_before_context():
+    prompt = build_prompt("เด็กล่ะ", ["ctx a"], history="ผู้ใช้: ปวดหัว")
+    assert prompt.index("ผู้ใช้: ปวดหัว") < prompt.index("ctx a")
+    assert "Conversation so far" not in build_prompt("q", ["ctx a"])
+
+
+def test_generate_answer():
+    client = FakeStreamingClient(answer="ตอบ")
+    assert generate_answer(client, build_prompt("q", ["c"])) == "ตอบ"
+    assert client.models.calls[0]["model"] == LLM_MODEL
+
+
+def test_stream_answer_matches_generate_answer():
+    client = FakeStreamingClient(answer="a" * 50, chunk_size=7)
+    chunks = list(stream_answer(client, build_prompt("q", ["c"])))
+    assert len(chunks) == 8
+    assert "".join(chunks) == generate_answer(client, build_prompt("q", ["c"]))
+    assert client.models.calls[0]["contents"] == client.models.calls[1]["contents"]
+
+
+def test_stream_answer_time_to_first_token():
+    # 40 chunks * 50 ms: the full answer takes ~2 s, the first chunk must not
+    client = FakeStreamingClient(
+        answer="x" * 40, chunk_size=1, first_token_delay=0.05, chunk_delay=0.05
+    )
+    start = time.perf_counter()
+    stream = stream_answer(client, build_prompt("q", ["c"]))
+    next(stream)
+    time_to_first_token = time.perf_counter() - start
+    stream.close()
+
+    assert time_to_first_token < 0.5
+    assert client.models.chunks_sent == 1
+
+
+def test_stream_answer_cancel_event():
+    client = FakeStreamingClient(answer="abcdef", chunk_size=1)
+    cancel_event = threading.Event()
+    received = []
+    for chunk in stream_answer(client, build_prompt("q", ["c"]), cancel_event):
+        received.append(chunk)
+        if len(received) == 2:
+            cancel_event.set()
+
+    assert received == ["a", "b"]
+    assert client.models.chunks_sent == 3
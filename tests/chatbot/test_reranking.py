@@ -0,0 +1,73 @@
+import time
+from unittest.mock import patch
+
+import pytest
+
+from llm_chatbot_backend.chatbot.reranking import Reranker
+from llm_chatbot_backend.chatbot.retrieval import RetrievedDocument
+
+
+class FakeCrossEncoder:
+    """Scores a pair by how many query characters the document contains."""
+
+    def __init__(self, *args, seconds_per_pair: float = 0.0, **kwargs):
+        self.seconds_per_pair = seconds_per_pair
+        self.calls = []
+
+    def predict(self, pairs, batch_size, show_progress_bar):
+        self.calls.append(len(pairs))
+        time.sleep(self.seconds_per_pair * len(pairs))
+        return [sum(ch in doc for ch in query) for query, doc in pairs]
+
+
+@pytest.fixture
+def fake_model():
+    model = FakeCrossEncoder()
+    with patch(
+        "llm_chatbot_backend.chatbot.reranking.CrossEncoder", return_value=model
+    ):
+        yield model
+
+
+def make_documents(texts: list[str]) -> list[RetrievedDocument]:
+    return [
+        RetrievedDocument(id=f"doc{i}", text=text, metadata={"content_hash": text})
+        for i, text in enumerate(texts)
+    ]
+
+
+def test_rerank_keeps_best_scored_documents(fake_model):
+    reranker = Reranker()
+    documents = make_documents(["x", "abc", "ab", "a"])
+
+    reranked = reranker.rerank("abc", documents, top_k=2)
+
+    assert [doc.id for doc in reranked] == ["doc1", "doc2"]
+    assert [doc.score for doc in reranked] == [3.0, 2.0]
+    assert fake_model.calls == [4]  # one batched call
+
+
+def test_rerank_reuses_cached_scores(fake_model):
+    reranker = Reranker()
+    documents = make_documents(["abc", "ab"])
+    reranker.rerank("abc", documents, top_k=2)
+
+    # Same cleaned query, one document changed its content
+    changed = [documents[0], RetrievedDocument("doc1", "b", metadata={})]
+    reranker.rerank("abc  ", changed, top_k=2)
+
+    assert fake_model.calls == [2, 1]
+    assert reranker.stats.cached_pairs == 1
+
+
+def test_rerank_skips_when_over_budget(fake_model):
+    fake_model.seconds_per_pair = 0.002
+    reranker = Reranker(budget_ms=20)
+    reranker.warm_up()
+    documents = make_documents([f"candidate {i}" for i in range(30)])
+
+    assert reranker.rerank("abc", documents, top_k=5) == documents[:5]
+    assert reranker.stats.skipped == 1
+
+    small = reranker.rerank("abc", documents[:3], top_k=2)
+    assert all(doc.score is not None for doc in small)
@@ -0,0 +1,120 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from llm_chatbot_backend.chatbot.resources import ResourceRegistry
+from llm_chatbot_backend.chatbot.retrieval import retrieve_relevant_documents
+from llm_chatbot_backend.lexical_index import BM25Index
+from llm_chatbot_backend.vector_store import write_collection_version
+
+
+@pytest.fixture
+def mock_backends():
+    with (
+        patch(
+            "llm_chatbot_backend.chatbot.resources.load_embedding_model"
+        ) as mock_model_class,
+        patch(
+            "llm_chatbot_backend.chatbot.resources.chromadb.PersistentClient"
+        ) as mock_client_class,
+    ):
+        mock_model_class.side_effect = lambda name: MagicMock(name=name)
+        mock_client_class.side_effect = lambda path: MagicMock(name=path)
+        yield mock_model_class, mock_client_class
+
+
+def test_registry_loads_once(mock_backends):
+    mock_model_class, mock_client_class = mock_backends
+    registry = ResourceRegistry()
+
+    first = registry.get("model-a", "/tmp/chroma")
+    second = registry.get("model-a", "/tmp/chroma")
+
+    assert first is second
+    assert mock_model_class.call_count == 1
+    assert mock_client_class.call_count == 1
+    first.model.encode.assert_called_once()  # warm-up encode
+    assert first.load_seconds >= 0
+
+
+def test_registry_reloads_on_key_change(mock_backends):
+    mock_model_class, mock_client_class = mock_backends
+    registry = ResourceRegistry()
+
+    first = registry.get("model-a", "/tmp/chroma")
+    registry.record_query(0.5)
+    second = registry.get("model-b", "/tmp/chroma")
+    third = registry.get("model-b", "/tmp/other")
+
+    assert first is not second is not third
+    assert mock_model_class.call_count == 3
+    assert registry.stats.queries == 0
+
+
+def test_registry_follows_collection_pointer(mock_backends, tmp_path):
+    persist_path = str(tmp_path)
+    registry = ResourceRegistry()
+
+    first = registry.get("model-a", persist_path)
+    assert first.collection_name == "forum_data"
+
+    write_collection_version(persist_path, "forum_data_v2", "v2")
+    second = registry.get("model-a", persist_path)
+
+    assert second.collection_name == "forum_data_v2"
+    assert second.model is first.model and second.client is first.client
+    second.client.get_collection.assert_called_once_with(name="forum_data_v2")
+    # The old resources object is left intact for queries still using it
+    assert first.collection_name == "forum_data"
+    assert registry.get("model-a", persist_path) is second
+
+
+def test_registry_reloads_rewritten_lexical_index(tmp_path):
+    registry = ResourceRegistry()
+    path = str(tmp_path / "lexical_index.json")
+    assert registry.lexical_index(None) is None
+    assert registry.lexical_index(path) is None  # not built yet
+
+    BM25Index.build(["a"], ["ปวดหัว"]).save(path)
+    first = registry.lexical_index(path)
+    assert registry.lexical_index(path) is first
+
+    BM25Index.build(["a", "b"], ["ปวดหัว", "มีไข้"]).save(path)
+    assert len(registry.lexical_index(path)) == 2
+
+
+def test_latency_stats():
+    registry = ResourceRegistry()
+    registry.record_query(0.2)
+    registry.record_query(0.4)
+    assert registry.stats.queries == 2
+    assert registry.stats.last_seconds == 0.4
+    assert registry.stats.mean_seconds == pytest.approx(0.3)
+
+
+def test_retrieve_relevant_documents_reuses_registry():
+    registry = ResourceRegistry()
+    resources = MagicMock()
+    resources.model.encode.return_value = [[0.1, 0.2]]
+    resources.collection.query.return_value = {
+        "ids": [["id-a", "id-b"]],
+        "documents": [["doc a", "doc b"]],
+    }
+    registry._resources = resources
+    resources.embed_model, resources.persist_path = "model-a", "/tmp/chroma"
+    resources.collection_name = "forum_data"
+
+    with patch(
+        "llm_chatbot_backend.chatbot.retrieval.get_registry", return_value=registry
+    ):
+        result = retrieve_relevant_documents("ปวดหัว", "model-a", "/tmp/chroma")
+        retrieve_relevant_documents("เป็นไข้", "model-a", "/tmp/chroma")
+
+    assert [doc.text for doc in result] == ["doc a", "doc b"]
+    assert [doc.id for doc in result] == ["id-a", "id-b"]
+    assert registry.stats.queries == 2
+    resources.collection.query.assert_called_with(
+        query_embeddings=[[0.1, 0.2]],
+        n_results=5,
+        include=["documents", "metadatas", "distances", "embeddings"],
+    )
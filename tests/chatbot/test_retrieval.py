@@ -0,0 +1,168 @@
+from unittest.mock import MagicMock, patch
+
+import chromadb
+import numpy as np
+import pytest
+
+from llm_chatbot_backend.chatbot.resources import ResourceRegistry
+from llm_chatbot_backend.chatbot.retrieval import (
+    Prefilter,
+    QueryOptions,
+    RetrievalOptions,
+    RetrievedDocument,
+    hybrid_query,
+    query_collection,
+    reciprocal_rank_fusion,
+    search,
+)
+from llm_chatbot_backend.disease_index import DiseaseCentroids
+from llm_chatbot_backend.lexical_index import BM25Index
+
+
+def test_reciprocal_rank_fusion():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=60)
+
+    assert [doc_id for doc_id, _ in fused] == ["a", "c", "b"]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+
+
+@pytest.fixture
+def collection(tmp_path):
+    collection = chromadb.PersistentClient(path=str(tmp_path)).create_collection(
+        "forum_data"
+    )
+    collection.add(
+        ids=["near", "mid", "drug"],
+        documents=["ปวดหัวบ่อย", "ปวดหัวข้างเดียว", "กินยาพาราเซตามอลเกินขนาด"],
+        embeddings=[[1.0, 0.0], [0.9, 0.1], [0.0, 1.0]],
+        metadatas=[{"disease_key": "headache"}] * 3,
+    )
+    return collection
+
+
+def test_hybrid_query_adds_keyword_matches(collection):
+    index = BM25Index.build(
+        ["near", "mid", "drug"],
+        ["ปวดหัวบ่อย", "ปวดหัวข้างเดียว", "กินยาพาราเซตามอลเกินขนาด"],
+    )
+
+    documents = hybrid_query(
+        collection,
+        index,
+        "พาราเซตามอล",
+        [1.0, 0.0],
+        QueryOptions(top_k=2, candidates=1),
+    )
+
+    # Vector search alone only finds "near"; BM25 brings in the exact drug name
+    assert {doc.id for doc in documents} == {"near", "drug"}
+    drug = next(doc for doc in documents if doc.id == "drug")
+    assert drug.text == "กินยาพาราเซตามอลเกินขนาด" and drug.distance is None
+    assert drug.similarity == pytest.approx(0.0, abs=1e-6)
+
+
+def test_query_collection_returns_cosine_similarity(collection):
+    documents = query_collection(collection, [2.0, 0.0], top_k=2)
+
+    assert [doc.id for doc in documents] == ["near", "mid"]
+    assert documents[0].similarity == pytest.approx(1.0)
+    assert documents[1].similarity == pytest.approx(0.9 / np.hypot(0.9, 0.1))
+    assert documents[0].distance == pytest.approx(1.0)
+
+
+def test_hybrid_query_skips_ids_missing_from_collection(collection):
+    index = BM25Index.build(["gone"], ["พาราเซตามอล"])
+
+    documents = hybrid_query(
+        collection,
+        index,
+        "พาราเซตามอล",
+        [1.0, 0.0],
+        QueryOptions(top_k=3, candidates=3),
+    )
+
+    assert [doc.id for doc in documents] == ["near", "mid", "drug"]
+
+
+@pytest.fixture
+def disease_collection(tmp_path):
+    collection = chromadb.PersistentClient(path=str(tmp_path)).create_collection(
+        "forum_data"
+    )
+    # The "rash" post is nearest to the query in raw distance, but it is
+    # about another disease than the query's nearest centroid
+    collection.add(
+        ids=["h1", "h2", "rash"],
+        documents=["ปวดหัว 1", "ปวดหัว 2", "ผื่น"],
+        embeddings=[[1.0, 0.2], [1.0, 0.4], [0.75, 0.7]],
+        metadatas=[
+            {"disease_key": "headache", "tags": ["ปวดหัว"]},
+            {"disease_key": "headache", "tags": ["ปวดหัว", "ไมเกรน"]},
+            {"disease_key": "rash", "tags": ["ผื่น"]},
+        ],
+    )
+    return collection
+
+
+@pytest.fixture
+def centroids():
+    return DiseaseCentroids.build(
+        ["headache", "rash"], np.array([[1.0, 0.0], [0.0, 1.0]], np.float32)
+    )
+
+
+def test_query_collection_prefilters_by_predicted_disease(
+    disease_collection, centroids
+):
+    query = [1.0, 0.6]
+    unfiltered = query_collection(disease_collection, query, top_k=2)
+    filtered = query_collection(
+        disease_collection, query, top_k=2, prefilter=Prefilter(centroids, max_keys=1)
+    )
+
+    assert "rash" in [doc.id for doc in unfiltered]
+    assert [doc.id for doc in filtered] == ["h2", "h1"]
+    assert disease_collection.get(where={"tags": {"$contains": "ไมเกรน"}})["ids"] == [
+        "h2"
+    ]
+
+
+@pytest.mark.parametrize(
+    "top_k, min_similarity",
+    [(3, 0.5), (2, 0.999)],  # too few filtered hits, or none similar enough
+)
+def test_query_collection_falls_back_to_unfiltered(
+    disease_collection, centroids, top_k, min_similarity
+):
+    prefilter = Prefilter(centroids, max_keys=1, min_similarity=min_similarity)
+
+    documents = query_collection(disease_collection, [1.0, 0.6], top_k, prefilter)
+
+    assert "rash" in [doc.id for doc in documents]
+
+
+def test_search_reranks_a_wider_candidate_pool():
+    registry = ResourceRegistry()
+    resources = MagicMock()
+    resources.embed_model, resources.persist_path = "model-a", "/tmp/chroma"
+    resources.collection_name = "forum_data"
+    resources.model.encode.return_value = [[0.1, 0.2]]
+    resources.collection.query.return_value = {
+        "ids": [[f"id-{i}" for i in range(30)]],
+        "documents": [[f"doc {i}" for i in range(30)]],
+    }
+    registry._resources = resources
+    reranker = MagicMock()
+    reranker.rerank.side_effect = lambda query, docs, top_k: docs[::-1][:top_k]
+
+    with patch(
+        "llm_chatbot_backend.chatbot.retrieval.get_registry", return_value=registry
+    ):
+        result = search(
+            "ปวดหัว",
+            RetrievalOptions("model-a", "/tmp/chroma", top_k=3, reranker=reranker),
+        )
+
+    assert resources.collection.query.call_args.kwargs["n_results"] == 30
+    assert result.doc_ids == ("id-29", "id-28", "id-27")
+    assert isinstance(reranker.rerank.call_args.args[1][0], RetrievedDocument)
@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+
+from llm_chatbot_backend.chatbot.single_flight import SingleFlight
+
+
+class SlowBackend:
+    def __init__(self, delay: float = 0.05, error: Exception | None = None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return f"result {self.calls}"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_computation():
+    flights = SingleFlight()
+    backend = SlowBackend()
+
+    results = await asyncio.gather(*(flights.run("ปวดหัว", backend) for _ in range(20)))
+
+    assert backend.calls == 1
+    assert results == ["result 1"] * 20
+    assert flights.stats.flights == 1 and flights.stats.shared == 19
+    assert len(flights) == 0
+
+
+@pytest.mark.asyncio
+async def test_different_keys_and_later_calls_run_separately():
+    flights = SingleFlight()
+    backend = SlowBackend()
+
+    await asyncio.gather(flights.run("a", backend), flights.run("b", backend))
+    await flights.run("a", backend)
+
+    assert backend.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_error_reaches_every_waiter_and_is_not_reused():
+    flights = SingleFlight()
+    backend = SlowBackend(error=RuntimeError("chroma down"))
+
+    results = await asyncio.gather(
+        *(flights.run("key", backend) for _ in range(5)), return_exceptions=True
+    )
+
+    assert backend.calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flights.stats.errors == 1
+    backend.error = None
+    assert await flights.run("key", backend) == "result 2"
+
+
+@pytest.mark.asyncio
+async def test_timed_out_caller_leaves_flight_running():
+    flights = SingleFlight(timeout=0.01)
+    backend = SlowBackend(delay=0.1)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await flights.run("key", backend)
+    flights.timeout = None
+    result = await flights.run("key", backend)
+
+    assert result == "result 1" and backend.calls == 1
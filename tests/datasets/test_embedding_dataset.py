@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from llm_chatbot_backend.datasets.embedding_dataset import (
+    EmbeddedCorpus,
+    EmbeddingDataset,
+)
+
+
+@pytest.fixture
+def records() -> list[dict]:
+    return [
+        {
+            "id": f"doc{i}",
+            "embedding": [float(i), 0.5, -1.0],
+            "context": f"[คำถามจากผู้ใช้] คำถาม {i}",
+            "metadata": {"disease_key": "key", "content_hash": f"h{i}"},
+        }
+        for i in range(5)
+    ]
+
+
+def test_round_trip_memory_maps_embeddings(records, tmp_path):
+    dataset = EmbeddingDataset(str(tmp_path / "embedded"))
+    dataset.save(records)
+
+    corpus = dataset.load()
+
+    assert isinstance(corpus.embeddings, np.memmap)
+    assert corpus.embeddings.dtype == np.float32
+    assert corpus.embeddings.shape == (5, 3)
+    assert corpus[3]["id"] == "doc3"
+    assert corpus[3]["context"] == records[3]["context"]
+    assert corpus[3]["metadata"] == records[3]["metadata"]
+    assert corpus[3]["embedding"].tolist() == [3.0, 0.5, -1.0]
+    # Rows are views into the mapped matrix, not copies
+    assert corpus[3]["embedding"].base is not None
+
+
+def test_missing_metadata_keys_are_left_out(records, tmp_path):
+    del records[1]["metadata"]["disease_key"]
+    dataset = EmbeddingDataset(str(tmp_path / "embedded"))
+    dataset.save(records)
+
+    assert dataset.load()[1]["metadata"] == {"content_hash": "h1"}
+
+
+def test_batches_cover_every_row_in_order(records):
+    corpus = EmbeddedCorpus.from_records(records)
+
+    batches = list(corpus.batches(2))
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+    assert [row["id"] for batch in batches for row in batch] == [
+        f"doc{i}" for i in range(5)
+    ]
+
+
+def test_empty_corpus_round_trips(tmp_path):
+    dataset = EmbeddingDataset(str(tmp_path / "embedded"))
+    dataset.save([])
+
+    assert len(dataset.load()) == 0
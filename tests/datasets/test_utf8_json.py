@@ -0,0 +1,83 @@
+import types
+from unittest.mock import patch
+
+import pytest
+
+from llm_chatbot_backend.datasets.utf8_json import ReplaceRecords, Utf8JSONLines
+
+
+@pytest.fixture
+def records() -> list[dict]:
+    return [
+        {"id": str(i), "forum_text": f"ปวดหัว {i}", "tags": ["ไมเกรน"]} for i in range(3)
+    ]
+
+
+@pytest.mark.parametrize(
+    "filename", ["forum.jsonl", "forum.jsonl.gz", "forum.jsonl.bz2"]
+)
+def test_round_trip(records, tmp_path, filename):
+    dataset = Utf8JSONLines(str(tmp_path / filename))
+    dataset.save(records)
+
+    assert dataset.load() == records
+
+
+def test_compression_is_inferred_from_extension(records, tmp_path):
+    Utf8JSONLines(str(tmp_path / "forum.jsonl.gz")).save(records)
+
+    assert (tmp_path / "forum.jsonl.gz").read_bytes()[:2] == b"\x1f\x8b"
+
+
+def test_lazy_load_parses_one_record_at_a_time(records, tmp_path):
+    Utf8JSONLines(str(tmp_path / "forum.jsonl")).save(records)
+
+    loaded = Utf8JSONLines(str(tmp_path / "forum.jsonl"), lazy=True).load()
+
+    assert isinstance(loaded, types.GeneratorType)
+    assert next(loaded) == records[0]
+    assert list(loaded) == records[1:]
+
+
+@pytest.mark.parametrize("filename", ["forum.jsonl", "forum.jsonl.gz"])
+def test_append_adds_to_existing_records(records, tmp_path, filename):
+    dataset = Utf8JSONLines(str(tmp_path / filename), append=True)
+    dataset.save(records[:2])
+    dataset.save(records[2:])
+
+    assert dataset.load() == records
+
+
+def test_replace_records_rewrite_an_appending_file(records, tmp_path):
+    dataset = Utf8JSONLines(str(tmp_path / "forum.jsonl.gz"), append=True)
+    dataset.save(records)
+    dataset.save(ReplaceRecords(records[:1]))
+
+    assert dataset.load() == records[:1]
+
+
+def test_append_is_rejected_for_zstd(tmp_path):
+    pytest.importorskip("zstandard")
+    with pytest.raises(ValueError, match="zstd"):
+        Utf8JSONLines(str(tmp_path / "forum.jsonl.zst"), append=True)
+
+
+def test_save_accepts_a_generator(records, tmp_path):
+    dataset = Utf8JSONLines(str(tmp_path / "forum.jsonl"))
+    dataset.save(record for record in records)
+
+    assert dataset.load() == records
+
+
+def test_falls_back_to_json_without_orjson(records, tmp_path):
+    dataset = Utf8JSONLines(str(tmp_path / "forum.jsonl"))
+    with patch("llm_chatbot_backend.datasets.utf8_json.orjson", None):
+        dataset.save(records)
+        assert dataset.load() == records
+    # Thai text is written as UTF-8, not \u escapes
+    assert "ปวดหัว" in (tmp_path / "forum.jsonl").read_text(encoding="utf-8")
+
+
+def test_unavailable_compression_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="not available"):
+        Utf8JSONLines(str(tmp_path / "forum.jsonl"), compression="brotli-xyz")
@@ -0,0 +1,75 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+
+from llm_chatbot_backend.pipelines.data_processing.embedding_engine import (
+    EmbeddingEngine,
+)
+
+
+class FakeModel:
+    """Tokens are words; each embedding is (word count, text id)."""
+
+    max_seq_length = 128
+
+    def __init__(self):
+        self.calls = []
+        self.start_multi_process_pool = MagicMock(return_value="pool")
+        self.stop_multi_process_pool = MagicMock()
+
+    def tokenizer(self, texts, **kwargs):
+        return {"input_ids": [text.split() for text in texts]}
+
+    def encode(self, texts, batch_size, **kwargs):
+        self.calls.append((len(texts), batch_size, kwargs.get("pool")))
+        return np.array(
+            [[len(text.split()), float(text.split()[-1])] for text in texts]
+        )
+
+
+@pytest.fixture
+def texts() -> list[str]:
+    lengths = [3, 40, 1, 200, 20, 70, 2]
+    return [" ".join(["คำ"] * (n - 1) + [str(i)]) for i, n in enumerate(lengths)]
+
+
+def test_buckets_by_token_length_and_keeps_input_order(texts):
+    model = FakeModel()
+    engine = EmbeddingEngine(model, bucket_batch_sizes={32: 128, 64: 64, 128: 32})
+
+    embeddings = engine.encode(texts)
+
+    assert embeddings[:, 1].tolist() == list(range(len(texts)))
+    # (texts in bucket, batch size): <=32 tokens, <=64, and the rest
+    assert model.calls == [(4, 128, None), (1, 64, None), (2, 32, None)]
+    assert engine.last_report.bucket_sizes == {32: 4, 64: 1, 128: 2}
+    assert engine.last_report.documents == len(texts)
+    assert engine.last_report.docs_per_second > 0
+
+
+def test_without_buckets_encodes_in_one_call(texts):
+    model = FakeModel()
+
+    embeddings = EmbeddingEngine(model, batch_size=16).encode(texts)
+
+    assert model.calls == [(len(texts), 16, None)]
+    assert embeddings[:, 1].tolist() == list(range(len(texts)))
+
+
+def test_workers_share_one_process_pool(texts):
+    model = FakeModel()
+    engine = EmbeddingEngine(model, bucket_batch_sizes={32: 128, 128: 32}, workers=3)
+
+    engine.encode(texts)
+
+    model.start_multi_process_pool.assert_called_once_with(["cpu"] * 3)
+    model.stop_multi_process_pool.assert_called_once_with("pool")
+    assert all(pool == "pool" for _, _, pool in model.calls)
+
+
+def test_empty_input():
+    model = FakeModel()
+
+    assert EmbeddingEngine(model, workers=2).encode([]).shape == (0, 0)
+    model.start_multi_process_pool.assert_not_called()
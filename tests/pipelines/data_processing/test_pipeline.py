@@ -1,13 +1,32 @@
+import re
+import threading
+import time
 from unittest import mock
 from unittest.mock import AsyncMock, MagicMock, patch
 
+import chromadb
+import numpy as np
 import pytest
+from pythainlp.util import normalize
+from llm_chatbot_backend.disease_index import DiseaseCentroids
+from llm_chatbot_backend.lexical_index import BM25Index
 from llm_chatbot_backend.pipelines.data_processing.nodes import (
+    MEMO_MAX_LENGTH,
+    _clean_short,
+    build_disease_centroids,
+    build_lexical_index,
     build_rag_context,
     clean_text,
     embed_forum_data,
+    embedded_record,
     process_text,
+    read_stored_hashes,
     store_to_chroma,
+    stored_hashes,
+)
+from llm_chatbot_backend.vector_store import (
+    active_collection_name,
+    read_collection_version,
 )
 
 
@@ -41,6 +60,72 @@ def test_process_text_cleaning():
     assert result[0]["disease_text"] == "โรค"
 
 
+def reference_clean_text(text):
+    """clean_text as it was before the patterns were precompiled and memoized."""
+    if not isinstance(text, str):
+        return ""
+    text = normalize(text)
+    text = re.sub(r"https?://\S+", "", text)
+    text = re.sub(r"[^\u0E00-\u0E7F\w\s.,!?']", "", text)
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"([ก-๙])\1{1,}", r"\1\1", text)
+    return text.strip()
+
+
+def test_clean_text_memoizes_short_fields():
+    _clean_short.cache_clear()
+
+    assert clean_text("ควรพบแพทย์ค่ะ") == clean_text("ควรพบแพทย์ค่ะ")
+    assert _clean_short.cache_info().hits == 1
+
+    long_text = "ก" * (MEMO_MAX_LENGTH + 1)
+    clean_text(long_text)
+    clean_text(long_text)
+    assert _clean_short.cache_info().currsize == 1
+
+
+@pytest.fixture
+def raw_records() -> list[dict]:
+    samples = [
+        "ปวดหัวมากกกก ค่ะ\n\nช่วยด้วย🥲 https://example.com/x?y=1",
+        "  กินยาแล้ว\tไม่หาย!!  ",
+        "ควรพบแพทย์ค่ะ",  # templated reply, repeats across posts
+        "เป็นไข้ 38.5 องศา, ไอ... (3 วัน) #covid",
+        "ุุุ่่่ สระซ้อน เเละ ํา",
+        "",
+    ]
+    return [
+        {
+            "id": str(i),
+            "forum_text": samples[i % len(samples)] + f" {i}",
+            "doctor_reply": samples[(i + 2) % len(samples)],
+            "disease_text": samples[(i + 3) % len(samples)],
+            "tags": ["x"],
+        }
+        for i in range(60)
+    ]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_process_text_matches_reference_cleaning(raw_records, workers):
+    expected = []
+    for item in raw_records:
+        reply = reference_clean_text(item["doctor_reply"])
+        if reply:
+            expected.append(
+                {
+                    **item,
+                    "forum_text": reference_clean_text(item["forum_text"]),
+                    "doctor_reply": reply,
+                    "disease_text": reference_clean_text(item["disease_text"]),
+                }
+            )
+
+    result = process_text(iter(raw_records), workers=workers, chunk_size=7)
+
+    assert result == expected
+
+
 def test_process_text_skip_empty_reply():
     data = [{"forum_text": "x", "doctor_reply": "", "disease_text": "y"}]
     result = process_text(data)
@@ -61,10 +146,10 @@ def test_build_rag_context():
     assert "tag1" in context
 
 
-@patch("llm_chatbot_backend.pipelines.data_processing.nodes.SentenceTransformer")
+@patch("llm_chatbot_backend.pipelines.data_processing.nodes.load_embedding_model")
 def test_embed_forum_data(mock_model_class):
     mock_model = MagicMock()
-    mock_model.encode.return_value.tolist.return_value = [[0.1, 0.2, 0.3]]
+    mock_model.encode.return_value = np.array([[0.1, 0.2, 0.3]])
     mock_model_class.return_value = mock_model
 
     data = [
@@ -80,14 +165,16 @@ def test_embed_forum_data(mock_model_class):
     result = embed_forum_data(data)
     assert result[0]["id"] == "doc1"
     assert result[0]["context"]
-    assert result[0]["embedding"] == [0.1, 0.2, 0.3]
+    np.testing.assert_allclose(result[0]["embedding"], [0.1, 0.2, 0.3], rtol=1e-6)
 
 
 @patch("llm_chatbot_backend.pipelines.data_processing.nodes.chromadb.PersistentClient")
 def test_store_to_chroma(mock_client_class):
     mock_collection = MagicMock()
+    mock_collection.get.return_value = {"ids": [], "metadatas": []}
     mock_client = MagicMock()
     mock_client.get_or_create_collection.return_value = mock_collection
+    mock_client.get_max_batch_size.return_value = 100
     mock_client_class.return_value = mock_client
 
     data = [
@@ -101,3 +188,304 @@ def test_store_to_chroma(mock_client_class):
     result = store_to_chroma(data, "/tmp/chroma")
     assert "Stored 1 documents" in result
     mock_collection.upsert.assert_called_once()
+
+
+@patch("llm_chatbot_backend.pipelines.data_processing.nodes.chromadb.PersistentClient")
+def test_store_to_chroma_bumps_collection_version(mock_client_class, tmp_path):
+    mock_client_class.return_value.get_max_batch_size.return_value = 100
+    data = [
+        {
+            "id": "doc1",
+            "context": "some context",
+            "embedding": [0.1, 0.2],
+            "metadata": {"disease_key": "key", "tags": "a,b"},
+        }
+    ]
+    store_to_chroma(data, str(tmp_path))
+    first = read_collection_version(str(tmp_path))
+    store_to_chroma(data, str(tmp_path))
+
+    assert first is not None
+    assert read_collection_version(str(tmp_path)) != first
+
+
+@pytest.fixture
+def cleaned_records() -> list[dict]:
+    return [
+        {
+            "forum_text": f"question {i}",
+            "doctor_reply": f"reply {i}",
+            "disease_key": "key",
+            "disease_text": "text",
+            "tags": ["tag"],
+            "id": f"doc{i}",
+        }
+        for i in range(3)
+    ]
+
+
+@patch("llm_chatbot_backend.pipelines.data_processing.nodes.load_embedding_model")
+def test_embed_forum_data_reuses_unchanged_documents(
+    mock_model_class, cleaned_records, tmp_path, caplog
+):
+    mock_model = MagicMock()
+    mock_model.encode.side_effect = lambda texts, **kwargs: np.ones((len(texts), 2))
+    mock_model_class.return_value = mock_model
+    store_path = str(tmp_path / "store.sqlite")
+
+    first = embed_forum_data(cleaned_records, "model-a", store_path)
+    cleaned_records[1]["doctor_reply"] = "edited reply"
+    with caplog.at_level("INFO"):
+        second = embed_forum_data(cleaned_records[:2], "model-a", store_path)
+
+    assert len(mock_model.encode.call_args_list[0].args[0]) == 3
+    assert len(mock_model.encode.call_args_list[1].args[0]) == 1
+    assert "1 reused, 1 encoded, 2 deleted" in caplog.text
+    assert second[0]["metadata"]["content_hash"] == first[0]["metadata"]["content_hash"]
+    assert second[1]["metadata"]["content_hash"] != first[1]["metadata"]["content_hash"]
+
+
+@patch("llm_chatbot_backend.pipelines.data_processing.nodes.load_embedding_model")
+def test_embed_forum_data_skips_model_when_nothing_changed(
+    mock_model_class, cleaned_records, tmp_path
+):
+    mock_model_class.return_value.encode.side_effect = lambda texts, **kwargs: np.ones(
+        (len(texts), 2)
+    )
+    store_path = str(tmp_path / "store.sqlite")
+
+    embed_forum_data(cleaned_records, "model-a", store_path)
+    result = embed_forum_data(cleaned_records, "model-a", store_path)
+
+    assert mock_model_class.call_count == 1
+    assert result[2]["embedding"].tolist() == [1.0, 1.0]
+
+
+@patch("llm_chatbot_backend.pipelines.data_processing.nodes.load_embedding_model")
+def test_embed_forum_data_stable_ids(mock_model_class, cleaned_records):
+    mock_model_class.return_value.encode.side_effect = lambda texts, **kwargs: np.ones(
+        (len(texts), 2)
+    )
+    for record in cleaned_records:
+        record["id"] = ""
+    cleaned_records.append(dict(cleaned_records[0]))  # same post on two pages
+
+    first = embed_forum_data(cleaned_records)
+    second = embed_forum_data(cleaned_records)
+
+    assert [item["id"] for item in first] == [item["id"] for item in second]
+    assert len(first) == 3
+    assert first[0]["id"] == f"doc_{first[0]['metadata']['content_hash']}"
+
+
+@patch("llm_chatbot_backend.pipelines.data_processing.nodes.chromadb.PersistentClient")
+def test_store_to_chroma_upserts_only_delta(mock_client_class, tmp_path):
+    mock_collection = MagicMock()
+    mock_collection.get.return_value = {
+        "ids": ["same", "changed", "gone"],
+        "metadatas": [
+            {"content_hash": "h1"},
+            {"content_hash": "old"},
+            {"content_hash": "h3"},
+        ],
+    }
+    mock_client_class.return_value.get_or_create_collection.return_value = (
+        mock_collection
+    )
+    mock_client_class.return_value.get_max_batch_size.return_value = 100
+    data = [
+        {
+            "id": doc_id,
+            "context": "ctx",
+            "embedding": [0.1],
+            "metadata": {"content_hash": digest},
+        }
+        for doc_id, digest in [("same", "h1"), ("changed", "h2"), ("new", "h4")]
+    ]
+
+    result = store_to_chroma(data, str(tmp_path))
+
+    assert mock_collection.upsert.call_args.kwargs["ids"] == ["changed", "new"]
+    mock_collection.delete.assert_called_once_with(ids=["gone"])
+    assert "2 upserted, 1 deleted" in result
+
+
+@patch("llm_chatbot_backend.pipelines.data_processing.nodes.chromadb.PersistentClient")
+def test_store_to_chroma_upserts_changed_rows_in_parallel_chunks(
+    mock_client_class, tmp_path
+):
+    lock = threading.Lock()
+    state = {"in_flight": 0, "peak": 0}
+
+    def slow_upsert(**kwargs):
+        with lock:
+            state["in_flight"] += 1
+            state["peak"] = max(state["peak"], state["in_flight"])
+        time.sleep(0.02)
+        with lock:
+            state["in_flight"] -= 1
+
+    mock_collection = MagicMock()
+    mock_collection.upsert.side_effect = slow_upsert
+    mock_collection.get.return_value = {
+        "ids": ["doc0", "doc1"],
+        "metadatas": [{"content_hash": "h0"}, {"content_hash": "h1"}],
+    }
+    mock_client_class.return_value.get_or_create_collection.return_value = (
+        mock_collection
+    )
+    mock_client_class.return_value.get_max_batch_size.return_value = 3
+    data = [
+        {
+            "id": f"doc{i}",
+            "context": "ctx",
+            "embedding": [0.1],
+            "metadata": {"content_hash": f"h{i}"},
+        }
+        for i in range(12)
+    ]
+
+    result = store_to_chroma(data, str(tmp_path), upsert_workers=2)
+
+    chunks = [call.kwargs["ids"] for call in mock_collection.upsert.call_args_list]
+    assert sorted(len(chunk) for chunk in chunks) == [1, 3, 3, 3]
+    assert sorted(i for chunk in chunks for i in chunk) == sorted(
+        f"doc{i}" for i in range(2, 12)
+    )
+    assert state["peak"] == 2
+    assert "10 upserted, 0 deleted" in result
+
+
+def embedded_rows(count: int, reply: str = "reply") -> list[dict]:
+    return [
+        {
+            "id": f"doc{i}",
+            "context": f"{reply} {i}",
+            "embedding": [float(i), 1.0],
+            "metadata": {"content_hash": f"{reply}{i}"},
+        }
+        for i in range(count)
+    ]
+
+
+def test_store_to_chroma_blue_green_swaps_to_new_collection(tmp_path):
+    persist_path = str(tmp_path)
+
+    store_to_chroma(embedded_rows(6), persist_path, mode="blue_green")
+    first = active_collection_name(persist_path)
+    # Nothing changed, so the live collection is kept
+    result = store_to_chroma(embedded_rows(6), persist_path, mode="blue_green")
+    assert "unchanged" in result
+    assert active_collection_name(persist_path) == first
+
+    for reply in ["second", "third"]:
+        store_to_chroma(
+            embedded_rows(5, reply), persist_path, mode="blue_green", keep_versions=2
+        )
+
+    client = chromadb.PersistentClient(path=persist_path)
+    active = active_collection_name(persist_path)
+    assert active.startswith("forum_data_") and active != first
+    assert client.get_collection(name=active).count() == 5
+    # The oldest version is garbage collected, the previous one kept
+    names = [collection.name for collection in client.list_collections()]
+    assert first not in names and len(names) == 2
+
+
+def test_store_to_chroma_in_place_updates_the_active_collection(tmp_path):
+    persist_path = str(tmp_path)
+    store_to_chroma(embedded_rows(3), persist_path, mode="blue_green")
+    active = active_collection_name(persist_path)
+
+    store_to_chroma(embedded_rows(4), persist_path)
+
+    client = chromadb.PersistentClient(path=persist_path)
+    assert active_collection_name(persist_path) == active
+    assert client.get_collection(name=active).count() == 4
+    assert [collection.name for collection in client.list_collections()] == [active]
+
+
+def test_read_stored_hashes_pages_through_the_collection(tmp_path):
+    collection = chromadb.PersistentClient(path=str(tmp_path)).create_collection(
+        "forum_data"
+    )
+    rows = embedded_rows(5)
+    collection.add(
+        ids=[row["id"] for row in rows],
+        embeddings=[row["embedding"] for row in rows],
+        metadatas=[row["metadata"] for row in rows],
+    )
+
+    with patch.object(collection, "get", wraps=collection.get) as get:
+        hashes = read_stored_hashes(collection, batch_size=2)
+
+    assert hashes == {row["id"]: row["metadata"]["content_hash"] for row in rows}
+    assert [call.kwargs["offset"] for call in get.call_args_list] == [0, 2, 4]
+
+
+def test_store_to_chroma_blue_green_keeps_pointer_on_failed_validation(tmp_path):
+    persist_path = str(tmp_path)
+    store_to_chroma(embedded_rows(3), persist_path, mode="blue_green")
+    before = read_collection_version(persist_path), active_collection_name(persist_path)
+
+    with (
+        patch(
+            "llm_chatbot_backend.pipelines.data_processing.nodes.validate_collection",
+            side_effect=RuntimeError("bad build"),
+        ),
+        pytest.raises(RuntimeError, match="bad build"),
+    ):
+        store_to_chroma(embedded_rows(3, "new"), persist_path, mode="blue_green")
+
+    client = chromadb.PersistentClient(path=persist_path)
+    assert (
+        read_collection_version(persist_path),
+        active_collection_name(persist_path),
+    ) == before
+    assert [collection.name for collection in client.list_collections()] == [before[1]]
+
+
+def test_build_lexical_index(tmp_path):
+    index_path = str(tmp_path / "lexical_index.json")
+    data = [
+        {"id": "a", "context": "ปวดหัว กินยาพาราเซตามอล"},
+        {"id": "b", "context": "ท้องเสีย"},
+    ]
+
+    result = build_lexical_index(data, index_path)
+
+    assert "Indexed 2 documents" in result
+    assert BM25Index.load(index_path).search("พาราเซตามอล")[0][0] == "a"
+
+
+def test_embedded_record_stores_tags_as_a_list():
+    item = {"disease_key": "key", "tags": ["ปวดหัว", "ไมเกรน"]}
+    record = embedded_record(item, "doc1", "ctx", "h1", [0.1])
+    assert record["metadata"]["tags"] == ["ปวดหัว", "ไมเกรน"]
+
+    untagged = embedded_record({**item, "tags": []}, "doc2", "ctx", "h2", [0.1])
+    assert "tags" not in untagged["metadata"]
+
+
+def test_stored_hashes_rewrites_rows_with_joined_tags():
+    existing = {
+        "ids": ["old", "new"],
+        "metadatas": [
+            {"content_hash": "h1", "tags": "ปวดหัว, ไมเกรน"},
+            {"content_hash": "h2", "tags": ["ปวดหัว"]},
+        ],
+    }
+    assert stored_hashes(existing) == {"old": None, "new": "h2"}
+
+
+def test_build_disease_centroids(tmp_path):
+    centroids_path = str(tmp_path / "disease_centroids.npz")
+    data = [
+        {"id": "a", "embedding": [1.0, 0.0], "metadata": {"disease_key": "x"}},
+        {"id": "b", "embedding": [0.0, 1.0], "metadata": {"disease_key": "y"}},
+    ]
+
+    result = build_disease_centroids(data, centroids_path)
+
+    assert "2 disease centroids" in result
+    assert DiseaseCentroids.load(centroids_path).predict([0.2, 1.0], 1)[0][0] == "y"
@@ -0,0 +1,260 @@
+import asyncio
+import time
+
+import chromadb
+import httpx
+import numpy as np
+import pytest
+
+from llm_chatbot_backend.disease_index import DiseaseCentroids
+from llm_chatbot_backend.lexical_index import BM25Index
+from llm_chatbot_backend.pipelines.streaming_ingest.nodes import stream_ingest
+from llm_chatbot_backend.pipelines.web_scraping.nodes import PageStream
+from llm_chatbot_backend.vector_store import (
+    CHROMA_COLLECTION,
+    active_collection_name,
+)
+
+SCRAPE_PARAMS = {"base_url": "http://fake.url?page={page}", "concurrent_limit": 2}
+
+
+def ingest_params(persist_path: str, batch_size: int = 64, **overrides) -> dict:
+    return {
+        "web_scraping": SCRAPE_PARAMS,
+        "streaming_ingest": {"batch_size": batch_size},
+        "embedding_model": "fake-model",
+        "chroma_persist_path": persist_path,
+        **overrides,
+    }
+
+
+def make_post(i: int, reply: str = "ดื่มน้ำมากๆ") -> dict:
+    return {
+        "id": str(i),
+        "forum_text": f"ปวดหัว {i}",
+        "doctor_reply": reply,
+        "disease_key": "headache",
+        "disease_text": "ปวดหัว",
+        "tags": ["ปวดหัว"],
+    }
+
+
+class FakeModel:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.encoded = 0
+        self.windows = []
+
+    def encode(self, texts, **kwargs):
+        start = time.monotonic()
+        time.sleep(self.delay)
+        self.windows.append((start, time.monotonic()))
+        self.encoded += len(texts)
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+@pytest.fixture
+def fake_forum(monkeypatch):
+    forum = {
+        "pages": {
+            page: [make_post(page * 10 + i) for i in range(3)]
+            + [make_post(page * 10 + 9, reply="")]  # dropped by cleaning
+            for page in range(1, 6)
+        },
+        "fetched_at": [],
+        "fail": set(),
+        "delay": 0.0,
+    }
+
+    async def mock_get_total_pages(client, base_url):
+        return len(forum["pages"])
+
+    async def mock_fetch_forum_page(*, client, page, sem, base_url):
+        await asyncio.sleep(forum["delay"])
+        forum["fetched_at"].append(time.monotonic())
+        if page in forum["fail"]:
+            raise httpx.ConnectError("boom")
+        return forum["pages"][page]
+
+    monkeypatch.setattr(
+        "llm_chatbot_backend.pipelines.streaming_ingest.nodes.get_total_pages",
+        mock_get_total_pages,
+    )
+    monkeypatch.setattr(
+        "llm_chatbot_backend.pipelines.web_scraping.nodes.fetch_forum_page",
+        mock_fetch_forum_page,
+    )
+    return forum
+
+
+@pytest.fixture
+def fake_model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(
+        "llm_chatbot_backend.pipelines.streaming_ingest.nodes.load_embedding_model",
+        lambda name: model,
+    )
+    return model
+
+
+@pytest.mark.asyncio
+async def test_stream_ingest_stores_every_cleaned_post(
+    fake_forum, fake_model, tmp_path
+):
+    persist_path = str(tmp_path / "chroma")
+    store_path = str(tmp_path / "store.sqlite")
+
+    stats = await stream_ingest(
+        ingest_params(persist_path, 4, embedding_store_path=store_path)
+    )
+
+    collection = chromadb.PersistentClient(path=persist_path).get_collection(
+        CHROMA_COLLECTION
+    )
+    assert stats.documents == stats.upserted == collection.count() == 15
+    assert "19" not in collection.get(include=[])["ids"]
+
+    # A second run reuses stored embeddings and rewrites nothing
+    again = await stream_ingest(
+        ingest_params(persist_path, 4, embedding_store_path=store_path)
+    )
+    assert fake_model.encoded == 15
+    assert (again.encoded, again.upserted, again.deleted) == (0, 0, 0)
+
+
+@pytest.mark.asyncio
+async def test_stream_ingest_deletes_only_after_a_complete_crawl(
+    fake_forum, fake_model, tmp_path
+):
+    persist_path = str(tmp_path / "chroma")
+    await stream_ingest(ingest_params(persist_path))
+
+    del fake_forum["pages"][5][0]
+    fake_forum["fail"] = {4}
+    partial = await stream_ingest(ingest_params(persist_path))
+    assert partial.deleted == 0
+
+    fake_forum["fail"] = set()
+    complete = await stream_ingest(ingest_params(persist_path))
+    assert complete.deleted == 1
+
+
+@pytest.mark.asyncio
+async def test_blue_green_stream_switches_to_a_validated_version(
+    fake_forum, fake_model, tmp_path
+):
+    persist_path = str(tmp_path / "chroma")
+    client = chromadb.PersistentClient(path=persist_path)
+
+    await stream_ingest(ingest_params(persist_path, chroma_write_mode="blue_green"))
+    first = active_collection_name(persist_path)
+    assert first != CHROMA_COLLECTION
+    assert client.get_collection(first).count() == 15
+
+    # Nothing changed: the new version is dropped and readers stay put
+    unchanged = await stream_ingest(
+        ingest_params(persist_path, chroma_write_mode="blue_green")
+    )
+    assert (unchanged.upserted, unchanged.deleted) == (0, 0)
+    assert active_collection_name(persist_path) == first
+    assert len(client.list_collections()) == 1
+
+    # Posts of a failed page are carried over, unchanged posts not re-encoded
+    fake_forum["pages"][1][0]["doctor_reply"] = "พักผ่อนให้เพียงพอ"
+    fake_forum["fail"] = {4}
+    encoded = fake_model.encoded
+    partial = await stream_ingest(
+        ingest_params(persist_path, chroma_write_mode="blue_green")
+    )
+    second = active_collection_name(persist_path)
+    assert second != first
+    assert (partial.upserted, partial.kept) == (1, 3)
+    assert fake_model.encoded - encoded == 1
+    assert client.get_collection(second).count() == 15
+    # The previous version stays for readers still querying it
+    assert client.get_collection(first).count() == 15
+
+
+@pytest.mark.asyncio
+async def test_blue_green_stream_keeps_readers_on_failed_validation(
+    fake_forum, fake_model, tmp_path, monkeypatch
+):
+    persist_path = str(tmp_path / "chroma")
+    await stream_ingest(ingest_params(persist_path, chroma_write_mode="blue_green"))
+    first = active_collection_name(persist_path)
+
+    def broken(collection, expected_count, samples):
+        raise RuntimeError("bad collection")
+
+    monkeypatch.setattr(
+        "llm_chatbot_backend.pipelines.streaming_ingest.nodes.validate_collection",
+        broken,
+    )
+    del fake_forum["pages"][5][0]
+    with pytest.raises(RuntimeError, match="bad collection"):
+        await stream_ingest(ingest_params(persist_path, chroma_write_mode="blue_green"))
+
+    assert active_collection_name(persist_path) == first
+    client = chromadb.PersistentClient(path=persist_path)
+    assert [c.name for c in client.list_collections()] == [first]
+
+
+@pytest.mark.asyncio
+async def test_stream_ingest_rebuilds_indexes(fake_forum, fake_model, tmp_path):
+    persist_path = str(tmp_path / "chroma")
+    index_path = tmp_path / "lexical_index.json"
+    centroids_path = tmp_path / "disease_centroids.npz"
+    params = ingest_params(
+        persist_path,
+        4,
+        lexical_index_path=str(index_path),
+        disease_centroids_path=str(centroids_path),
+    )
+
+    await stream_ingest(params)
+    assert len(BM25Index.load(str(index_path))) == 15
+    assert DiseaseCentroids.load(str(centroids_path)).counts.tolist() == [15]
+
+    del fake_forum["pages"][5][0]
+    await stream_ingest(params)
+    assert len(BM25Index.load(str(index_path))) == 14
+    assert DiseaseCentroids.load(str(centroids_path)).counts.tolist() == [14]
+
+
+@pytest.mark.asyncio
+async def test_embedding_overlaps_page_fetches(fake_forum, fake_model, tmp_path):
+    fake_forum["pages"] = {
+        page: [make_post(page * 10 + i) for i in range(2)] for page in range(1, 21)
+    }
+    fake_forum["delay"] = 0.01
+    fake_model.delay = 0.05
+
+    await stream_ingest(ingest_params(str(tmp_path / "chroma"), 4))
+
+    assert any(
+        start < fetched < end
+        for start, end in fake_model.windows
+        for fetched in fake_forum["fetched_at"]
+    )
+
+
+@pytest.mark.asyncio
+async def test_page_stream_bounds_pages_held_in_memory(fake_forum):
+    fetched = fake_forum["fetched_at"]
+    yielded, most_held = 0, 0
+    fake_forum["pages"] = {page: [make_post(page)] for page in range(1, 41)}
+
+    async for _ in PageStream(
+        client=None,
+        sem=asyncio.Semaphore(),
+        base_url="",
+        pages=list(range(1, 41)),
+        max_buffered=2,
+    ):
+        yielded += 1
+        await asyncio.sleep(0.002)  # slow consumer
+        most_held = max(most_held, len(fetched) - yielded)
+
+    assert yielded == 40
+    # The queue plus one page per worker blocked on it, whatever the page count
+    assert most_held <= 4
@@ -2,16 +2,25 @@ import asyncio
 from unittest import mock
 from unittest.mock import AsyncMock, patch
 
+import chromadb
 import httpx
 import pytest
 from httpx import AsyncClient
+from llm_chatbot_backend.pipelines.data_processing.nodes import store_to_chroma
 from llm_chatbot_backend.pipelines.web_scraping.nodes import (
     extract_forum_info,
     fetch_forum_page,
+    fetch_pages,
     get_total_pages,
     run_scraping_pipeline,
     scrape_forum_page,
 )
+from llm_chatbot_backend.pipelines.web_scraping.state import ScrapeState
+from llm_chatbot_backend.pipelines.web_scraping.throttle import (
+    AdaptiveLimiter,
+    parse_retry_after,
+)
+from llm_chatbot_backend.vector_store import CHROMA_COLLECTION, content_hash
 
 
 @pytest.fixture
@@ -28,6 +37,7 @@ def mock_scrape_params() -> dict:
 def mock_forum_data():
     return {
         "forum": {
+            "id": 12345,
             "disease_key": "test disease key",
             "disease_text": "test disease text",
             "content_text": "test content text",
@@ -44,6 +54,7 @@ def mock_forum_data():
 @pytest.fixture
 def expected_forum_result():
     return {
+        "id": "12345",
         "forum_text": "test content text",
         "doctor_reply": "test doctor comment",
         "disease_key": "test disease key",
@@ -91,6 +102,11 @@ def test_extract_forum_info(mock_forum_data, expected_forum_result) -> None:
     ), "Extracted forum data does not match expected result"
 
 
+def test_extract_forum_info_without_id(mock_forum_data) -> None:
+    del mock_forum_data["forum"]["id"]
+    assert extract_forum_info(mock_forum_data)["id"] == ""
+
+
 @pytest.mark.asyncio
 async def test_get_total_pages(monkeypatch):
     mock_response = {"pageProps": {"total": 12, "forums": [1, 2, 3]}}
@@ -231,3 +247,216 @@ def test_run_scraping_pipeline(monkeypatch, mock_forum_result):
     result = run_scraping_pipeline(params)
 
     assert result == mock_forum_result
+
+
+def make_pages(ids_per_page: list[list[int]]) -> dict[int, list[dict]]:
+    return {
+        page: [{"id": str(i), "forum_text": f"post {i}"} for i in ids]
+        for page, ids in enumerate(ids_per_page, start=1)
+    }
+
+
+@pytest.fixture
+def fake_forum(monkeypatch):
+    forum = {"pages": make_pages([[6, 5], [4, 3], [2, 1]]), "requested": []}
+
+    async def mock_get_total_pages(client, base_url):
+        return len(forum["pages"])
+
+    async def mock_fetch_forum_page(*, client, page, sem, base_url):
+        forum["requested"].append(page)
+        if page in forum.get("fail", set()):
+            raise httpx.ConnectError("boom")
+        return forum["pages"].get(page, [])
+
+    monkeypatch.setattr(
+        "llm_chatbot_backend.pipelines.web_scraping.nodes.get_total_pages",
+        mock_get_total_pages,
+    )
+    monkeypatch.setattr(
+        "llm_chatbot_backend.pipelines.web_scraping.nodes.fetch_forum_page",
+        mock_fetch_forum_page,
+    )
+    return forum
+
+
+@pytest.mark.asyncio
+async def test_incremental_scrape_stops_at_seen_posts(fake_forum, tmp_path):
+    params = {
+        "base_url": "http://fake.url?page={page}",
+        "mode": "incremental",
+        "state_dir": str(tmp_path),
+    }
+    first = await scrape_forum_page(params)  # no high-water mark yet: full crawl
+    assert [r["id"] for r in first] == ["6", "5", "4", "3", "2", "1"]
+
+    fake_forum["pages"] = make_pages([[9, 8], [7, 6], [5, 4], [3, 2], [1]])
+    fake_forum["requested"] = []
+    second = await scrape_forum_page(params)
+
+    assert fake_forum["requested"] == [1, 2]
+    # Only the new posts, which raw_forum_data appends to the first crawl
+    assert [r["id"] for r in second] == ["9", "8", "7"]
+    assert [r["id"] for r in ScrapeState(str(tmp_path)).load_records()] == [
+        "9",
+        "8",
+        "7",
+        "6",
+        "5",
+        "4",
+        "3",
+        "2",
+        "1",
+    ]
+    assert ScrapeState(str(tmp_path)).high_water_mark == "9"
+
+
+@pytest.mark.asyncio
+async def test_full_crawl_resumes_from_checkpoint(fake_forum, tmp_path):
+    # A previous crawl died after finishing pages 1 and 2
+    state = ScrapeState(str(tmp_path))
+    state.start_crawl(3)
+    state.checkpoint_page(1, fake_forum["pages"][1])
+    state.checkpoint_page(2, fake_forum["pages"][2])
+
+    params = {"base_url": "http://fake.url?page={page}", "state_dir": str(tmp_path)}
+    results = await scrape_forum_page(params)
+
+    assert fake_forum["requested"] == [3]
+    assert [r["id"] for r in results] == ["6", "5", "4", "3", "2", "1"]
+    assert ScrapeState(str(tmp_path)).crawl is None
+
+
+@pytest.mark.asyncio
+async def test_failed_page_keeps_other_pages(fake_forum, tmp_path, caplog):
+    params = {"base_url": "http://fake.url?page={page}", "state_dir": str(tmp_path)}
+    fake_forum["fail"] = {2}
+
+    with caplog.at_level("INFO"):
+        results = await scrape_forum_page(params)
+
+    assert [r["id"] for r in results] == ["6", "5", "2", "1"]
+    queue = ScrapeState(str(tmp_path)).retry_queue
+    assert [(entry["page"], entry["attempts"]) for entry in queue] == [(2, 1)]
+    assert "ConnectError" in queue[0]["error"]
+    assert "2 pages fetched, 1 failed, 0 retried" in caplog.text
+
+
+def embedded_rows(records: list[dict]) -> list[dict]:
+    return [
+        {
+            "id": record["id"],
+            "embedding": [1.0, float(record["id"])],
+            "context": record["forum_text"],
+            "metadata": {
+                "disease_key": "",
+                "content_hash": content_hash(record["forum_text"]),
+            },
+        }
+        for record in records
+    ]
+
+
+@pytest.mark.asyncio
+async def test_failed_page_keeps_previous_posts_in_store(fake_forum, tmp_path):
+    params = {"base_url": "http://fake.url?page={page}", "state_dir": str(tmp_path)}
+    persist_path = str(tmp_path / "chroma")
+    store_to_chroma(embedded_rows(await scrape_forum_page(params)), persist_path)
+
+    fake_forum["fail"] = {2}
+    results = await scrape_forum_page(params)
+    store_to_chroma(embedded_rows(results), persist_path)
+
+    # Posts 4 and 3 were on the failed page; the previous crawl's copies stay
+    assert [r["id"] for r in results] == ["6", "5", "4", "3", "2", "1"]
+    collection = chromadb.PersistentClient(path=persist_path).get_collection(
+        CHROMA_COLLECTION
+    )
+    assert sorted(collection.get()["ids"]) == ["1", "2", "3", "4", "5", "6"]
+
+
+@pytest.mark.asyncio
+async def test_next_run_drains_retry_queue_first(fake_forum, tmp_path, caplog):
+    params = {
+        "base_url": "http://fake.url?page={page}",
+        "mode": "incremental",
+        "state_dir": str(tmp_path),
+    }
+    fake_forum["fail"] = {2}
+    await scrape_forum_page(params)
+
+    fake_forum["fail"] = set()
+    fake_forum["requested"] = []
+    with caplog.at_level("INFO"):
+        results = await scrape_forum_page(params)
+
+    assert fake_forum["requested"] == [2, 1]
+    assert sorted(r["id"] for r in results) == ["3", "4"]
+    assert ScrapeState(str(tmp_path)).retry_queue == []
+    assert "2 pages fetched, 0 failed, 1 retried" in caplog.text
+
+
+def test_retry_queue_gives_up_after_max_attempts(tmp_path):
+    state = ScrapeState(str(tmp_path))
+    state.add_to_retry_queue(4, "error")
+    state.set_retry_queue({4: "error", 5: "error"}, max_attempts=2)
+
+    assert [entry["page"] for entry in state.retry_queue] == [5]
+
+
+def test_parse_retry_after() -> None:
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+
+@pytest.mark.asyncio
+async def test_limiter_backs_off_once_per_round_trip() -> None:
+    limiter = AdaptiveLimiter(initial=8, max_limit=16)
+    await limiter.record(0.1, 200)
+    assert limiter.limit == pytest.approx(8.125)
+
+    # Several in-flight requests throttled by the same overload halve it once
+    await limiter.record(0.1, 429)
+    await limiter.record(0.1, 429)
+    await limiter.record(0.1, 503)
+    assert limiter.limit == pytest.approx(4.0625)
+
+
+@pytest.mark.asyncio
+async def test_limiter_converges_on_server_capacity() -> None:
+    """A stub server that handles 6 requests at a time and answers 429 beyond that."""
+    capacity, in_flight, peak = 6, 0, 0
+    completed = []
+    loop = asyncio.get_running_loop()
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak
+        if in_flight >= capacity:
+            return httpx.Response(429, headers={"Retry-After": "0.05"})
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        completed.append(loop.time())
+        return httpx.Response(200, json={"pageProps": {"forums": []}})
+
+    limiter = AdaptiveLimiter(initial=1, max_limit=16)
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        fetched, failed = await fetch_pages(
+            client=client,
+            sem=limiter,
+            base_url="http://stub/?page={page}",
+            pages=list(range(1, 201)),
+        )
+
+    assert len(fetched) + len(failed) == 200
+    assert len(fetched) >= 190
+    # Grew from 1 towards the capacity and never ran away past the ceiling
+    assert peak == capacity
+    assert 3 <= limiter.limit <= 16
+    # Steady-state throughput beats the single-request start
+    first = completed[19] - completed[0]
+    last = completed[-1] - completed[-20]
+    assert last < first
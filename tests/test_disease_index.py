@@ -0,0 +1,60 @@
+import numpy as np
+
+from llm_chatbot_backend.disease_index import DiseaseCentroids
+
+
+def test_build_averages_normalized_embeddings_per_key():
+    embeddings = np.array(
+        [[1.0, 0.0], [10.0, 10.0], [0.0, 3.0], [5.0, 5.0]], dtype=np.float32
+    )
+
+    centroids = DiseaseCentroids.build(["a", "a", "b", None], embeddings)
+
+    assert centroids.keys == ["a", "b"]
+    assert centroids.counts.tolist() == [2, 1]
+    # Both "a" rows count equally, however long their embeddings are
+    expected = np.array([1 + 0.5**0.5, 0.5**0.5]) / np.linalg.norm(
+        [1 + 0.5**0.5, 0.5**0.5]
+    )
+    np.testing.assert_allclose(centroids.centroids[0], expected, rtol=1e-6)
+
+
+def test_predict_returns_nearest_keys():
+    centroids = DiseaseCentroids.build(
+        ["headache", "rash", "fever"],
+        np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]], np.float32),
+    )
+
+    predicted = centroids.predict([0.9, 0.3, 0.0], top_n=2)
+
+    assert [key for key, _ in predicted] == ["headache", "rash"]
+    assert predicted[0][1] > predicted[1][1]
+    assert DiseaseCentroids.build([], np.empty((0, 3))).predict([1, 0, 0]) == []
+
+
+def test_save_and_load_round_trip(tmp_path):
+    centroids = DiseaseCentroids.build(
+        ["ปวดหัว", "ผื่น"], np.array([[1.0, 0.0], [0.0, 1.0]], np.float32)
+    )
+    path = str(tmp_path / "centroids.npz")
+    centroids.save(path)
+
+    loaded = DiseaseCentroids.load(path)
+    assert loaded.keys == ["ปวดหัว", "ผื่น"]
+    assert loaded.predict([0.1, 1.0], 1) == centroids.predict([0.1, 1.0], 1)
+
+
+def test_from_blocks_matches_build():
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(10, 3)).astype(np.float32)
+    keys = ["a", "b", None, "a", "c", "b", "a", "", "c", "a"]
+
+    built = DiseaseCentroids.build(keys, embeddings)
+    streamed = DiseaseCentroids.from_blocks(
+        (keys[start : start + 4], embeddings[start : start + 4])
+        for start in range(0, 10, 4)
+    )
+
+    assert streamed.keys == built.keys
+    assert streamed.counts.tolist() == built.counts.tolist()
+    np.testing.assert_allclose(streamed.centroids, built.centroids, rtol=1e-5)
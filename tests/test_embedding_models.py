@@ -0,0 +1,82 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from llm_chatbot_backend import embedding_models
+from llm_chatbot_backend.embedding_models import (
+    QUANTIZED_FILE,
+    load_embedding_model,
+    parity_check,
+    parse_model_spec,
+)
+
+MODEL = "sentence-transformers/paraphrase-multilingual-mpnet-base-v2"
+
+
+def test_parse_model_spec():
+    assert parse_model_spec(MODEL) == (MODEL, None)
+    assert parse_model_spec(f"{MODEL}@onnx-int8") == (MODEL, "onnx-int8")
+    with pytest.raises(ValueError, match="Unknown embedding backend"):
+        parse_model_spec(f"{MODEL}@tensorrt")
+
+
+@patch("llm_chatbot_backend.embedding_models.SentenceTransformer")
+def test_plain_name_loads_float_model(mock_model_class):
+    load_embedding_model(MODEL)
+
+    mock_model_class.assert_called_once_with(MODEL)
+
+
+@patch("llm_chatbot_backend.embedding_models.export_dynamic_quantized_onnx_model")
+@patch("llm_chatbot_backend.embedding_models.SentenceTransformer")
+def test_onnx_int8_is_exported_once_then_reused(
+    mock_model_class, mock_export, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(embedding_models, "ONNX_EXPORT_DIR", str(tmp_path))
+
+    def export(model, config, path):
+        quantized = tmp_path / path / QUANTIZED_FILE
+        quantized.parent.mkdir(parents=True)
+        quantized.touch()
+
+    mock_export.side_effect = export
+
+    load_embedding_model(f"{MODEL}@onnx-int8")
+    load_embedding_model(f"{MODEL}@onnx-int8")
+
+    mock_export.assert_called_once()
+    export_dir = str(tmp_path / MODEL.replace("/", "_"))
+    mock_model_class.assert_called_with(
+        export_dir, backend="onnx", model_kwargs={"file_name": QUANTIZED_FILE}
+    )
+
+
+def fake_model(embeddings: np.ndarray) -> MagicMock:
+    model = MagicMock()
+    model.encode.return_value = embeddings
+    return model
+
+
+def test_parity_check_passes_for_close_embeddings():
+    rng = np.random.default_rng(0)
+    reference = rng.standard_normal((8, 16))
+    candidate = reference + rng.normal(scale=0.01, size=reference.shape)
+
+    report = parity_check(
+        fake_model(candidate), fake_model(reference), ["x"] * 8, threshold=0.99
+    )
+
+    assert report.passed
+    assert report.min_cosine <= report.mean_cosine <= 1.0
+
+
+def test_parity_check_fails_when_one_embedding_drifts():
+    reference = np.eye(4)
+    candidate = np.eye(4)
+    candidate[2] = [1.0, 0.0, 0.0, 0.0]
+
+    report = parity_check(fake_model(candidate), fake_model(reference), ["x"] * 4)
+
+    assert not report.passed
+    assert report.min_cosine == pytest.approx(0.0)
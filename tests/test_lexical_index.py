@@ -0,0 +1,32 @@
+from llm_chatbot_backend.lexical_index import BM25Index, tokenize
+
+DOCUMENTS = {
+    "para": "ปวดหัวมาก กินยาพาราเซตามอลได้ไหม",
+    "diarrhea": "ท้องเสียหลังกินอาหารทะเล ต้องกินยาอะไร",
+    "rash": "ผื่นแดงคันตามแขน เป็นภูมิแพ้หรือเปล่า",
+}
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    tokens = tokenize("[คำถาม] กินยาพาราเซตามอล Paracetamol 500mg ได้ไหม?")
+    assert "พาราเซตามอล" in tokens and "paracetamol" in tokens
+    assert "ได้" not in tokens and "[" not in tokens and "?" not in tokens
+
+
+def test_search_ranks_exact_term_matches():
+    index = BM25Index.build(list(DOCUMENTS), list(DOCUMENTS.values()))
+
+    assert [doc_id for doc_id, _ in index.search("พาราเซตามอล")] == ["para"]
+    # "กิน" and "ยา" occur in two documents, "ทะเล" only in one
+    assert index.search("กินยา อาหารทะเล")[0][0] == "diarrhea"
+    assert index.search("เบาหวาน") == []
+    assert len(index.search("กินยา", top_k=1)) == 1
+
+
+def test_save_and_load_round_trip(tmp_path):
+    index = BM25Index.build(list(DOCUMENTS), list(DOCUMENTS.values()))
+    path = str(tmp_path / "index" / "lexical_index.json")
+    index.save(path)
+
+    loaded = BM25Index.load(path)
+    assert loaded.search("ภูมิแพ้ ผื่น") == index.search("ภูมิแพ้ ผื่น")
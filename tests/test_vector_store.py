@@ -0,0 +1,140 @@
+import chromadb
+import pytest
+
+from llm_chatbot_backend.datasets.utf8_json import Utf8JSONLines
+from llm_chatbot_backend.pipelines.data_processing.nodes import build_rag_context
+from llm_chatbot_backend.vector_store import (
+    CHROMA_COLLECTION,
+    active_collection_name,
+    compact_collection,
+    content_hash,
+    garbage_collect_collections,
+    main,
+    read_collection_version,
+    validate_collection,
+    versioned_collection_name,
+    write_collection_version,
+)
+
+
+@pytest.fixture
+def duplicated_store(tmp_path) -> str:
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    collection = client.get_or_create_collection(name=CHROMA_COLLECTION)
+    # Three runs of the old pipeline upserted the same two posts under new ids
+    collection.upsert(
+        ids=["doc_101", "doc_-202", "doc_303", "doc_-404", "12345", "doc_505"],
+        documents=["post a", "post a", "post a", "post b", "post b", "post b"],
+        embeddings=[[float(i), 1.0] for i in range(6)],
+        metadatas=[{"disease_key": "k"}] * 6,
+    )
+    return str(tmp_path)
+
+
+def test_content_hash_is_stable():
+    assert content_hash("ปวดหัว") == content_hash("ปวดหัว")
+    assert content_hash("ปวดหัว") != content_hash("เป็นไข้")
+
+
+def test_compact_collection(duplicated_store):
+    stats = compact_collection(duplicated_store)
+
+    collection = chromadb.PersistentClient(path=duplicated_store).get_collection(
+        CHROMA_COLLECTION
+    )
+    remaining = collection.get()
+    assert stats == {"before": 6, "after": 2, "removed": 4}
+    # Without the source records the forum id of "post a" is unknown
+    assert "12345" in remaining["ids"]
+    assert {"doc_101", "doc_-202", "doc_303"} & set(remaining["ids"])
+    assert read_collection_version(duplicated_store) is not None
+
+
+def test_compact_collection_rekeys_to_pipeline_ids(duplicated_store):
+    stats = compact_collection(
+        duplicated_store, ids_by_digest={content_hash("post a"): "777"}
+    )
+
+    collection = chromadb.PersistentClient(path=duplicated_store).get_collection(
+        CHROMA_COLLECTION
+    )
+    assert stats == {"before": 6, "after": 2, "removed": 4}
+    assert sorted(collection.get()["ids"]) == ["12345", "777"]
+    # The next pipeline upsert overwrites the post instead of adding a copy
+    collection.upsert(ids=["777"], documents=["post a"], embeddings=[[0.0, 1.0]])
+    assert collection.count() == 2
+
+
+def test_compact_collection_is_idempotent(duplicated_store):
+    compact_collection(duplicated_store)
+    assert compact_collection(duplicated_store)["removed"] == 0
+
+
+def test_main_compact(duplicated_store):
+    main(["compact", duplicated_store])
+    collection = chromadb.PersistentClient(path=duplicated_store).get_collection(
+        CHROMA_COLLECTION
+    )
+    assert collection.count() == 2
+
+
+def test_main_compact_reads_ids_from_records(tmp_path):
+    record = {
+        "id": "98765",
+        "forum_text": "ปวดหัว",
+        "doctor_reply": "พักผ่อน",
+        "disease_key": "headache",
+        "disease_text": "ปวดศีรษะ",
+        "tags": [],
+    }
+    records_path = str(tmp_path / "forum_data.jsonl.gz")
+    Utf8JSONLines(records_path).save([record])
+    store = str(tmp_path / "chroma")
+    chromadb.PersistentClient(path=store).create_collection(CHROMA_COLLECTION).upsert(
+        ids=["doc_-1", "doc_2"],
+        documents=[build_rag_context(record)] * 2,
+        embeddings=[[1.0, 0.0]] * 2,
+    )
+
+    main(["compact", store, "--records", records_path])
+
+    collection = chromadb.PersistentClient(path=store).get_collection(CHROMA_COLLECTION)
+    assert collection.get()["ids"] == ["98765"]
+
+
+def test_collection_pointer(tmp_path):
+    assert active_collection_name(str(tmp_path)) == CHROMA_COLLECTION
+    write_collection_version(str(tmp_path), "forum_data_v1", "v1")
+    assert active_collection_name(str(tmp_path)) == "forum_data_v1"
+    assert read_collection_version(str(tmp_path)) == "v1"
+
+
+def test_garbage_collect_keeps_active_and_newest(tmp_path):
+    client = chromadb.PersistentClient(path=str(tmp_path))
+    for version in ["001", "002", "003", "004"]:
+        client.create_collection(name=versioned_collection_name(version))
+    client.create_collection(name=CHROMA_COLLECTION)
+    write_collection_version(str(tmp_path), versioned_collection_name("001"), "001")
+
+    deleted = garbage_collect_collections(client, str(tmp_path), keep=2)
+
+    assert deleted == [versioned_collection_name("002")]
+    assert sorted(c.name for c in client.list_collections()) == [
+        CHROMA_COLLECTION,
+        versioned_collection_name("001"),
+        versioned_collection_name("003"),
+        versioned_collection_name("004"),
+    ]
+
+
+def test_validate_collection(duplicated_store):
+    collection = chromadb.PersistentClient(path=duplicated_store).get_collection(
+        CHROMA_COLLECTION
+    )
+    sample = {"id": "doc_101", "embedding": [0.0, 1.0]}
+    validate_collection(collection, 6, [sample])
+
+    with pytest.raises(RuntimeError, match="expected 7"):
+        validate_collection(collection, 7, [sample])
+    with pytest.raises(RuntimeError, match="does not return"):
+        validate_collection(collection, 6, [{"id": "x", "embedding": [9.5, -3.0]}])